@@ -1,45 +1,85 @@
-from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Depends
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Depends, Query
+from typing import Dict, Any, Optional
 
 from app.services.crawler import CrawlerService
+from app.services.recrawl_scheduler import RecrawlScheduler
+from app.services.crawl_state import CrawlJobAlreadyRunning, CrawlJobNotResumable
+from app.services.url_frontier import DiscoveryAlreadyRunning
 from app.schemas.crawler import CrawlStatus
 from app.core.logging import get_logger
 
 router = APIRouter()
 logger = get_logger(__name__)
 
+_crawler_service: Optional[CrawlerService] = None
+_recrawl_scheduler: Optional[RecrawlScheduler] = None
+
 # Dependency Injection
 def get_crawler_service() -> CrawlerService:
     """
-    Dependency để inject CrawlerService
+    Dependency để inject CrawlerService (dùng chung một instance để status không bị mất giữa các request)
+    """
+    global _crawler_service
+    if _crawler_service is None:
+        _crawler_service = CrawlerService()
+    return _crawler_service
+
+def get_recrawl_scheduler() -> RecrawlScheduler:
+    """
+    Scheduler recrawl dùng chung CrawlerService với các endpoint crawl
     """
-    return CrawlerService()
+    global _recrawl_scheduler
+    if _recrawl_scheduler is None:
+        _recrawl_scheduler = RecrawlScheduler(get_crawler_service())
+    return _recrawl_scheduler
 
 @router.post("/crawl/start", status_code=status.HTTP_202_ACCEPTED)
 async def start_crawling(
     background_tasks: BackgroundTasks,
+    resume: bool = Query(False, description="Tiếp tục job bị gián đoạn từ checkpoint gần nhất"),
+    discovered_limit: int = Query(0, ge=0, description="Số URL lấy thêm từ discovery frontier"),
     crawler: CrawlerService = Depends(get_crawler_service)
 ):
     """
     Bắt đầu crawl dữ liệu phim trong background
     """
     try:
-        # Check nếu đang crawl
-        current_status = crawler.get_status()
-        if current_status["status"] == "running":
+        if resume:
+            try:
+                resumed = await crawler.resume_job()
+            except CrawlJobNotResumable as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except CrawlJobAlreadyRunning:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Crawling is already running"
+                )
+            background_tasks.add_task(crawler.run_worker, resumed["job_id"])
+            logger.info(f"Resumed crawl job {resumed['job_id']} with {resumed['remaining']} URLs remaining")
+            return {
+                "message": f"Resumed crawling, {resumed['remaining']} movies remaining",
+                **resumed,
+                "status": "resumed"
+            }
+        
+        # Tạo job trong Redis, lỗi nếu đang có job chạy ở bất kỳ worker/replica nào
+        try:
+            job = await crawler.start_job(discovered_limit=discovered_limit)
+        except CrawlJobAlreadyRunning:
             raise HTTPException(
                 status_code=400, 
                 detail="Crawling is already running"
             )
         
-        # Start crawling trong background
-        background_tasks.add_task(crawler.crawl_all_movies)
+        # Worker trong process này cùng crawl với các worker khác trong background
+        background_tasks.add_task(crawler.run_worker, job["job_id"])
         
-        logger.info("Started crawling movies in background")
+        logger.info(f"Started crawl job {job['job_id']} in background")
         
+        # total_urls của job thật (MOVIE_URLS + URL từ discovery, đã bỏ trùng)
         return {
-            "message": f"Started crawling {len(crawler.MOVIE_URLS)} movies",
-            "total_urls": len(crawler.MOVIE_URLS),
+            "message": f"Started crawling {job['total_urls']} movies",
+            **job,
             "status": "started"
         }
         
@@ -60,10 +100,11 @@ async def get_crawl_status(
     Lấy trạng thái hiện tại của crawling process
     """
     try:
-        status = crawler.get_status()
+        status = await crawler.get_status()
         # Thêm progress percentage
         if status["total_urls"] > 0:
-            progress = (status["processed"] + status["failed"]) / status["total_urls"] * 100
+            done = status["processed"] + status["failed"] + status["unchanged"] + status["skipped"]
+            progress = done / status["total_urls"] * 100
             status["progress_percent"] = round(progress, 2)
         else:
             status["progress_percent"] = 0
@@ -77,8 +118,52 @@ async def get_crawl_status(
             detail="Failed to get crawl status"
         )
 
+async def run_discovery(crawler: CrawlerService, max_pages: Optional[int] = None):
+    """
+    Chạy discovery trong background task: lỗi chỉ được log, không lọt ra ngoài BackgroundTasks
+    (vd. replica khác vừa bắt đầu discovery sau lần kiểm tra status)
+    """
+    try:
+        await crawler.discover(None, max_pages)
+    except DiscoveryAlreadyRunning:
+        logger.warning("URL discovery is already running in another worker, skipped")
+    except Exception as e:
+        logger.error(f"Background URL discovery failed: {str(e)}")
+
+@router.post("/crawl/discover", status_code=status.HTTP_202_ACCEPTED)
+async def start_discovery(
+    background_tasks: BackgroundTasks,
+    max_pages: Optional[int] = Query(None, ge=1, description="Số trang listing/sitemap tối đa"),
+    crawler: CrawlerService = Depends(get_crawler_service)
+):
+    """
+    Tìm URL phim mới từ các trang listing/sitemap trong background
+    """
+    try:
+        discovery = await crawler.frontier.stats()
+        if discovery["status"] == "running":
+            raise HTTPException(
+                status_code=400,
+                detail="Discovery is already running"
+            )
+        background_tasks.add_task(run_discovery, crawler, max_pages)
+        logger.info("Started URL discovery in background")
+        return {"message": "Started URL discovery", "status": "started"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to start discovery: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to start URL discovery"
+        )
+
 @router.get("/crawl/stats")
-async def get_crawl_stats() -> Dict[str, Any]:
+async def get_crawl_stats(
+    runs: int = Query(10, ge=1, le=100, description="Số crawl run gần nhất trả về"),
+    crawler: CrawlerService = Depends(get_crawler_service)
+) -> Dict[str, Any]:
     """
     Lấy thống kê tổng quan về crawled data
     """
@@ -87,11 +172,19 @@ async def get_crawl_stats() -> Dict[str, Any]:
         import app.crud.vod as crud_vod
         
         total_movies = await crud_vod.count_vods()
+        discovery = await crawler.frontier.stats()
+        history = await crawler.run_history(runs)
+        last_run = history[0] if history else None
         
         return {
             "total_movies_in_db": total_movies,
-            "available_urls": len(CrawlerService.MOVIE_URLS),
-            "last_updated": "Manual crawl"  # TODO: track last crawl time
+            "available_urls": len(CrawlerService.MOVIE_URLS) + discovery["frontier_size"],
+            "frontier_size": discovery["frontier_size"],
+            "discovery_rate_per_min": discovery["discovery_rate_per_min"],
+            "discovery": discovery,
+            "last_updated": (last_run["end_time"] or last_run["start_time"]) if last_run else None,
+            "last_run": last_run,
+            "recent_runs": history[1:],
         }
         
     except Exception as e:
@@ -101,6 +194,59 @@ async def get_crawl_stats() -> Dict[str, Any]:
             detail="Failed to get crawl statistics"
         )
 
+@router.get("/crawl/schedule")
+async def get_recrawl_schedule(
+    limit: int = Query(20, ge=1, le=200, description="Số trang ưu tiên cao nhất muốn xem"),
+    scheduler: RecrawlScheduler = Depends(get_recrawl_scheduler)
+) -> Dict[str, Any]:
+    """
+    Trạng thái scheduler recrawl và các trang sẽ được recrawl tiếp theo
+    """
+    try:
+        candidates = await scheduler.candidates(limit)
+        return {
+            **scheduler.snapshot(),
+            "next": [
+                {
+                    "url": page["url"],
+                    "priority": page["priority"],
+                    "changes": page.get("changes", 0),
+                    "checks": page.get("checks", 0),
+                    "last_crawled_at": page.get("last_crawled_at"),
+                }
+                for page in candidates
+            ],
+        }
+    except Exception as e:
+        logger.error(f"Failed to get recrawl schedule: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to get recrawl schedule"
+        )
+
+@router.get("/crawl/duplicates")
+async def get_duplicate_report(
+    min_similarity: Optional[float] = Query(None, ge=0, le=1, description="Jaccard ước lượng tối thiểu"),
+    limit: int = Query(50, ge=1, le=500),
+    crawler: CrawlerService = Depends(get_crawler_service)
+) -> Dict[str, Any]:
+    """
+    Các cluster VOD nghi trùng nhau (khác url nhưng cùng phim)
+    """
+    try:
+        clusters = await crawler.dedupe.clusters(min_similarity, limit)
+        return {
+            "min_similarity": crawler.dedupe.threshold if min_similarity is None else min_similarity,
+            "count": len(clusters),
+            "clusters": clusters,
+        }
+    except Exception as e:
+        logger.error(f"Failed to build duplicate report: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to build duplicate report"
+        )
+
 @router.post("/crawl/test")
 async def test_crawl_url(
     url: str,
@@ -143,16 +289,7 @@ async def reset_crawl_status(
     Reset crawl status về idle (để test lại)
     """
     try:
-        crawler.status = {
-            "total_urls": len(crawler.MOVIE_URLS),
-            "processed": 0,
-            "failed": 0,
-            "status": "idle",
-            "current_url": None,
-            "start_time": None,
-            "end_time": None,
-            "errors": []
-        }
+        await crawler.reset_status()
         
         logger.info("Crawl status reset to idle")
         
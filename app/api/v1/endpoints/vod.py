@@ -1,78 +1,244 @@
+import asyncio
+import json
 from fastapi import APIRouter, HTTPException, status, Response, Query
-from typing import List, Optional
-from app.schemas.vod import VodCreate, VodResponse, VodUpdate
+from typing import Any, List, Optional, Tuple
+from bson import ObjectId
+from pydantic import TypeAdapter
+from app.core.config import settings
+from app.schemas.vod import (
+    VOD_FIELDS, PaginatedResponse, VodBatchRequest, VodBatchResponse, VodCreate, VodResponse, VodSuggestion, VodUpdate,
+)
 import app.crud.vod as crud_vod
-from app.utils.cache import get_or_set_cache
+from app.utils.cache import (
+    VOD_LIST_NAMESPACE, CachedResponse, cache_stats, get_many, get_or_set_response, invalidate_vods,
+    read_versions, set_many, versioned_key, vod_cache_key,
+)
+from app.utils.data_utils import fold_text
+from app.utils.pagination import InvalidCursor, decode_cursor, next_cursor
 from app.core.logging import get_logger
-from app.db.indexes import create_indexes, get_indexes
+from app.db.indexes import DuplicateVodUrls, create_indexes, get_indexes
 
 
 router = APIRouter()
 logger = get_logger(__name__)
 
-@router.get("/vods", response_model=List[VodResponse])
+# Serialize list VOD một lần khi ghi cache (thay cho response_model ở mỗi request)
+VOD_LIST_ADAPTER = TypeAdapter(List[VodResponse])
+# Một VOD hoặc None (negative cache, body "null")
+VOD_ADAPTER = TypeAdapter(Optional[VodResponse])
+COUNT_ADAPTER = TypeAdapter(int)
+SUGGEST_ADAPTER = TypeAdapter(List[VodSuggestion])
+# Model rút gọn khác nhau theo fields=, serialize theo kiểu runtime của từng item
+PROJECTED_LIST_ADAPTER = TypeAdapter(List[Any])
+PROJECTED_ADAPTER = TypeAdapter(Optional[Any])
+
+def _parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    "title, thumbnail_url" -> ("thumbnail_url", "title") (sắp xếp để dùng chung cache key); id luôn được trả về
+    """
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()} - {"id", "_id"}
+    unknown = names - set(VOD_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(sorted(names))
+
+@router.get("/vods", response_model=PaginatedResponse[VodResponse])
 async def read_vods(
     search: Optional[str] = Query(None, description="Tìm kiếm theo tên video"),
     page: int = Query(1, ge=1, description="Số trang"),
     limit: int = Query(10, ge=1, le=50, description="Số item mỗi trang"),
-    sort_by: str = Query("release_year", description="Sắp xếp theo field")
+    sort_by: str = Query("release_year", description="Sắp xếp theo field"),
+    after: Optional[str] = Query(None, description="Cursor từ header X-Next-Cursor của trang trước (thay cho page)"),
+    fields: Optional[str] = Query(None, description="Chỉ trả về các field này, cách nhau dấu phẩy (vd: title,thumbnail_url)")
 ):
     try:
-        # Tính skip từ page
-        skip = (page - 1) * limit
+        selected = _parse_fields(fields)
+        cursor = None
+        if after:
+            try:
+                cursor = decode_cursor(after, sort_by)
+            except InvalidCursor as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
+        # Tính skip từ page (bỏ qua khi dùng cursor)
+        skip = 0 if cursor else (page - 1) * limit
         
         if search:
             logger.info(f"Searching VODs with query: '{search}' (page: {page}, limit: {limit})")
         else:
-            logger.info(f"Fetching VODs (page: {page}, limit: {limit})")
+            logger.info(f"Fetching VODs ({'after cursor' if cursor else f'page: {page}'}, limit: {limit})")
             
-        async def fetch(): 
-            result = await crud_vod.list_vods(search=search, limit=limit, skip=skip, sort_by=sort_by)
+        async def build():
+            # Lấy dư 1 item để biết còn trang sau không
+            result = await crud_vod.list_vods(search=search, limit=limit + 1, skip=skip, sort_by=sort_by, after=cursor, fields=selected)
             log_msg = f"Fetched {len(result)} VODs from database (page: {page})"
             if search:
                 log_msg += f" for search: '{search}'"
             logger.debug(log_msg)
-            return result
+            
+            headers = {}
+            next_token = next_cursor(sort_by, result, limit)
+            if next_token:
+                headers["X-Next-Cursor"] = next_token
+            return result[:limit], headers
         
         # Cache key bao gồm pagination params
-        cache_key = f"vods:search:{search}:page:{page}:limit:{limit}:sort:{sort_by}" if search else f"vods:all:page:{page}:limit:{limit}:sort:{sort_by}"
+        position = f"after:{after}" if cursor else f"page:{page}"
+        # Search theo token đã bỏ dấu nên "Cuộc rượt" và "cuoc ruot" dùng chung cache
+        page_key = f"search:{fold_text(search)}:{position}:limit:{limit}:sort:{sort_by}" if search else f"all:{position}:limit:{limit}:sort:{sort_by}"
+        if selected is not None:
+            page_key += f":fields:{','.join(selected)}"
+        # Gắn generation: mọi thao tác ghi VOD làm toàn bộ trang cũ miss ngay
+        cache_key = await versioned_key(VOD_LIST_NAMESPACE, page_key)
         
         # Cache TTL khác nhau: search ngắn hơn, list normal lâu hơn
         ttl = 300 if not search else 120  # 5 phút vs 2 phút
-        result = await get_or_set_cache(cache_key, fetch, ttl=ttl)
-        log_msg = f"Retrieved {len(result)} VODs"
-        if search:
-            log_msg += f" matching '{search}'"
-        logger.info(log_msg)
-        return result
+        
+        async def count():
+            return await crud_vod.count_vods(search=search), {}
+        
+        # Total cache riêng (không phụ thuộc page/sort), chạy song song với query trang
+        count_key = await versioned_key(VOD_LIST_NAMESPACE, f"count:{fold_text(search) if search else ''}")
+        cached, cached_total = await asyncio.gather(
+            get_or_set_response(cache_key, build, ttl=ttl, adapter=VOD_LIST_ADAPTER if selected is None else PROJECTED_LIST_ADAPTER),
+            get_or_set_response(count_key, count, ttl=settings.CACHE_COUNT_TTL, adapter=COUNT_ADAPTER),
+        )
+        total = int(cached_total.body)
+        
+        # Ghép envelope từ body list đã serialize sẵn, không dựng lại model
+        meta = {
+            "total": total,
+            "page": None if cursor else page,
+            "limit": limit,
+            "total_pages": (total + limit - 1) // limit,
+            "next_cursor": cached.headers.get("X-Next-Cursor"),
+        }
+        body = b'{"items":' + cached.body + b"," + json.dumps(meta, separators=(",", ":")).encode("utf-8")[1:]
+        
+        logger.info(f"Retrieved VOD list ({len(cached.body)} bytes, total: {total})" + (f" matching '{search}'" if search else ""))
+        # Body đã là JSON cuối cùng, trả thẳng để bỏ qua validate/serialize của response_model
+        return Response(content=body, media_type="application/json", headers=cached.headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to fetch VODs: {str(e)}", exc_info=True)
         raise 
 
 
+@router.get("/vods/suggest", response_model=List[VodSuggestion])
+async def suggest_vods(
+    q: str = Query(..., min_length=1, max_length=100, description="Chuỗi đang gõ, có dấu hoặc không"),
+    limit: int = Query(10, ge=1, le=20, description="Số gợi ý tối đa")
+):
+    """
+    Gợi ý title theo prefix (không phân biệt dấu), phim nhiều lượt xem trước
+    """
+    try:
+        async def build():
+            docs = await crud_vod.suggest_vods(q, limit=limit)
+            return [VodSuggestion(**doc) for doc in docs], {}
+        
+        # Cùng prefix (sau khi bỏ dấu) dùng chung cache
+        cache_key = await versioned_key(VOD_LIST_NAMESPACE, f"suggest:{fold_text(q)}:limit:{limit}")
+        cached = await get_or_set_response(cache_key, build, ttl=settings.CACHE_SUGGEST_TTL, adapter=SUGGEST_ADAPTER)
+        return Response(content=cached.body, media_type="application/json")
+    except Exception as e:
+        logger.error(f"Failed to suggest VODs for '{q}': {str(e)}", exc_info=True)
+        raise
+
 @router.get("/vods/{vod_id}",response_model=VodResponse)
-async def read_doc(vod_id:str):
+async def read_doc(
+    vod_id:str,
+    fields: Optional[str] = Query(None, description="Chỉ trả về các field này, cách nhau dấu phẩy")
+):
     try:
+        selected = _parse_fields(fields)
         logger.info(f"Fetching VOD with ID: {vod_id}")
-        vod = await crud_vod.get_vod(vod_id)
-        if not vod:
+        # id sai định dạng: 404 ngay, không tạo cache key từ chuỗi tuỳ ý của client
+        if not ObjectId.is_valid(vod_id):
+            logger.warning(f"VOD not found (invalid id): {vod_id}")
+            raise HTTPException(status_code=404, detail="VOD not found")
+        # Hex chữ hoa/thường là cùng một VOD: dùng dạng chuẩn cho cache key
+        vod_id = str(ObjectId(vod_id))
+        
+        async def build():
+            return await crud_vod.get_vod(vod_id, fields=selected), {}
+        
+        if selected is None:
+            cache_key, adapter = await vod_cache_key(vod_id), VOD_ADAPTER
+        else:
+            # Bản rút gọn không bị xoá chính xác theo id khi update, nên gắn generation của namespace list
+            # (bump ở mọi thao tác ghi) để không bao giờ cũ hơn list
+            cache_key = await versioned_key(VOD_LIST_NAMESPACE, f"item:{vod_id}:fields:{','.join(selected)}")
+            adapter = PROJECTED_ADAPTER
+        cached = await get_or_set_response(
+            cache_key, build,
+            ttl=settings.CACHE_VOD_TTL, adapter=adapter, negative_ttl=settings.CACHE_VOD_NEGATIVE_TTL,
+        )
+        if cached.body == b"null":
             logger.warning(f"VOD not found: {vod_id}")
             raise HTTPException(status_code=404, detail="VOD not found")
         logger.info(f"Retrieved VOD: {vod_id}")
-        return vod
+        return Response(content=cached.body, media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error fetching VOD {vod_id}: {str(e)}", exc_info=True)
         raise
 
+@router.post("/vods:batch", response_model=VodBatchResponse)
+async def read_vods_batch(request: VodBatchRequest):
+    """
+    Lấy nhiều VOD theo id: một MGET cache + một query $in cho các id miss
+    """
+    try:
+        # Id hợp lệ đổi sang dạng chuẩn (hex chữ thường như VodResponse.id) trước khi bỏ trùng,
+        # tạo cache key và tra kết quả từ Mongo
+        ids = list(dict.fromkeys(str(ObjectId(vod_id)) if ObjectId.is_valid(vod_id) else vod_id for vod_id in request.ids))
+        logger.info(f"Fetching batch of {len(ids)} VODs")
+        
+        # Chỉ id hợp lệ mới có cache key; id sai định dạng vào thẳng missing, không cache
+        keys = {vod_id: await vod_cache_key(vod_id) for vod_id in ids if ObjectId.is_valid(vod_id)}
+        found = await get_many(list(keys.values()))
+        misses = [vod_id for vod_id in keys if keys[vod_id] not in found]
+        if misses:
+            # Đọc bộ đếm invalidate trước khi query để không ghi đè bản mới hơn lên cache
+            versions = await read_versions([keys[vod_id] for vod_id in misses])
+            vods = {vod.id: vod for vod in await crud_vod.get_vods_by_ids(misses)}
+            entries = {}
+            for vod_id in misses:
+                vod = vods.get(vod_id)
+                response = CachedResponse(VOD_ADAPTER.dump_json(vod, by_alias=True), {})
+                ttl = settings.CACHE_VOD_TTL if vod else settings.CACHE_VOD_NEGATIVE_TTL
+                entries[keys[vod_id]] = (response, ttl)
+            await set_many(entries, versions)
+            found.update({key: response for key, (response, _) in entries.items()})
         
+        # Ghép body từ các entry đã serialize sẵn, không dựng lại model
+        items, missing = [], []
+        for vod_id in ids:
+            body = found[keys[vod_id]].body if vod_id in keys else b"null"
+            if body == b"null":
+                missing.append(vod_id)
+            else:
+                items.append(body)
+        body = b'{"items":[' + b",".join(items) + b'],"missing":' + json.dumps(missing).encode("utf-8") + b"}"
+        logger.info(f"Retrieved {len(items)}/{len(ids)} VODs ({len(misses)} from database)")
+        return Response(content=body, media_type="application/json")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fetch VOD batch: {str(e)}", exc_info=True)
+        raise
 
 @router.post("/vods", response_model=VodResponse, status_code=status.HTTP_201_CREATED)
 async def create_vod(v: VodCreate):
     try:
         logger.info(f"Creating new VOD: '{v.title}'")
         result = await crud_vod.create_vod(v)
+        await invalidate_vods()
         logger.info(f"Created VOD with ID: {result.id}")
         return result
     except Exception as e:
@@ -87,6 +253,7 @@ async def update_vod(vod_id: str, v: VodUpdate):
         if not upd:
             logger.warning(f"VOD not found for update: {vod_id}")
             raise HTTPException(status_code=404, detail="VOD not found")
+        await invalidate_vods(vod_id)
         logger.info(f"Updated VOD: {vod_id}")
         return upd
     except HTTPException:
@@ -105,6 +272,7 @@ async def delete_vod(vod_id: str):
         if not success:
             logger.warning(f"VOD not found for deletion: {vod_id}")
             raise HTTPException(status_code=404, detail="VOD not found")
+        await invalidate_vods(vod_id)
         logger.info(f"Deleted VOD: {vod_id}")
         return
     except HTTPException:
@@ -121,13 +289,38 @@ async def create_database_indexes():
     """
     try:
         logger.info("Creating database indexes")
-        await create_indexes()
+        try:
+            await create_indexes()
+        finally:
+            # create_indexes có thể backfill search_tokens/title_prefixes: bỏ các trang search/suggest đã cache
+            await invalidate_vods()
         logger.info("Database indexes created successfully")
         return {"message": "Indexes created successfully"}
+    except DuplicateVodUrls as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "url_unique not created: duplicate VOD urls, run python -m app.db.migrations.dedupe_vod_urls",
+                "duplicates": e.duplicates,
+            },
+        )
     except Exception as e:
         logger.error(f"Failed to create indexes: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to create indexes")
 
+@router.post("/admin/search/rebuild")
+async def rebuild_search_fields():
+    """
+    Tính lại title_prefixes (typeahead) và search_tokens (search) cho toàn bộ VOD
+    """
+    try:
+        updated = await crud_vod.backfill_search_fields()
+        await invalidate_vods()
+        return {"updated": updated}
+    except Exception as e:
+        logger.error(f"Failed to rebuild search fields: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to rebuild search fields")
+
 @router.get("/admin/indexes")
 async def list_database_indexes():
     """
@@ -139,4 +332,11 @@ async def list_database_indexes():
         return {"indexes": indexes}
     except Exception as e:
         logger.error(f"Failed to get indexes: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Failed to get indexes")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to get indexes")
+
+@router.get("/admin/cache")
+async def get_cache_stats():
+    """
+    Hit ratio của từng tier cache (local trong worker này, Redis) kể từ khi worker khởi động
+    """
+    return cache_stats()
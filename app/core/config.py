@@ -1,9 +1,107 @@
+from typing import List
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     MONGO_URL: str
     REDIS_URL: str
     LOG_LEVEL: str
+
+    # Cache response trong process (LRU + TTL) trước Redis, invalidate giữa các worker qua pub/sub
+    CACHE_LOCAL_ENABLED: bool = True
+    CACHE_LOCAL_MAX_ENTRIES: int = 512
+    CACHE_LOCAL_TTL: float = 5.0
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    # Stale-while-revalidate: giữ bản cũ thêm ngần này giây sau TTL, trả bản cũ trong lúc refresh nền
+    CACHE_STALE_TTL: int = 60
+    # Lock Redis để mỗi key chỉ một worker build/refresh; worker khác chờ tối đa CACHE_LOCK_WAIT giây
+    CACHE_LOCK_TIMEOUT: float = 10.0
+    CACHE_LOCK_WAIT: float = 2.0
+    # Cache từng VOD theo id; id không tồn tại được cache ngắn hơn (negative cache)
+    CACHE_VOD_TTL: int = 300
+    CACHE_VOD_NEGATIVE_TTL: int = 30
+    VOD_BATCH_MAX_IDS: int = 100
+    # Tổng số VOD cho envelope phân trang, cache riêng với page
+    CACHE_COUNT_TTL: int = 600
+
+    # Typeahead /vods/suggest: độ dài tối đa của prefix title được index, TTL cache kết quả
+    SUGGEST_MAX_PREFIX: int = 20
+    CACHE_SUGGEST_TTL: int = 60
+
+    # Crawler HTTP client (dùng chung, giữ kết nối keep-alive)
+    CRAWLER_HTTP2: bool = False
+    CRAWLER_MAX_CONNECTIONS: int = 50
+    CRAWLER_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    CRAWLER_KEEPALIVE_EXPIRY: float = 30.0
+    CRAWLER_CONNECT_TIMEOUT: float = 5.0
+    CRAWLER_READ_TIMEOUT: float = 20.0
+    CRAWLER_WRITE_TIMEOUT: float = 10.0
+    CRAWLER_POOL_TIMEOUT: float = 10.0
+
+    # Retry lỗi tạm thời (lỗi kết nối, timeout, 429, 5xx) với exponential backoff + jitter
+    CRAWLER_RETRY_ATTEMPTS: int = 3
+    CRAWLER_RETRY_BASE_DELAY: float = 0.5
+    CRAWLER_RETRY_MAX_DELAY: float = 10.0
+
+    # Hedged request: gửi thêm request nếu chưa có response sau p95 latency
+    CRAWLER_HEDGE_REQUESTS: bool = False
+    CRAWLER_HEDGE_QUANTILE: float = 0.95
+
+    # Số URL được crawl đồng thời (số worker của stage fetch)
+    CRAWLER_CONCURRENCY: int = 8
+
+    # Rate limit theo host (request/giây), tự điều chỉnh kiểu AIMD theo latency, 429 và 5xx
+    CRAWLER_RATE_INITIAL: float = 1.0
+    CRAWLER_RATE_MIN: float = 0.2
+    CRAWLER_RATE_MAX: float = 20.0
+    CRAWLER_RATE_INCREASE: float = 0.2
+    CRAWLER_RATE_DECREASE: float = 0.5
+    CRAWLER_RATE_LATENCY_TARGET: float = 2.0
+
+    # Pipeline fetch -> extract -> normalize -> persist
+    CRAWLER_EXTRACT_WORKERS: int = 2
+    CRAWLER_NORMALIZE_WORKERS: int = 1
+    CRAWLER_PERSIST_WORKERS: int = 4
+    CRAWLER_QUEUE_SIZE: int = 100
+
+    # Worker gửi heartbeat (stage stats, current_url) lên Redis
+    CRAWLER_HEARTBEAT_INTERVAL: float = 5.0
+    # Đẩy URL đã xong + counters lên Redis sau mỗi khoảng này (resume từ checkpoint gần nhất)
+    CRAWLER_CHECKPOINT_INTERVAL: float = 5.0
+    # Worker chạy riêng (app.workers.crawl_worker) kiểm tra job mới sau mỗi khoảng này
+    CRAWLER_WORKER_POLL_INTERVAL: float = 5.0
+
+    # Bulk upsert VOD theo url
+    CRAWLER_BULK_BATCH_SIZE: int = 100
+    CRAWLER_BULK_FLUSH_INTERVAL: float = 2.0
+
+    # Extraction: "inline" (trên event loop) hoặc "process" (ProcessPoolExecutor)
+    CRAWLER_EXTRACT_MODE: str = "inline"
+    CRAWLER_EXTRACT_PROCESSES: int = 0  # 0 = số CPU
+    CRAWLER_EXTRACTOR: str = "compiled"  # "compiled" hoặc "legacy"
+
+    # Index MinHash/LSH phát hiện VOD gần trùng (title + description + director) khi persist
+    CRAWLER_DEDUPE_ENABLED: bool = True
+    CRAWLER_DEDUPE_THRESHOLD: float = 0.8
+
+    # Scheduler recrawl VOD đã lưu, ưu tiên trang hay đổi view_count/rating và lâu chưa crawl
+    CRAWLER_RECRAWL_ENABLED: bool = False
+    CRAWLER_RECRAWL_PAGES_PER_HOUR: int = 600
+    CRAWLER_RECRAWL_INTERVAL: float = 600.0
+    CRAWLER_RECRAWL_MIN_AGE: float = 3600.0  # Giây tối thiểu từ lần crawl cuối
+
+    # Lưu response đã fetch vào archive .warc.gz (mỗi worker một file) để replay/re-extract offline
+    CRAWLER_ARCHIVE_RECORD: bool = False
+    CRAWLER_ARCHIVE_DIR: str = "data/crawl_archive"
+
+    # Discovery: duyệt trang listing/sitemap để tìm URL phim mới, dedupe bằng Bloom filter trong Redis
+    CRAWLER_DISCOVERY_SEEDS: List[str] = ["https://vieon.vn/sitemap.xml", "https://vieon.vn/phim-le"]
+    CRAWLER_DISCOVERY_MAX_DEPTH: int = 2
+    CRAWLER_DISCOVERY_MAX_PAGES: int = 500
+    CRAWLER_DISCOVERY_CONCURRENCY: int = 4
+    CRAWLER_BLOOM_CAPACITY: int = 1_000_000
+    CRAWLER_BLOOM_ERROR_RATE: float = 0.001
+
     model_config = SettingsConfigDict(env_file=".env")
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
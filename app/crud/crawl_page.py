@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+import app.db.mongodb as db
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+async def get_page(url: str) -> Optional[dict]:
+    """
+    Lấy metadata crawl lần trước của url (etag, last_modified, content_hash)
+    """
+    try:
+        return await db.crawl_page_collection.find_one({"url": url}, {"_id": 0})
+    except Exception as e:
+        logger.error(f"Database error in get_page({url}): {str(e)}", exc_info=True)
+        raise
+
+def _page_update(page: dict, now: datetime) -> UpdateOne:
+    page = dict(page)
+    changed = page.pop("changed", False)
+    update = {
+        "$set": {**page, "last_crawled_at": now},
+        "$setOnInsert": {"first_crawled_at": now},
+        # Lịch sử thay đổi view_count/rating, dùng để ưu tiên recrawl
+        "$inc": {"checks": 1, "changes": 1 if changed else 0},
+    }
+    if changed:
+        update["$set"]["last_changed_at"] = now
+    return UpdateOne({"url": page["url"]}, update, upsert=True)
+
+async def bulk_upsert_pages(pages: List[dict]) -> int:
+    """
+    Upsert metadata crawl cho nhiều url trong một lần bulk_write.
+    `changed=True` trong page nghĩa là view_count/rating khác lần crawl trước
+    """
+    if not pages:
+        return 0
+    try:
+        now = datetime.utcnow()
+        ops = [_page_update(page, now) for page in pages]
+        res = await db.crawl_page_collection.bulk_write(ops, ordered=False)
+        logger.debug(f"Upserted crawl metadata for {len(ops)} pages")
+        return res.upserted_count + res.modified_count
+    except Exception as e:
+        logger.error(f"Database error in bulk_upsert_pages({len(pages)} items): {str(e)}", exc_info=True)
+        raise
+
+async def list_recrawl_candidates(crawled_before: datetime, priority: dict, limit: int) -> List[dict]:
+    """
+    `limit` url crawl lần cuối trước `crawled_before` có `priority` (biểu thức aggregation) cao nhất.
+    Sort + limit chạy trên Mongo (top-k) nên chỉ trả về đúng số trang của budget
+    """
+    if limit <= 0:
+        return []
+    try:
+        cursor = db.crawl_page_collection.aggregate([
+            {"$match": {"last_crawled_at": {"$lt": crawled_before}}},
+            {"$project": {
+                "_id": 0, "url": 1, "checks": 1, "changes": 1, "first_crawled_at": 1, "last_crawled_at": 1,
+                "priority": priority,
+            }},
+            {"$sort": {"priority": -1, "url": -1}},
+            {"$limit": limit},
+        ])
+        return [page async for page in cursor]
+    except Exception as e:
+        logger.error(f"Database error in list_recrawl_candidates(limit={limit}): {str(e)}", exc_info=True)
+        raise
@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import List
+
+import app.db.mongodb as db
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+async def record_worker_run(run: dict, worker: dict):
+    """
+    Upsert document lịch sử của job (counters mới nhất) và thêm thống kê của một worker
+    """
+    try:
+        fields = {key: value for key, value in run.items() if key != "job_id"}
+        await db.crawl_run_collection.update_one(
+            {"job_id": run["job_id"]},
+            {
+                "$set": {**fields, "updated_at": datetime.utcnow()},
+                "$push": {"workers": {**worker, "finished_at": datetime.utcnow()}},
+            },
+            upsert=True
+        )
+        logger.debug(f"Saved crawl run history for job {run['job_id']} (worker {worker.get('worker_id')})")
+    except Exception as e:
+        logger.error(f"Database error in record_worker_run({run.get('job_id')}): {str(e)}", exc_info=True)
+        raise
+
+async def list_runs(limit: int = 10) -> List[dict]:
+    """
+    Các run gần nhất, mới nhất trước
+    """
+    try:
+        cursor = db.crawl_run_collection.find({}, {"_id": 0}).sort("start_time", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+    except Exception as e:
+        logger.error(f"Database error in list_runs(limit={limit}): {str(e)}", exc_info=True)
+        raise
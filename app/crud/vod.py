@@ -1,41 +1,88 @@
-from typing import List
+import re
+from typing import Any, List, Optional, Tuple
 from bson import ObjectId
-from pymongo import ReturnDocument
+from pymongo import ReturnDocument, UpdateOne, InsertOne
+from pymongo.errors import BulkWriteError
 import app.db.mongodb as db
-from app.schemas.vod import VodCreate, VodUpdate, VodResponse
-from app.utils.data_utils import normalize_release_date
+from app.schemas.vod import VodCreate, VodUpdate, VodResponse, vod_fields_model
+from app.utils.data_utils import fold_text, normalize_release_date, search_tokens, title_prefixes
+from app.core.config import settings
+from app.utils.pagination import keyset_filter, sort_spec
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
-async def list_vods(search: str = None, limit: int = 10, skip: int = 0, sort_by: str = "release_year") -> List[VodResponse]:
+def _with_search_fields(data: dict) -> dict:
+    """
+    Field dẫn xuất dùng cho tìm kiếm, tính lại mỗi khi ghi title
+    """
+    if "title" in data:
+        data["title_prefixes"] = title_prefixes(data["title"], settings.SUGGEST_MAX_PREFIX)
+        data["search_tokens"] = search_tokens(data["title"])
+    return data
+
+def _search_filter(search: str) -> dict:
+    """
+    Mọi từ trong query phải có trong search_tokens (đã bỏ dấu); từ cuối match theo prefix
+    vì người dùng có thể chưa gõ xong. Equality/prefix anchored đều dùng được index multikey
+    """
+    tokens = search_tokens(search)
+    if not tokens:
+        # Query chỉ có dấu câu: không khớp VOD nào
+        return {"search_tokens": {"$in": []}}
+    *words, last = tokens
+    conditions = [{"search_tokens": word} for word in words]
+    conditions.append({"search_tokens": {"$regex": f"^{re.escape(last)}"}})
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def _projection(fields: Tuple[str, ...]) -> dict:
+    # Projection rỗng = lấy cả document, nên luôn có _id
+    return {"_id": 1, **{name: 1 for name in fields}}
+
+async def list_vods(
+    search: str = None,
+    limit: int = 10,
+    skip: int = 0,
+    sort_by: str = "release_year",
+    after: Optional[Tuple[Any, ObjectId]] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+) -> List[VodResponse]:
+    """
+    `after` = (sort value, _id) đã decode từ cursor: seek theo compound index (field, _id),
+    không dùng skip nên trang sâu vẫn nhanh như trang đầu.
+    `fields`: chỉ đọc các field này từ Mongo (projection), trả về model rút gọn
+    """
     try:
         # Tạo filter query
         filter_query = {}
         if search:
-            # Sử dụng text search thay vì regex để tối ưu hơn
-            filter_query["$text"] = {"$search": search}
-            logger.debug(f"Text searching VODs with query: {search}")
+            # Tìm theo token đã bỏ dấu thay cho $text (stemming tiếng Anh, không khớp khi gõ không dấu)
+            filter_query.update(_search_filter(search))
+            logger.debug(f"Searching VODs by tokens with query: {search}")
+        if after is not None:
+            filter_query.update(keyset_filter(sort_by, *after))
         
-        # Tạo sort criteria
-        sort_criteria = []
-        if search:
-            # Khi search, sort theo score trước
-            sort_criteria.append(("score", {"$meta": "textScore"}))
+        # Search cũng sort theo sort_by (không còn text score), luôn có _id làm tie-breaker
+        sort_criteria = sort_spec(sort_by)
         
-        if sort_by == "release_year":
-            sort_criteria.append(("release_year", -1))
-        elif sort_by == "title":
-            sort_criteria.append(("title", 1))
+        model, projection = VodResponse, None
+        if fields is not None:
+            # Sort key luôn được đọc (để tạo cursor) nhưng chỉ serialize khi client yêu cầu
+            sort_field = sort_spec(sort_by)[0][0]
+            hidden = () if sort_field == "_id" or sort_field in fields else (sort_field,)
+            model, projection = vod_fields_model(fields, hidden), _projection((*fields, *hidden))
         
         # Execute query với pagination
-        cursor = db.vod_collection.find(filter_query).sort(sort_criteria).skip(skip).limit(limit)
+        cursor = db.vod_collection.find(filter_query, projection).sort(sort_criteria)
+        if after is None and skip:
+            cursor = cursor.skip(skip)
+        cursor = cursor.limit(limit)
         
         results = []
         async for doc in cursor:
-            results.append(VodResponse(**doc))
+            results.append(model(**doc))
         
-        log_msg = f"Database returned {len(results)} VODs (limit: {limit}, skip: {skip})"
+        log_msg = f"Database returned {len(results)} VODs (limit: {limit}, skip: {skip}, cursor: {after is not None})"
         if search:
             log_msg += f" for search: '{search}'"
         logger.debug(log_msg)
@@ -46,14 +93,14 @@ async def list_vods(search: str = None, limit: int = 10, skip: int = 0, sort_by:
 
 async def count_vods(search: str = None) -> int:
     """
-    Đếm tổng số VODs cho pagination
+    Đếm tổng số VODs cho pagination. Không filter thì dùng estimated_document_count
+    (đọc metadata collection, không scan)
     """
     try:
-        filter_query = {}
         if search:
-            filter_query["$text"] = {"$search": search}
-            
-        count = await db.vod_collection.count_documents(filter_query)
+            count = await db.vod_collection.count_documents(_search_filter(search))
+        else:
+            count = await db.vod_collection.estimated_document_count()
         logger.debug(f"Count VODs: {count}")
         return count
     except Exception as e:
@@ -61,12 +108,16 @@ async def count_vods(search: str = None) -> int:
         raise
 
 
-async def get_vod(vod_id: str) -> VodResponse | None:
+async def get_vod(vod_id: str, fields: Optional[Tuple[str, ...]] = None) -> VodResponse | None:
     try:
-        doc = await db.vod_collection.find_one({"_id": ObjectId(vod_id)})
+        if fields is None:
+            model, projection = VodResponse, None
+        else:
+            model, projection = vod_fields_model(fields), _projection(fields)
+        doc = await db.vod_collection.find_one({"_id": ObjectId(vod_id)}, projection)
         if doc:
             logger.debug(f"Found VOD in database: {vod_id}")
-            return VodResponse(**doc)
+            return model(**doc)
         else:
             logger.debug(f"VOD not found in database: {vod_id}")
             return None
@@ -74,9 +125,26 @@ async def get_vod(vod_id: str) -> VodResponse | None:
         logger.error(f"Database error in get_vod({vod_id}): {str(e)}", exc_info=True)
         raise
 
+async def get_vods_by_ids(vod_ids: List[str]) -> List[VodResponse]:
+    """
+    Lấy nhiều VOD trong một query $in (id không hợp lệ bị bỏ qua), thứ tự không đảm bảo
+    """
+    try:
+        object_ids = [ObjectId(vod_id) for vod_id in vod_ids if ObjectId.is_valid(vod_id)]
+        if not object_ids:
+            return []
+        results = []
+        async for doc in db.vod_collection.find({"_id": {"$in": object_ids}}):
+            results.append(VodResponse(**doc))
+        logger.debug(f"Found {len(results)}/{len(object_ids)} VODs by id")
+        return results
+    except Exception as e:
+        logger.error(f"Database error in get_vods_by_ids({len(vod_ids)} ids): {str(e)}", exc_info=True)
+        raise
+
 async def create_vod(v: VodCreate) -> VodResponse:
     try:
-        data = v.model_dump()
+        data = _with_search_fields(v.model_dump())
         res = await db.vod_collection.insert_one(data)
         logger.debug(f"VOD inserted with ID: {res.inserted_id}")
         
@@ -88,7 +156,7 @@ async def create_vod(v: VodCreate) -> VodResponse:
 
 async def update_vod(vod_id: str, v: VodUpdate) -> VodResponse | None:
     try:
-        data = {k: x for k, x in v.model_dump().items() if x is not None}
+        data = _with_search_fields({k: x for k, x in v.model_dump().items() if x is not None})
         doc = await db.vod_collection.find_one_and_update(
             {"_id": ObjectId(vod_id)},
             {"$set": data},
@@ -116,3 +184,95 @@ async def delete_vod(vod_id: str) -> bool:
     except Exception as e:
         logger.error(f"Database error in delete_vod({vod_id}): {str(e)}", exc_info=True)
         raise
+
+async def bulk_upsert_vods(vods: List[VodCreate]) -> dict:
+    """
+    Upsert nhiều VOD trong một lần bulk_write (unordered), key theo url.
+    VOD không có url sẽ được insert mới.
+    Return dict gồm số lượng upserted/modified và index các item bị lỗi
+    """
+    if not vods:
+        return {"upserted": 0, "modified": 0, "matched": 0, "failed": []}
+    try:
+        ops = []
+        for v in vods:
+            data = _with_search_fields(v.model_dump())
+            if v.url:
+                ops.append(UpdateOne({"url": v.url}, {"$set": data}, upsert=True))
+            else:
+                ops.append(InsertOne(data))
+
+        failed = []
+        try:
+            res = await db.vod_collection.bulk_write(ops, ordered=False)
+            details = res.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            failed = [err["index"] for err in details.get("writeErrors", [])]
+            logger.warning(f"Bulk upsert had {len(failed)} failed writes out of {len(ops)}")
+
+        result = {
+            "upserted": details.get("nUpserted", 0) + details.get("nInserted", 0),
+            "modified": details.get("nModified", 0),
+            "matched": details.get("nMatched", 0),
+            "failed": failed,
+        }
+        logger.debug(f"Bulk upserted {len(ops)} VODs: {result}")
+        return result
+    except Exception as e:
+        logger.error(f"Database error in bulk_upsert_vods({len(vods)} items): {str(e)}", exc_info=True)
+        raise
+
+async def suggest_vods(query: str, limit: int = 10) -> List[dict]:
+    """
+    Typeahead: equality trên title_prefixes (multikey index cùng view_count) nên Mongo
+    đọc đúng `limit` entry đã sắp theo view_count, không scan
+    """
+    try:
+        folded = fold_text(query)
+        if not folded:
+            return []
+        prefix = folded[:settings.SUGGEST_MAX_PREFIX].rstrip()
+        # Query dài hơn prefix đã index: lấy dư rồi lọc lại theo cả chuỗi
+        overflow = prefix != folded
+        cursor = db.vod_collection.find(
+            {"title_prefixes": prefix},
+            {"title": 1, "thumbnail_url": 1, "view_count": 1},
+        ).sort([("view_count", -1)]).limit(limit * 5 if overflow else limit)
+        
+        results = []
+        async for doc in cursor:
+            title = fold_text(doc.get("title"))
+            if overflow and not (title.startswith(folded) or f" {folded}" in title):
+                continue
+            results.append(doc)
+            if len(results) == limit:
+                break
+        logger.debug(f"Suggest '{query}' returned {len(results)} VODs")
+        return results
+    except Exception as e:
+        logger.error(f"Database error in suggest_vods({query}): {str(e)}", exc_info=True)
+        raise
+
+async def backfill_search_fields(batch_size: int = 500, missing_only: bool = False) -> int:
+    """
+    Tính lại title_prefixes/search_tokens cho VOD tạo trước khi có các field này
+    (hoặc sau khi đổi SUGGEST_MAX_PREFIX). `missing_only`: chỉ VOD còn thiếu field
+    """
+    try:
+        query = {}
+        if missing_only:
+            query = {"$or": [{"search_tokens": {"$exists": False}}, {"title_prefixes": {"$exists": False}}]}
+        updated, ops = 0, []
+        async for doc in db.vod_collection.find(query, {"title": 1}):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": _with_search_fields({"title": doc.get("title")})}))
+            if len(ops) >= batch_size:
+                updated += (await db.vod_collection.bulk_write(ops, ordered=False)).modified_count
+                ops = []
+        if ops:
+            updated += (await db.vod_collection.bulk_write(ops, ordered=False)).modified_count
+        logger.info(f"Backfilled search fields for {updated} VODs")
+        return updated
+    except Exception as e:
+        logger.error(f"Database error in backfill_search_fields: {str(e)}", exc_info=True)
+        raise
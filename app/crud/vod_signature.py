@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from pymongo import DeleteMany, UpdateOne
+
+import app.db.mongodb as db
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Giới hạn số candidate của MỘT VOD khi tra LSH (band quá phổ biến, ví dụ mô tả rỗng giống nhau)
+MAX_CANDIDATES = 5000
+
+async def bulk_upsert_signatures(docs: List[dict]) -> int:
+    """
+    Upsert MinHash signature + band keys theo url
+    """
+    if not docs:
+        return 0
+    try:
+        now = datetime.utcnow()
+        ops = [UpdateOne({"url": doc["url"]}, {"$set": {**doc, "updated_at": now}}, upsert=True) for doc in docs]
+        res = await db.vod_signature_collection.bulk_write(ops, ordered=False)
+        return res.upserted_count + res.modified_count
+    except Exception as e:
+        logger.error(f"Database error in bulk_upsert_signatures({len(docs)} items): {str(e)}", exc_info=True)
+        raise
+
+async def find_by_bands(band_keys: Iterable[int], limit: int = MAX_CANDIDATES) -> List[dict]:
+    """
+    Các signature chung ít nhất một band (dùng multikey index trên bands), tối đa `limit`
+    """
+    band_keys = list(band_keys)
+    if not band_keys:
+        return []
+    try:
+        # Lấy dư 1 document để biết kết quả có bị cắt hay không
+        cursor = db.vod_signature_collection.find(
+            {"bands": {"$in": band_keys}},
+            {"_id": 0, "url": 1, "signature": 1, "bands": 1},
+        ).limit(limit + 1)
+        candidates = await cursor.to_list(length=limit + 1)
+        if len(candidates) > limit:
+            logger.warning(
+                f"find_by_bands({len(band_keys)} bands) matched more than {limit} signatures, "
+                f"extra candidates are skipped"
+            )
+        return candidates[:limit]
+    except Exception as e:
+        logger.error(f"Database error in find_by_bands({len(band_keys)} bands): {str(e)}", exc_info=True)
+        raise
+
+async def replace_duplicates(urls: List[str], pairs: Dict[Tuple[str, str], float]):
+    """
+    Xóa các cặp nghi trùng cũ của `urls` rồi ghi các cặp mới
+    """
+    try:
+        now = datetime.utcnow()
+        ops = [DeleteMany({"urls": {"$in": urls}})]
+        ops.extend(
+            UpdateOne(
+                {"urls": list(pair)},
+                {"$set": {"urls": list(pair), "similarity": round(score, 4), "detected_at": now}},
+                upsert=True
+            )
+            for pair, score in pairs.items()
+        )
+        await db.vod_duplicate_collection.bulk_write(ops, ordered=True)
+    except Exception as e:
+        logger.error(f"Database error in replace_duplicates({len(urls)} urls): {str(e)}", exc_info=True)
+        raise
+
+async def list_duplicates(min_similarity: float) -> List[dict]:
+    try:
+        cursor = db.vod_duplicate_collection.find(
+            {"similarity": {"$gte": min_similarity}}, {"_id": 0, "urls": 1, "similarity": 1}
+        ).sort("similarity", -1)
+        return await cursor.to_list(length=None)
+    except Exception as e:
+        logger.error(f"Database error in list_duplicates(min_similarity={min_similarity}): {str(e)}", exc_info=True)
+        raise
+
+async def get_titles(urls: List[str]) -> Dict[str, str]:
+    if not urls:
+        return {}
+    try:
+        cursor = db.vod_signature_collection.find({"url": {"$in": urls}}, {"_id": 0, "url": 1, "title": 1})
+        return {doc["url"]: doc.get("title") async for doc in cursor}
+    except Exception as e:
+        logger.error(f"Database error in get_titles({len(urls)} urls): {str(e)}", exc_info=True)
+        raise
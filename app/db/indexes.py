@@ -1,29 +1,163 @@
-from app.db.mongodb import vod_collection
+from app.db.mongodb import (
+    vod_collection, crawl_page_collection, crawl_run_collection, vod_signature_collection, vod_duplicate_collection
+)
+from typing import List
+from pymongo.errors import OperationFailure
+import app.crud.vod as crud_vod
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Index đơn bị index compound cùng prefix thay thế (search_tokens_*, release_year_id)
+REDUNDANT_INDEX_KEYS = [{"search_tokens": 1}, {"release_year": -1}]
+
+class DuplicateVodUrls(Exception):
+    """
+    Còn VOD trùng url nên không tạo được url_unique. `duplicates`: [{"url", "count"}] trùng nhiều nhất trước
+    """
+
+    def __init__(self, duplicates: List[dict]):
+        self.duplicates = duplicates
+        super().__init__(f"{len(duplicates)} urls are shared by several VODs, e.g. {duplicates[0]['url']}")
+
+async def find_duplicate_urls(limit: int = 50) -> List[dict]:
+    """
+    Các url có nhiều hơn một VOD (chỉ đọc, không sửa dữ liệu)
+    """
+    try:
+        pipeline = [
+            {"$match": {"url": {"$type": "string"}}},
+            {"$group": {"_id": "$url", "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": limit},
+        ]
+        return [
+            {"url": group["_id"], "count": group["count"]}
+            async for group in vod_collection.aggregate(pipeline, allowDiskUse=True)
+        ]
+    except Exception as e:
+        logger.error(f"Failed to find duplicate VOD urls: {str(e)}", exc_info=True)
+        raise
+
+async def drop_text_indexes() -> List[str]:
+    """
+    Xoá text index cũ (title, default_language='english'): search đã chuyển sang search_tokens,
+    để lại thì mỗi lần ghi VOD vẫn phải cập nhật index không còn dùng
+    """
+    try:
+        dropped = []
+        async for index in vod_collection.list_indexes():
+            key = dict(index["key"])
+            if "_fts" in key or "text" in key.values():
+                await vod_collection.drop_index(index["name"])
+                dropped.append(index["name"])
+        return dropped
+    except Exception as e:
+        logger.error(f"Failed to drop text indexes: {str(e)}", exc_info=True)
+        raise
+
+async def drop_redundant_indexes() -> List[str]:
+    """
+    Xoá index đơn đã có index compound bắt đầu bằng cùng field: query/sort dùng được index
+    compound, giữ lại chỉ tốn thêm chi phí ghi và RAM
+    """
+    try:
+        dropped = []
+        async for index in vod_collection.list_indexes():
+            if dict(index["key"]) in REDUNDANT_INDEX_KEYS:
+                await vod_collection.drop_index(index["name"])
+                dropped.append(index["name"])
+        return dropped
+    except Exception as e:
+        logger.error(f"Failed to drop redundant indexes: {str(e)}", exc_info=True)
+        raise
+
 async def create_indexes():
     """
     Tạo indexes cho MongoDB để tối ưu truy vấn
     """
     try:
-        # Index cho search theo title với default language
+        dropped = await drop_text_indexes()
+        if dropped:
+            logger.info(f"Dropped obsolete text indexes: {dropped}")
+        dropped = await drop_redundant_indexes()
+        if dropped:
+            logger.info(f"Dropped redundant indexes: {dropped}")
+        
+        # Search theo token title đã bỏ dấu (multikey), thay cho text index default_language='english'.
+        # Compound với sort field để trang kết quả search đọc theo thứ tự sort + cursor như list thường,
+        # query chỉ lọc theo search_tokens cũng dùng được prefix của các index này
         await vod_collection.create_index(
-            [("title", "text")], 
-            default_language='english',
-            language_override='none'  # Không dùng field language trong document
+            [("search_tokens", 1), ("release_year", -1), ("_id", -1)], name="search_tokens_release_year_id"
         )
-        logger.info("Created text index for title field")
+        await vod_collection.create_index([("search_tokens", 1), ("title", 1), ("_id", 1)], name="search_tokens_title_id")
+        logger.info("Created indexes for search_tokens field")
         
-        # Index cho sort theo release_year
-        await vod_collection.create_index([("release_year", -1)])
-        logger.info("Created index for release_year field")
+        # VOD ghi trước khi có search_tokens/title_prefixes không xuất hiện trong search/suggest
+        backfilled = await crud_vod.backfill_search_fields(missing_only=True)
+        if backfilled:
+            logger.info(f"Backfilled search fields for {backfilled} VODs missing them")
+        
+        # Compound index (sort field, _id) cho keyset pagination: seek thẳng tới cursor thay vì skip.
+        # release_year_id cũng phục vụ sort chỉ theo release_year
+        await vod_collection.create_index([("release_year", -1), ("_id", -1)], name="release_year_id")
+        await vod_collection.create_index([("title", 1), ("_id", 1)], name="title_id")
+        logger.info("Created compound indexes for cursor pagination")
+        
+        # Typeahead: equality trên prefix (multikey) rồi đọc theo view_count giảm dần
+        await vod_collection.create_index([("title_prefixes", 1), ("view_count", -1)], name="title_prefixes_view_count")
+        logger.info("Created index for title suggestions")
         
         # Index cho genre
         await vod_collection.create_index([("genres", 1)])
         logger.info("Created index for genres field")
         
+        # Unique index cho url để crawler upsert theo url (bỏ qua document không có url).
+        # Dữ liệu cũ (crawl bằng insert_one) có thể trùng url: không tự xoá VOD ở đây, báo lỗi kèm
+        # danh sách url để dọn bằng migration app.db.migrations.dedupe_vod_urls
+        duplicates = await find_duplicate_urls()
+        if not duplicates:
+            try:
+                await vod_collection.create_index(
+                    [("url", 1)],
+                    unique=True,
+                    partialFilterExpression={"url": {"$type": "string"}},
+                    name="url_unique"
+                )
+                logger.info("Created unique index for url field")
+            except OperationFailure as e:
+                if e.code != 11000:
+                    raise
+                # Có url trùng mới được ghi sau lần kiểm tra
+                duplicates = await find_duplicate_urls()
+                if not duplicates:
+                    raise
+        if duplicates:
+            logger.error(f"Skipped url_unique: {len(duplicates)} duplicate urls, e.g. {duplicates[:5]}")
+        
+        # Metadata crawl tra cứu theo url
+        await crawl_page_collection.create_index([("url", 1)], unique=True)
+        logger.info("Created unique index for crawl_pages.url")
+        
+        # Scheduler recrawl lọc theo thời điểm crawl lần cuối
+        await crawl_page_collection.create_index([("last_crawled_at", 1)])
+        logger.info("Created index for crawl_pages.last_crawled_at")
+        
+        # Lịch sử crawl run: upsert theo job_id, đọc run mới nhất trước
+        await crawl_run_collection.create_index([("job_id", 1)], unique=True)
+        await crawl_run_collection.create_index([("start_time", -1)])
+        logger.info("Created indexes for crawl_runs")
+        
+        # Near-duplicate: signature theo url, tra candidate theo band (multikey), cặp trùng theo url
+        await vod_signature_collection.create_index([("url", 1)], unique=True)
+        await vod_signature_collection.create_index([("bands", 1)])
+        await vod_duplicate_collection.create_index([("urls", 1)])
+        await vod_duplicate_collection.create_index([("similarity", -1)])
+        logger.info("Created indexes for vod_signatures and vod_duplicates")
+        
+        if duplicates:
+            raise DuplicateVodUrls(duplicates)
         logger.info("All indexes created successfully")
         
     except Exception as e:
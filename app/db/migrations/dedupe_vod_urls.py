@@ -0,0 +1,68 @@
+"""
+Migration dọn VOD trùng url (dữ liệu crawl bằng insert_one trước khi có upsert theo url),
+cần chạy trước khi tạo được index url_unique. Mặc định chỉ in danh sách, --apply mới xoá:
+
+    python -m app.db.migrations.dedupe_vod_urls            # xem trước
+    python -m app.db.migrations.dedupe_vod_urls --apply    # giữ VOD mới nhất (_id lớn nhất) cho mỗi url
+
+Signature/cặp nghi trùng lưu theo url nên vẫn đúng với VOD được giữ lại, chỉ cache theo id cần xoá
+"""
+import argparse
+import asyncio
+from typing import List
+
+import app.db.mongodb as db
+from app.core.logging import setup_logging, get_logger
+from app.db.mongodb import check_db_connection, close_db_connection
+from app.db.redis_client import close_redis_connection
+from app.utils.cache import invalidate_vods
+
+setup_logging()
+logger = get_logger(__name__)
+
+async def stale_vod_ids() -> List:
+    """
+    _id của các VOD trùng url, trừ VOD mới nhất của mỗi url
+    """
+    pipeline = [
+        {"$match": {"url": {"$type": "string"}}},
+        {"$group": {"_id": "$url", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    stale = []
+    async for group in db.vod_collection.aggregate(pipeline, allowDiskUse=True):
+        stale.extend(sorted(group["ids"], reverse=True)[1:])
+    return stale
+
+async def dedupe_vod_urls(apply: bool = False, batch_size: int = 1000) -> int:
+    """
+    Trả về số VOD trùng (đã xoá nếu `apply`)
+    """
+    try:
+        stale = await stale_vod_ids()
+        if not apply:
+            logger.info(f"Found {len(stale)} duplicate VODs by url (dry run, nothing deleted)")
+            return len(stale)
+        removed = 0
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            removed += (await db.vod_collection.delete_many({"_id": {"$in": batch}})).deleted_count
+            await invalidate_vods(*[str(vod_id) for vod_id in batch])
+        logger.warning(f"Removed {removed} duplicate VODs by url")
+        return removed
+    except Exception as e:
+        logger.error(f"Failed to dedupe VOD urls: {str(e)}", exc_info=True)
+        raise
+
+async def main(apply: bool):
+    await check_db_connection()
+    try:
+        await dedupe_vod_urls(apply=apply)
+    finally:
+        await close_db_connection()
+        await close_redis_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Xoá VOD trùng url, giữ bản mới nhất")
+    parser.add_argument("--apply", action="store_true", help="Xoá thật (mặc định chỉ đếm)")
+    asyncio.run(main(parser.parse_args().apply))
@@ -7,6 +7,13 @@ logger = get_logger(__name__)
 client = AsyncIOMotorClient(settings.MONGO_URL)
 db = client.vod_db
 vod_collection = db.get_collection("vods")
+# Metadata crawl theo url: ETag/Last-Modified và hash nội dung đã extract
+crawl_page_collection = db.get_collection("crawl_pages")
+# Lịch sử mỗi crawl job: counters, timings theo stage, byte đã tải
+crawl_run_collection = db.get_collection("crawl_runs")
+# MinHash signature + LSH band của VOD và các cặp nghi trùng
+vod_signature_collection = db.get_collection("vod_signatures")
+vod_duplicate_collection = db.get_collection("vod_duplicates")
 
 async def check_db_connection():
     try:
@@ -5,6 +5,8 @@ from app.core.logging import get_logger
 logger = get_logger(__name__)
 
 redis_client = redis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
+# Client trả về bytes nguyên bản cho cache response body (không decode/encode lại)
+redis_raw_client = redis.from_url(settings.REDIS_URL)
 
 async def check_redis_connection():
     try:
@@ -18,6 +20,7 @@ async def check_redis_connection():
 async def close_redis_connection():
     try:
         await redis_client.close()
+        await redis_raw_client.close()
         logger.info("Redis connection closed")
     except Exception as e:
         logger.error(f"Error closing Redis connection: {str(e)}", exc_info=True)
@@ -1,15 +1,32 @@
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.api.v1.endpoints.vod import router as vod_router
-from app.api.v1.endpoints.crawler import router as crawler_router
+from app.api.v1.endpoints.crawler import router as crawler_router, get_recrawl_scheduler
+import app.crud.vod as crud_vod
+from app.core.config import settings
 from app.core.logging import setup_logging, get_logger
 from app.db.mongodb import check_db_connection, close_db_connection
 from app.db.redis_client import check_redis_connection, close_redis_connection
+from app.services.http_client import init_http_client, close_http_client
+from app.services.extractor import shutdown_extract_pool
+from app.utils.cache import invalidate_vods, start_invalidation_listener, stop_invalidation_listener
 
 # Setup logging
 setup_logging()
 logger = get_logger(__name__)
 
+async def backfill_search_fields():
+    """
+    VOD cũ chưa có search_tokens/title_prefixes không xuất hiện trong search/suggest.
+    Chỉ query VOD còn thiếu field nên sau lần đầu gần như không tốn gì
+    """
+    try:
+        if await crud_vod.backfill_search_fields(missing_only=True):
+            await invalidate_vods()
+    except Exception as e:
+        logger.error(f"Search field backfill failed: {str(e)}", exc_info=True)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -23,11 +40,28 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to connect to database")
     if not redis_conn:
         logger.error("Failed to connect to Redis")
+
+    # Nhận invalidation của local cache từ các worker khác
+    start_invalidation_listener()
+    # Chạy nền để không chặn startup
+    backfill = asyncio.create_task(backfill_search_fields())
+    # HTTP client dùng chung cho crawler
+    await init_http_client()
+    # Recrawl định kỳ (chỉ một replica chạy nhờ lock trong Redis)
+    if settings.CRAWLER_RECRAWL_ENABLED:
+        get_recrawl_scheduler().start()
     yield
     # Shutdown
     logger.info("VOD Service API is shutting down...")
+    backfill.cancel()
+    await asyncio.gather(backfill, return_exceptions=True)
+    if settings.CRAWLER_RECRAWL_ENABLED:
+        await get_recrawl_scheduler().stop()
+    await stop_invalidation_listener()
     await close_db_connection()
     await close_redis_connection()
+    await close_http_client()
+    shutdown_extract_pool()
 
 app = FastAPI(title="VOD Service API", lifespan=lifespan)
 
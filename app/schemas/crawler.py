@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field, HttpUrl
 
 class RawMovieData(BaseModel):
@@ -43,15 +43,79 @@ class ProcessedMovieData(BaseModel):
     age_rating: Optional[str] = None
     access_type:Optional[str] = None
 
+class StageStatus(BaseModel):
+    """
+    Schema cho trạng thái một stage của crawl pipeline
+    """
+    workers: int
+    busy_workers: int = 0
+    queue_depth: int = 0
+    queue_size: int = 0
+    processed: int = 0
+    failed: int = 0
+    items_per_sec: float = 0.0
+    latency: Optional[Dict[str, Any]] = None  # Histogram thời gian xử lý mỗi item (giây)
+
+class HostRateStatus(BaseModel):
+    """
+    Schema cho rate limit hiệu dụng của một host
+    """
+    rate: float  # request/giây
+    requests: int = 0
+    throttled: int = 0  # Số response 429
+    errors: int = 0  # 5xx hoặc lỗi kết nối
+    latency_ewma: Optional[float] = None
+    workers: Optional[int] = None
+
+class FetchStatus(BaseModel):
+    """
+    Schema cho thống kê request của một worker
+    """
+    requests: int = 0
+    retries: int = 0
+    hedged: int = 0  # Số lần gửi hedged request
+    hedge_wins: int = 0  # Số lần hedged request về trước
+    bytes: int = 0  # Body sau khi giải nén
+    bytes_downloaded: int = 0  # Byte thực tế trên network
+    latency_p95: Optional[float] = None
+
+class WorkerStatus(BaseModel):
+    """
+    Schema cho heartbeat của một crawl worker
+    """
+    worker_id: str
+    current_url: Optional[str] = None
+    concurrency: int = 0
+    pending_writes: int = 0
+    stages: Optional[Dict[str, StageStatus]] = Field(default_factory=dict)
+    rate_limits: Optional[Dict[str, HostRateStatus]] = Field(default_factory=dict)
+    fetch: Optional[FetchStatus] = None
+    bulk_write: Optional[Dict[str, Any]] = None
+    updated_at: Optional[str] = None
+
 class CrawlStatus(BaseModel):
     """
     Schema cho trạng thái crawling
     """
+    job_id: Optional[str] = None
     total_urls: int
     processed: int
     failed: int
-    status: str  # "idle", "running", "completed", "failed"
+    unchanged: int = 0  # 304 Not Modified, không parse/ghi DB
+    skipped: int = 0  # Hash nội dung không đổi, không ghi DB
+    status: str  # "idle", "running", "interrupted", "completed", "failed"
     current_url: Optional[str] = None
     start_time: Optional[str] = None
     end_time: Optional[str] = None
+    checkpoint_time: Optional[str] = None
     errors: Optional[List[str]] = Field(default_factory=list)
+    concurrency: Optional[int] = None
+    pages_per_sec: Optional[float] = None  # Throughput (processed + failed) / giây
+    stages: Optional[Dict[str, StageStatus]] = Field(default_factory=dict)
+    pending_writes: int = 0  # VOD đang chờ bulk upsert
+    frontier_size: int = 0  # URL chờ crawl trong Redis
+    in_flight: int = 0  # URL worker đang xử lý
+    workers: Optional[List[WorkerStatus]] = Field(default_factory=list)
+    rate_limits: Optional[Dict[str, HostRateStatus]] = Field(default_factory=dict)  # Rate hiệu dụng theo host
+    fetch: Optional[Dict[str, int]] = Field(default_factory=dict)  # requests, retries, bytes... của run hiện tại
+    bulk_write: Optional[Dict[str, Any]] = None  # Histogram thời gian mỗi batch bulk upsert
@@ -1,6 +1,9 @@
-from typing import List, Optional, Generic, TypeVar
-from pydantic import BaseModel, Field, ConfigDict, BeforeValidator, field_validator
+from functools import lru_cache
+from typing import List, Optional, Generic, Tuple, Type, TypeVar
+from pydantic import BaseModel, Field, ConfigDict, BeforeValidator, create_model, field_validator
+from pydantic.fields import FieldInfo
 from typing_extensions import Annotated
+from app.core.config import settings
 from app.utils.data_utils import objectid_str
 
 ObjectIdStr = Annotated[str, BeforeValidator(objectid_str)]
@@ -49,27 +52,46 @@ class VodResponse(VodBase):
    id: ObjectIdStr = Field(..., alias="_id")
    model_config = ConfigDict(populate_by_name=True)
 
-# Schema cho pagination response
-# T = TypeVar('T')
+class VodSuggestion(BaseModel):
+    id: ObjectIdStr = Field(..., alias="_id")
+    title: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    view_count: Optional[int] = 0
+    model_config = ConfigDict(populate_by_name=True)
 
-# class PaginatedResponse(BaseModel, Generic[T]):
-#     items: List[T]
-#     total: int
-#     page: int
-#     limit: int
-#     total_pages: int
-    
-#     @classmethod
-#     def create(cls, items: List[T], total: int, page: int, limit: int):
-#         total_pages = (total + limit - 1) // limit  # Ceiling division
-#         return cls(
-#             items=items,
-#             total=total,
-#             page=page, 
-#             limit=limit,
-#             total_pages=total_pages
-#         )
+# Field client chọn được qua fields= (id luôn có)
+VOD_FIELDS = tuple(name for name in VodResponse.model_fields if name != "id")
 
+@lru_cache(maxsize=128)
+def vod_fields_model(fields: Tuple[str, ...], hidden: Tuple[str, ...] = ()) -> Type[BaseModel]:
+    """
+    Model rút gọn của VodResponse chỉ gồm id + `fields` (giữ nguyên validator/constraint).
+    `hidden`: field cần đọc (vd. sort key để tạo cursor) nhưng không serialize ra response
+    """
+    definitions = {}
+    for name in ("id", *fields, *hidden):
+        info = VodResponse.model_fields[name]
+        if name in hidden:
+            info = FieldInfo.merge_field_infos(info, exclude=True)
+        definitions[name] = (info.annotation, info)
+    return create_model("VodFields", __config__=ConfigDict(populate_by_name=True), **definitions)
 
+class VodBatchRequest(BaseModel):
+    ids: List[Annotated[str, Field(max_length=24)]] = Field(..., min_length=1, max_length=settings.VOD_BATCH_MAX_IDS)
+
+class VodBatchResponse(BaseModel):
+    # Theo thứ tự ids trong request (bỏ id trùng), id không tồn tại nằm trong missing
+    items: List[VodResponse]
+    missing: List[str]
+
+# Schema cho pagination response
+T = TypeVar('T')
 
-    
\ No newline at end of file
+class PaginatedResponse(BaseModel, Generic[T]):
+    items: List[T]
+    total: int
+    # None khi phân trang bằng cursor (after=)
+    page: Optional[int]
+    limit: int
+    total_pages: int
+    next_cursor: Optional[str] = None
@@ -0,0 +1,95 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+from app.core.logging import get_logger
+from app.services.crawl_metrics import LatencyHistogram
+
+logger = get_logger(__name__)
+
+FlushFn = Callable[[List[Any]], Awaitable[dict]]
+FlushCallback = Callable[[List[Any], dict], Any]
+ErrorCallback = Callable[[List[Any], Exception], Any]
+
+class BulkWriter:
+    """
+    Buffer các item và ghi theo batch: flush khi đủ `batch_size` item
+    hoặc sau mỗi `flush_interval` giây, tùy điều kiện nào đến trước
+    """
+
+    def __init__(
+        self,
+        flush_fn: FlushFn,
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+        on_flush: Optional[FlushCallback] = None,
+        on_error: Optional[ErrorCallback] = None,
+    ):
+        self.flush_fn = flush_fn
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.on_error = on_error
+        self._buffer: List[Any] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.written = 0
+        # Thời gian mỗi lần gọi flush_fn (một batch)
+        self.latency = LatencyHistogram()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def start(self):
+        if self._timer is None and self.flush_interval > 0:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def add(self, item: Any):
+        self._buffer.append(item)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                await self._write(batch)
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+            self._timer = None
+        await self.flush()
+
+    async def _write(self, batch: List[Any]):
+        started = time.monotonic()
+        try:
+            result = await self.flush_fn(batch)
+            self.latency.observe(time.monotonic() - started)
+            self.flushes += 1
+            self.written += len(batch) - len(result.get("failed", []))
+            if self.on_flush is not None:
+                await _maybe_await(self.on_flush(batch, result))
+        except Exception as e:
+            self.latency.observe(time.monotonic() - started)
+            logger.error(f"Bulk write of {len(batch)} items failed: {str(e)}", exc_info=True)
+            if self.on_error is not None:
+                await _maybe_await(self.on_error(batch, e))
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._buffer:
+                await self.flush()
+
+async def _maybe_await(value):
+    if inspect.isawaitable(value):
+        await value
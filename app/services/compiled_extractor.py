@@ -0,0 +1,245 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from selectolax.lexbor import LexborHTMLParser, LexborNode
+
+from app.schemas.crawler import RawMovieData
+
+# Selector đơn giản: tag.class#id, nối với nhau bằng descendant combinator (dấu cách)
+_COMPOUND_RE = re.compile(r'^(?P<tag>[a-zA-Z][a-zA-Z0-9-]*)?(?P<rest>(?:[.#][\w-]+)*)$')
+
+PostProcessor = Callable[[LexborNode], Any]
+
+def text(node: LexborNode) -> Optional[str]:
+    value = node.text().strip()
+    return value or None
+
+def attr(name: str) -> PostProcessor:
+    def _get(node: LexborNode) -> Optional[str]:
+        return node.attributes.get(name) or None
+    return _get
+
+class _Compound:
+    __slots__ = ("tag", "id", "classes")
+
+    def __init__(self, raw: str):
+        match = _COMPOUND_RE.match(raw)
+        if not match:
+            raise ValueError(f"Unsupported selector part: '{raw}'")
+        self.tag = match.group("tag")
+        self.id = None
+        classes = []
+        for token in re.findall(r'[.#][\w-]+', match.group("rest")):
+            if token[0] == "#":
+                self.id = token[1:]
+            else:
+                classes.append(token[1:])
+        self.classes = frozenset(classes)
+
+    def matches(self, node: LexborNode) -> bool:
+        if self.tag and node.tag != self.tag:
+            return False
+        if self.id and node.id != self.id:
+            return False
+        if self.classes:
+            class_attr = node.attrs.get("class")
+            if not class_attr or not self.classes.issubset(class_attr.split()):
+                return False
+        return True
+
+class CompiledSelector:
+    """
+    Selector đã parse sẵn, dùng để biết node trả về từ selector group thuộc field nào
+    """
+
+    def __init__(self, selector: str):
+        self.selector = selector
+        self._parts = [_Compound(part) for part in selector.split()]
+
+    def matches(self, node: LexborNode) -> bool:
+        parts = self._parts
+        if not parts[-1].matches(node):
+            return False
+        index = len(parts) - 2
+        parent = _parent(node)
+        while index >= 0 and parent is not None:
+            if parts[index].matches(parent):
+                index -= 1
+            parent = _parent(parent)
+        return index < 0
+
+class FieldSpec:
+    """
+    field -> selector -> post-processor. `many=True` lấy tất cả node theo thứ tự, ngược lại lấy node đầu tiên
+    """
+
+    def __init__(self, name: str, selector: str, post: PostProcessor = text, many: bool = False):
+        self.name = name
+        self.selector = selector
+        self.post = post
+        self.many = many
+        self.compiled = CompiledSelector(selector)
+
+class GroupSpec:
+    """
+    Các node con (label, link...) được gom theo container gần nhất, ví dụ từng `.tags-group`
+    """
+
+    def __init__(self, name: str, container: str, children: Dict[str, Tuple[str, PostProcessor]]):
+        self.name = name
+        self.container = CompiledSelector(container)
+        self.children = {
+            key: (CompiledSelector(f"{container} {selector}"), post)
+            for key, (selector, post) in children.items()
+        }
+
+    @property
+    def selectors(self) -> List[str]:
+        return [self.container.selector] + [compiled.selector for compiled, _ in self.children.values()]
+
+class CompiledSpec:
+    """
+    Gộp toàn bộ spec thành một selector group: lexbor duyệt DOM một lần và trả về
+    các node theo thứ tự document, sau đó chỉ cần phân loại các node đã match.
+    """
+
+    def __init__(self, fields: List[FieldSpec], groups: List[GroupSpec]):
+        self.fields = fields
+        self.groups = groups
+        selectors = [spec.selector for spec in fields]
+        for group in groups:
+            selectors.extend(group.selectors)
+        self.selector_group = ", ".join(selectors)
+
+    def apply(self, tree: LexborHTMLParser) -> Dict[str, Any]:
+        result: Dict[str, Any] = {spec.name: [] if spec.many else None for spec in self.fields}
+        current: Dict[str, Optional[dict]] = {group.name: None for group in self.groups}
+        containers: Dict[str, int] = {}
+        for group in self.groups:
+            result[group.name] = []
+
+        last_id = None
+        for node in tree.css(self.selector_group):
+            # Node match nhiều selector sẽ xuất hiện liên tiếp nhiều lần
+            node_id = node.mem_id
+            if node_id == last_id:
+                continue
+            last_id = node_id
+
+            for spec in self.fields:
+                if not spec.many and result[spec.name] is not None:
+                    continue
+                if spec.compiled.matches(node):
+                    value = spec.post(node)
+                    if spec.many:
+                        result[spec.name].append(value)
+                    else:
+                        result[spec.name] = value
+
+            for group in self.groups:
+                if group.container.matches(node):
+                    entry = {key: [] for key in group.children}
+                    current[group.name] = entry
+                    containers[group.name] = node_id
+                    result[group.name].append(entry)
+                    continue
+                entry = current[group.name]
+                if entry is None:
+                    continue
+                for key, (compiled, post) in group.children.items():
+                    if compiled.matches(node) and _has_ancestor(node, containers[group.name]):
+                        entry[key].append(post(node))
+        return result
+
+def _parent(node: LexborNode) -> Optional[LexborNode]:
+    # Không đi lên node document (lexbor crash khi đọc attribute của node này)
+    parent = node.parent
+    if parent is None:
+        return None
+    tag = parent.tag
+    if not tag or tag.startswith("#"):
+        return None
+    return parent
+
+def _has_ancestor(node: LexborNode, mem_id: int) -> bool:
+    parent = _parent(node)
+    while parent is not None:
+        if parent.mem_id == mem_id:
+            return True
+        parent = _parent(parent)
+    return False
+
+VIEON_DETAIL_SPEC = CompiledSpec(
+    fields=[
+        FieldSpec("title", "h2.card__title"),
+        FieldSpec("description", ".intro__info__desc"),
+        FieldSpec("rating", "span.rating__summary"),
+        FieldSpec("view_count", ".viewer .viewer__summary"),
+        FieldSpec("thumbnail_url", "section.section--vod-detail img.billboard__image__hero", post=attr("src")),
+        FieldSpec("video_url", "video#VIE_PLAYER", post=attr("src")),
+        FieldSpec("info_tags", ".intro__info .intro__info-left .Tag_Base__Jb03L span", many=True),
+    ],
+    groups=[
+        GroupSpec("tag_groups", ".intro__info .intro__info-right .tags-group", {
+            "label": ("label", text),
+            "links": ("a", text),
+        }),
+    ],
+)
+
+def _metadata_from_info_tags(tags: List[Optional[str]]) -> dict:
+    """
+    Các tag bên trái không có class riêng nên map theo vị trí
+    (năm/access_type, độ tuổi, quốc gia, thời lượng, chất lượng)
+    """
+    result = {'access_type': 'free'}
+    for i, value in enumerate(tags):
+        value = value or ""
+        if i == 0:
+            if len(value) == 4 and value.startswith('20'):
+                result['release_year'] = value
+            else:
+                result['access_type'] = value
+        elif i == 1:
+            result['age_rating'] = value
+        elif i == 2:
+            result['country'] = value
+        elif i == 3:
+            result['duration'] = value
+        else:
+            result['video_quality'] = value
+    return result
+
+def _metadata_from_tag_groups(groups: List[dict]) -> dict:
+    result = {'genre': [], 'director': None, 'actors': None}
+    for group in groups:
+        if not group["label"]:
+            continue
+        label = group["label"][0] or ""
+        links = [link for link in group["links"] if link]
+        if label.startswith("Đạo diễn"):
+            result['director'] = links[0] if links else None
+        elif label.startswith("Thể loại"):
+            result['genre'] = links
+        elif label.startswith("Diễn viên"):
+            result['actors'] = links or None
+    return result
+
+def extract_movie_compiled(url: str, html: str | bytes) -> RawMovieData:
+    """
+    Extract toàn bộ RawMovieData trong một lần duyệt DOM
+    """
+    tree = LexborHTMLParser(html)
+    values = VIEON_DETAIL_SPEC.apply(tree)
+    metadata = _metadata_from_info_tags(values["info_tags"])
+    metadata.update(_metadata_from_tag_groups(values["tag_groups"]))
+    return RawMovieData(
+        url=url,
+        title=values["title"],
+        description=values["description"],
+        rating=values["rating"],
+        view_count=values["view_count"],
+        thumbnail_url=values["thumbnail_url"],
+        video_url=values["video_url"],
+        **metadata,
+    )
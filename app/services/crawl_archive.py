@@ -0,0 +1,181 @@
+import asyncio
+import gzip
+import io
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Chỉ giữ các response header cần cho replay/conditional request
+ARCHIVED_HEADERS = ("content-type", "etag", "last-modified")
+
+class ArchiveRecord:
+    """
+    Một response đã lưu trong archive
+    """
+    __slots__ = ("url", "status_code", "headers", "body", "fetched_at")
+
+    def __init__(self, url: str, status_code: int, headers: Dict[str, str], body: bytes, fetched_at: Optional[str] = None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.fetched_at = fetched_at
+
+def _encode_record(record: ArchiveRecord) -> bytes:
+    """
+    Format giống WARC 1.1 (record "response"): WARC header, HTTP status line + header, body
+    """
+    http_head = f"HTTP/1.1 {record.status_code}\r\n"
+    for name, value in record.headers.items():
+        http_head += f"{name}: {value}\r\n"
+    payload = http_head.encode("utf-8") + b"\r\n" + record.body
+    warc_head = (
+        "WARC/1.1\r\n"
+        "WARC-Type: response\r\n"
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+        f"WARC-Target-URI: {record.url}\r\n"
+        f"WARC-Date: {record.fetched_at}\r\n"
+        "Content-Type: application/http; msgtype=response\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        "\r\n"
+    )
+    return warc_head.encode("utf-8") + payload + b"\r\n\r\n"
+
+def _read_headers(stream) -> Optional[Dict[str, str]]:
+    headers: Dict[str, str] = {}
+    line = stream.readline()
+    if not line:
+        return None
+    while True:
+        line = stream.readline()
+        if not line or line in (b"\r\n", b"\n"):
+            return headers
+        name, _, value = line.decode("utf-8").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+def _read_record(stream) -> Optional[ArchiveRecord]:
+    warc_headers = _read_headers(stream)
+    if warc_headers is None:
+        return None
+    payload = stream.read(int(warc_headers["content-length"]))
+    stream.read(4)  # \r\n\r\n cuối record
+
+    head, _, body = payload.partition(b"\r\n\r\n")
+    lines = head.decode("utf-8").split("\r\n")
+    status_code = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return ArchiveRecord(warc_headers["warc-target-uri"], status_code, headers, body, warc_headers.get("warc-date"))
+
+class ArchiveWriter:
+    """
+    Ghi append-only vào file .warc.gz, mỗi record là một gzip member riêng (đọc tuần tự
+    bằng gzip thông thường hoặc seek thẳng tới record). Index `<path>.idx` lưu url, offset, length.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.records = 0
+        self.bytes_written = 0
+        self._lock = asyncio.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "ab")
+        self._index = open(self.index_path, "a", encoding="utf-8")
+
+    def write_record(self, record: ArchiveRecord):
+        data = gzip.compress(_encode_record(record), compresslevel=6)
+        offset = self._file.tell()
+        self._file.write(data)
+        self._file.flush()
+        self._index.write(f"{record.url}\t{offset}\t{len(data)}\n")
+        self._index.flush()
+        self.records += 1
+        self.bytes_written += len(data)
+
+    async def write(self, url: str, status_code: int, headers, body: bytes):
+        """
+        Nén và ghi trong thread để không block event loop
+        """
+        record = ArchiveRecord(
+            url,
+            status_code,
+            {name: headers[name] for name in ARCHIVED_HEADERS if headers.get(name)},
+            body,
+            datetime.now(timezone.utc).isoformat(),
+        )
+        async with self._lock:
+            await asyncio.to_thread(self.write_record, record)
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+        logger.info(f"Archived {self.records} pages to {self.path} ({self.bytes_written} bytes)")
+
+class ArchiveReader:
+    """
+    Đọc archive: tuần tự toàn bộ record hoặc lấy record mới nhất của một URL qua index
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = f"{path}.idx"
+
+    def __iter__(self) -> Iterator[ArchiveRecord]:
+        # gzip đọc liền các member nối tiếp nhau như một stream
+        with gzip.open(self.path, "rb") as stream:
+            while True:
+                try:
+                    record = _read_record(stream)
+                except (EOFError, KeyError, ValueError, IndexError) as e:
+                    # Record cuối bị ghi dở (process bị kill)
+                    logger.warning(f"Stopped reading truncated archive {self.path}: {str(e)}")
+                    return
+                if record is None:
+                    return
+                yield record
+
+    def load_index(self) -> Dict[str, tuple]:
+        """
+        url -> (offset, length) của record mới nhất
+        """
+        index: Dict[str, tuple] = {}
+        if not os.path.exists(self.index_path):
+            return index
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) == 3:
+                    index[parts[0]] = (int(parts[1]), int(parts[2]))
+        return index
+
+    def get(self, url: str, index: Optional[Dict[str, tuple]] = None) -> Optional[ArchiveRecord]:
+        entry = (index if index is not None else self.load_index()).get(url)
+        if entry is None:
+            return None
+        offset, length = entry
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = gzip.decompress(f.read(length))
+        return _read_record(io.BytesIO(data))
+
+def iter_archives(paths: List[str]) -> Iterator[ArchiveRecord]:
+    """
+    Đọc lần lượt nhiều archive; path là thư mục thì đọc mọi file .warc.gz bên trong
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith(".warc.gz")
+            )
+        else:
+            files = [path]
+        for file in files:
+            yield from ArchiveReader(file)
@@ -0,0 +1,93 @@
+import bisect
+from typing import Dict, Iterable, List, Optional
+
+# Upper bound (giây) của các bucket latency, bucket cuối là +Inf
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+def _bucket_label(bound: Optional[float]) -> str:
+    return "+Inf" if bound is None else f"{bound:g}"
+
+class LatencyHistogram:
+    """
+    Histogram latency với bucket cố định (kiểu Prometheus) nên cộng dồn được giữa các worker/run
+    """
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Upper bound của bucket chứa percentile q (không vượt quá max đã thấy)
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                bound = self.bounds[index] if index < len(self.bounds) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        def rounded(value):
+            return round(value, 4) if value is not None else None
+        return {
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "mean": rounded(self.total / self.count if self.count else None),
+            "max": round(self.max, 4),
+            "p50": rounded(self.percentile(0.5)),
+            "p95": rounded(self.percentile(0.95)),
+            "p99": rounded(self.percentile(0.99)),
+            "buckets": {
+                _bucket_label(self.bounds[i] if i < len(self.bounds) else None): count
+                for i, count in enumerate(self.counts)
+            },
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> "LatencyHistogram":
+        histogram = cls()
+        labels = [_bucket_label(bound) for bound in histogram.bounds] + ["+Inf"]
+        buckets = snapshot.get("buckets") or {}
+        histogram.counts = [int(buckets.get(label, 0)) for label in labels]
+        histogram.count = int(snapshot.get("count", 0))
+        histogram.total = float(snapshot.get("sum", 0.0))
+        histogram.max = float(snapshot.get("max", 0.0))
+        return histogram
+
+    def merge(self, other: "LatencyHistogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+def merge_histograms(snapshots: List[dict]) -> dict:
+    """
+    Gộp snapshot histogram của nhiều worker
+    """
+    merged = LatencyHistogram()
+    for snapshot in snapshots:
+        if snapshot:
+            merged.merge(LatencyHistogram.from_snapshot(snapshot))
+    return merged.snapshot()
+
+def summarize_latency(snapshot: Optional[dict]) -> Dict[str, Optional[float]]:
+    """
+    Bản rút gọn (không có buckets) để hiển thị trong danh sách run
+    """
+    snapshot = snapshot or {}
+    return {key: snapshot.get(key) for key in ("count", "mean", "p50", "p95", "p99", "max")}
@@ -0,0 +1,156 @@
+import asyncio
+import inspect
+import time
+from typing import Any, AsyncIterable, Callable, Iterable, List, Optional, Union
+
+from app.core.logging import get_logger
+from app.services.crawl_metrics import LatencyHistogram
+
+logger = get_logger(__name__)
+
+# Sentinel báo cho worker của stage biết không còn item
+_STOP = object()
+
+StageHandler = Callable[[Any], Any]
+ErrorHandler = Callable[[str, Any, Exception], Any]
+
+class PipelineStage:
+    """
+    Một stage của pipeline: queue đầu vào có giới hạn + N worker
+    """
+
+    def __init__(self, name: str, handler: StageHandler, workers: int = 1, queue_size: Optional[int] = None):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        # None = dùng queue_size chung của pipeline
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+        # Thời gian xử lý mỗi item của handler
+        self.latency = LatencyHistogram()
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def reset(self, queue_size: int):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+        self.latency = LatencyHistogram()
+        self._started_at = time.monotonic()
+        self._finished_at = None
+
+    def snapshot(self) -> dict:
+        elapsed = 0.0
+        if self._started_at is not None:
+            elapsed = (self._finished_at or time.monotonic()) - self._started_at
+        return {
+            "workers": self.workers,
+            "busy_workers": self.busy,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_size": self.queue.maxsize if self.queue else 0,
+            "processed": self.processed,
+            "failed": self.failed,
+            "items_per_sec": round(self.processed / elapsed, 3) if elapsed > 0 else 0.0,
+            "latency": self.latency.snapshot(),
+        }
+
+class CrawlPipeline:
+    """
+    Pipeline nhiều stage nối với nhau bằng asyncio.Queue có giới hạn.
+
+    Mỗi handler nhận item từ stage trước và trả về item cho stage sau
+    (trả về None để bỏ item). Queue đầy sẽ chặn stage phía trước (backpressure)
+    nên bộ nhớ không tăng theo kích thước frontier.
+    """
+
+    def __init__(
+        self,
+        stages: List[PipelineStage],
+        queue_size: int = 100,
+        on_error: Optional[ErrorHandler] = None,
+    ):
+        if not stages:
+            raise ValueError("Pipeline requires at least one stage")
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error
+
+    async def run(self, items: Union[Iterable[Any], AsyncIterable[Any]]):
+        """
+        Đẩy toàn bộ items (iterable hoặc async iterable) qua pipeline và chờ đến khi stage cuối xử lý xong
+        """
+        for stage in self.stages:
+            stage.reset(stage.queue_size or self.queue_size)
+
+        tasks = []
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            tasks.append(asyncio.create_task(self._run_stage(stage, next_stage)))
+
+        first = self.stages[0]
+        try:
+            if hasattr(items, "__aiter__"):
+                async for item in items:
+                    await first.queue.put(item)
+            else:
+                for item in items:
+                    await first.queue.put(item)
+            for _ in range(first.workers):
+                await first.queue.put(_STOP)
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _run_stage(self, stage: PipelineStage, next_stage: Optional[PipelineStage]):
+        workers = [
+            asyncio.create_task(self._stage_worker(stage, next_stage))
+            for _ in range(stage.workers)
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            stage._finished_at = time.monotonic()
+
+        # Tất cả worker của stage đã xong -> báo cho stage tiếp theo
+        if next_stage is not None:
+            for _ in range(next_stage.workers):
+                await next_stage.queue.put(_STOP)
+
+    async def _stage_worker(self, stage: PipelineStage, next_stage: Optional[PipelineStage]):
+        while True:
+            item = await stage.queue.get()
+            if item is _STOP:
+                return
+
+            stage.busy += 1
+            started = time.monotonic()
+            try:
+                result = stage.handler(item)
+                if inspect.isawaitable(result):
+                    result = await result
+                stage.processed += 1
+            except Exception as e:
+                stage.failed += 1
+                result = None
+                if self.on_error is not None:
+                    handled = self.on_error(stage.name, item, e)
+                    if inspect.isawaitable(handled):
+                        await handled
+                else:
+                    logger.error(f"Pipeline stage '{stage.name}' failed: {str(e)}", exc_info=True)
+            finally:
+                stage.busy -= 1
+                stage.latency.observe(time.monotonic() - started)
+
+            if result is not None and next_stage is not None:
+                await next_stage.queue.put(result)
+
+    def snapshot(self) -> dict:
+        return {stage.name: stage.snapshot() for stage in self.stages}
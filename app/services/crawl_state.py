@@ -0,0 +1,375 @@
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from redis.exceptions import WatchError
+
+from app.db.redis_client import redis_client
+from app.core.logging import get_logger
+from app.services.crawl_metrics import merge_histograms
+
+logger = get_logger(__name__)
+
+# Key layout
+#   crawl:current_job                 -> job id gần nhất (để đọc status sau khi xong)
+#   crawl:running_job                 -> job id đang chạy (SET NX, tránh start 2 job cùng lúc)
+#   crawl:job:{id}:status             -> hash counters + thông tin job (HINCRBY atomic)
+#   crawl:job:{id}:frontier           -> list URL chờ crawl
+#   crawl:job:{id}:processing:{worker_id} -> list URL worker đang xử lý (chưa checkpoint),
+#                                        worker hết heartbeat thì list được đẩy lại frontier
+#   crawl:job:{id}:done               -> set URL đã xong (được ghi khi checkpoint)
+#   crawl:job:{id}:errors             -> list lỗi gần nhất (giới hạn MAX_ERRORS)
+#   crawl:job:{id}:workers            -> set worker id
+#   crawl:job:{id}:worker:{worker_id} -> heartbeat JSON của worker (có TTL)
+CURRENT_JOB_KEY = "crawl:current_job"
+RUNNING_JOB_KEY = "crawl:running_job"
+MAX_ERRORS = 200
+JOB_TTL = 7 * 24 * 3600
+
+COUNTER_FIELDS = ("processed", "failed", "unchanged", "skipped")
+
+def _job_key(job_id: str, suffix: str) -> str:
+    return f"crawl:job:{job_id}:{suffix}"
+
+def _processing_key(job_id: str, worker_id: str) -> str:
+    return _job_key(job_id, f"processing:{worker_id}")
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class CrawlJobAlreadyRunning(Exception):
+    pass
+
+class CrawlJobNotResumable(Exception):
+    pass
+
+class RedisCrawlState:
+    """
+    Trạng thái crawl job dùng chung giữa các worker/API replica qua Redis
+    """
+
+    def __init__(self, client=None):
+        self.redis = client or redis_client
+
+    async def create_job(self, urls: List[str]) -> dict:
+        """
+        Tạo job mới và đẩy toàn bộ URL (đã bỏ trùng) vào frontier. Trả về job_id và total_urls
+        """
+        # dict.fromkeys: bỏ URL trùng nhưng giữ thứ tự, total_urls phải khớp số URL sẽ checkpoint
+        urls = list(dict.fromkeys(urls))
+        job_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        if not await self.redis.set(RUNNING_JOB_KEY, job_id, nx=True):
+            raise CrawlJobAlreadyRunning(await self.redis.get(RUNNING_JOB_KEY))
+
+        status_key = _job_key(job_id, "status")
+        frontier_key = _job_key(job_id, "frontier")
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(status_key, mapping={
+            "job_id": job_id,
+            "status": "running",
+            "total_urls": len(urls),
+            "done": 0,
+            **{field: 0 for field in COUNTER_FIELDS},
+            "start_time": datetime.now().isoformat(),
+            "start_ts": time.time(),
+        })
+        for start in range(0, len(urls), 1000):
+            pipe.rpush(frontier_key, *urls[start:start + 1000])
+        pipe.set(CURRENT_JOB_KEY, job_id)
+        for suffix in ("status", "frontier"):
+            pipe.expire(_job_key(job_id, suffix), JOB_TTL)
+        await pipe.execute()
+        logger.info(f"Created crawl job {job_id} with {len(urls)} URLs")
+        return {"job_id": job_id, "total_urls": len(urls)}
+
+    async def current_job(self) -> Optional[str]:
+        return await self.redis.get(CURRENT_JOB_KEY)
+
+    async def running_job(self) -> Optional[str]:
+        return await self.redis.get(RUNNING_JOB_KEY)
+
+    async def pop_url(self, job_id: str, worker_id: str) -> Optional[str]:
+        """
+        Lấy một URL từ frontier và chuyển sang processing list của worker (atomic với LMOVE).
+        Worker được ghi vào workers set cùng transaction để reclaim_orphans luôn tìm thấy list này
+        """
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.sadd(_job_key(job_id, "workers"), worker_id)
+        pipe.expire(_job_key(job_id, "workers"), JOB_TTL)
+        pipe.lmove(_job_key(job_id, "frontier"), _processing_key(job_id, worker_id), "LEFT", "RIGHT")
+        return (await pipe.execute())[-1]
+
+    async def frontier_size(self, job_id: str) -> int:
+        return await self.redis.llen(_job_key(job_id, "frontier"))
+
+    async def checkpoint(self, job_id: str, worker_id: str, outcomes: Dict[str, List[str]], errors: Iterable[str] = ()):
+        """
+        Ghi nhận kết quả của các URL trong một transaction: tăng counter, thêm vào done set,
+        bỏ khỏi processing, lưu lỗi. Khi số URL đã xong bằng total_urls thì đánh dấu job completed
+        """
+        errors = list(errors)
+        urls = [url for batch in outcomes.values() for url in batch]
+        status_key = _job_key(job_id, "status")
+        processing_key = _processing_key(job_id, worker_id)
+        done_key = _job_key(job_id, "done")
+        errors_key = _job_key(job_id, "errors")
+
+        pipe = self.redis.pipeline(transaction=True)
+        for outcome, batch in outcomes.items():
+            if batch:
+                pipe.hincrby(status_key, outcome, len(batch))
+        pipe.hincrby(status_key, "done", len(urls))
+        pipe.hget(status_key, "total_urls")
+        pipe.hset(status_key, "checkpoint_time", datetime.now().isoformat())
+        if urls:
+            pipe.sadd(done_key, *urls)
+            pipe.expire(done_key, JOB_TTL)
+        for url in urls:
+            pipe.lrem(processing_key, 1, url)
+        if errors:
+            pipe.lpush(errors_key, *errors)
+            pipe.ltrim(errors_key, 0, MAX_ERRORS - 1)
+            pipe.expire(errors_key, JOB_TTL)
+        results = await pipe.execute()
+
+        offset = sum(1 for batch in outcomes.values() if batch)
+        done, total = int(results[offset]), int(results[offset + 1] or 0)
+        if urls and done >= total:
+            await self.complete_job(job_id)
+
+    async def complete_job(self, job_id: str, status: str = "completed"):
+        status_key = _job_key(job_id, "status")
+        # Chỉ worker đầu tiên set end_time
+        if await self.redis.hsetnx(status_key, "end_time", datetime.now().isoformat()):
+            await self.redis.hset(status_key, mapping={"status": status, "end_ts": time.time()})
+            await self._release_running(job_id)
+            logger.info(f"Crawl job {job_id} {status}")
+
+    async def _release_running(self, job_id: str):
+        # Chỉ xóa lock nếu vẫn là job này
+        if await self.redis.get(RUNNING_JOB_KEY) == job_id:
+            await self.redis.delete(RUNNING_JOB_KEY)
+
+    async def live_workers(self, job_id: str) -> List[str]:
+        """
+        Worker còn heartbeat (chưa hết TTL)
+        """
+        worker_ids = sorted(await self.redis.smembers(_job_key(job_id, "workers")))
+        if not worker_ids:
+            return []
+        raw = await self.redis.mget([_job_key(job_id, f"worker:{w}") for w in worker_ids])
+        return [w for w, value in zip(worker_ids, raw) if value]
+
+    async def _watch_in_flight(self, pipe, job_id: str, worker_ids: Iterable[str]) -> tuple:
+        """
+        WATCH processing list của các worker, trả về (keys, URL chưa có trong done set).
+        Worker checkpoint/pop trong lúc đó thì transaction sau sẽ bị hủy (WatchError)
+        """
+        keys = [_processing_key(job_id, worker_id) for worker_id in sorted(worker_ids)]
+        if not keys:
+            return keys, []
+        await pipe.watch(*keys)
+        in_flight = [url for key in keys for url in await pipe.lrange(key, 0, -1)]
+        completed = await pipe.smismember(_job_key(job_id, "done"), in_flight) if in_flight else []
+        # dict.fromkeys: bỏ URL trùng nhưng giữ thứ tự
+        return keys, list(dict.fromkeys(url for url, is_done in zip(in_flight, completed) if not is_done))
+
+    @staticmethod
+    def _requeue(pipe, job_id: str, keys: List[str], urls: List[str]):
+        if keys:
+            pipe.delete(*keys)
+        if urls:
+            frontier_key = _job_key(job_id, "frontier")
+            pipe.lpush(frontier_key, *reversed(urls))
+            pipe.expire(frontier_key, JOB_TTL)
+
+    async def reclaim_orphans(self, job_id: str) -> int:
+        """
+        Đẩy lại vào đầu frontier các URL trong processing list của worker đã hết heartbeat
+        (process chết giữa chừng), rồi bỏ worker khỏi workers set. Trả về số URL được đẩy lại
+        """
+        workers_key = _job_key(job_id, "workers")
+        worker_ids = sorted(await self.redis.smembers(workers_key))
+        if not worker_ids:
+            return 0
+        raw = await self.redis.mget([_job_key(job_id, f"worker:{w}") for w in worker_ids])
+        requeued = 0
+        for worker_id in (w for w, value in zip(worker_ids, raw) if not value):
+            heartbeat_key = _job_key(job_id, f"worker:{worker_id}")
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(heartbeat_key)
+                    # Worker gửi lại heartbeat (chỉ bị chậm) thì không reclaim
+                    if await pipe.exists(heartbeat_key):
+                        continue
+                    keys, urls = await self._watch_in_flight(pipe, job_id, [worker_id])
+                    pipe.multi()
+                    self._requeue(pipe, job_id, keys, urls)
+                    pipe.srem(workers_key, worker_id)
+                    await pipe.execute()
+                except WatchError:
+                    # Worker khác vừa reclaim hoặc worker này vừa quay lại
+                    continue
+            requeued += len(urls)
+            if urls:
+                logger.warning(f"Requeued {len(urls)} in-flight URLs of dead worker {worker_id} (job {job_id})")
+        return requeued
+
+    async def resume_job(self, job_id: Optional[str] = None) -> dict:
+        """
+        Tiếp tục job từ checkpoint gần nhất: các URL đang xử lý dở (chưa checkpoint)
+        được đẩy lại vào đầu frontier, URL đã có trong done set thì bỏ qua
+        """
+        job_id = job_id or await self.redis.get(CURRENT_JOB_KEY)
+        if not job_id:
+            raise CrawlJobNotResumable("No crawl job to resume")
+        status_key = _job_key(job_id, "status")
+        workers_key = _job_key(job_id, "workers")
+        # WATCH lock + status + workers set + processing list: hai lệnh resume chạy cùng lúc (hoặc
+        # create_job/worker chen vào) thì chỉ một transaction thành công, URL không bị đẩy lại hai lần
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(RUNNING_JOB_KEY, status_key, workers_key)
+                status = await pipe.hgetall(status_key)
+                if not status:
+                    raise CrawlJobNotResumable(f"Crawl job {job_id} not found")
+                if status.get("status") == "completed":
+                    raise CrawlJobNotResumable(f"Crawl job {job_id} is already completed")
+                if await self.live_workers(job_id):
+                    raise CrawlJobAlreadyRunning(job_id)
+                holder = await pipe.get(RUNNING_JOB_KEY)
+                if holder and holder != job_id:
+                    raise CrawlJobAlreadyRunning(holder)
+                # Không còn worker sống: processing list của mọi worker đều là URL xử lý dở
+                keys, requeue = await self._watch_in_flight(pipe, job_id, await pipe.smembers(workers_key))
+
+                pipe.multi()
+                pipe.set(RUNNING_JOB_KEY, job_id)
+                self._requeue(pipe, job_id, keys, requeue)
+                pipe.delete(workers_key)
+                pipe.hset(status_key, mapping={"status": "running", "resumed_time": datetime.now().isoformat()})
+                pipe.hdel(status_key, "end_time", "end_ts")
+                pipe.set(CURRENT_JOB_KEY, job_id)
+                await pipe.execute()
+            except WatchError:
+                raise CrawlJobAlreadyRunning(await self.redis.get(RUNNING_JOB_KEY) or job_id)
+
+        frontier = await self.redis.llen(_job_key(job_id, "frontier"))
+        logger.info(f"Resumed crawl job {job_id}: requeued {len(requeue)} in-flight URLs, {frontier} URLs remaining")
+        return {"job_id": job_id, "requeued": len(requeue), "remaining": frontier}
+
+    async def heartbeat(self, job_id: str, worker_id: str, info: dict, ttl: int = 30):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.sadd(_job_key(job_id, "workers"), worker_id)
+        pipe.expire(_job_key(job_id, "workers"), JOB_TTL)
+        pipe.set(_job_key(job_id, f"worker:{worker_id}"), json.dumps(info, default=str), ex=ttl)
+        await pipe.execute()
+
+    async def leave(self, job_id: str, worker_id: str):
+        pipe = self.redis.pipeline(transaction=False)
+        # Checkpoint cuối bị lỗi thì giữ worker trong set để URL còn lại được reclaim
+        if not await self.redis.llen(_processing_key(job_id, worker_id)):
+            pipe.srem(_job_key(job_id, "workers"), worker_id)
+        pipe.delete(_job_key(job_id, f"worker:{worker_id}"))
+        await pipe.execute()
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        """
+        Đọc status của job: counters, lỗi gần nhất và heartbeat của các worker còn sống
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(_job_key(job_id, "status"))
+        pipe.lrange(_job_key(job_id, "errors"), 0, MAX_ERRORS - 1)
+        pipe.smembers(_job_key(job_id, "workers"))
+        pipe.llen(_job_key(job_id, "frontier"))
+        status, errors, worker_ids, frontier = await pipe.execute()
+        if not status:
+            return None
+
+        workers: List[dict] = []
+        processing = 0
+        if worker_ids:
+            worker_ids = sorted(worker_ids)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.mget([_job_key(job_id, f"worker:{w}") for w in worker_ids])
+            for worker_id in worker_ids:
+                pipe.llen(_processing_key(job_id, worker_id))
+            raw, *lengths = await pipe.execute()
+            workers = [json.loads(value) for value in raw if value]
+            processing = sum(lengths)
+
+        job = {
+            "job_id": status.get("job_id", job_id),
+            "status": status.get("status", "idle"),
+            "total_urls": int(status.get("total_urls", 0)),
+            "start_time": status.get("start_time"),
+            "end_time": status.get("end_time"),
+            "errors": list(reversed(errors)),
+            "frontier_size": frontier,
+            "in_flight": processing,
+            "workers": workers,
+            "checkpoint_time": status.get("checkpoint_time"),
+            "start_ts": float(status.get("start_ts", 0) or 0),
+            "end_ts": float(status.get("end_ts", 0) or 0),
+        }
+        for field in COUNTER_FIELDS:
+            job[field] = int(status.get(field, 0))
+        return job
+
+    async def reset(self):
+        """
+        Xóa con trỏ job hiện tại (dữ liệu job cũ sẽ hết hạn theo TTL)
+        """
+        job_id = await self.redis.get(CURRENT_JOB_KEY)
+        keys = [CURRENT_JOB_KEY, RUNNING_JOB_KEY]
+        if job_id:
+            keys += [_processing_key(job_id, w) for w in await self.redis.smembers(_job_key(job_id, "workers"))]
+            keys += [_job_key(job_id, suffix) for suffix in ("status", "frontier", "done", "errors", "workers")]
+        await self.redis.delete(*keys)
+
+def aggregate_stages(workers: List[Dict]) -> Dict[str, dict]:
+    """
+    Cộng dồn thống kê stage của tất cả worker
+    """
+    totals: Dict[str, dict] = {}
+    latencies: Dict[str, List[dict]] = {}
+    for worker in workers:
+        for name, stage in (worker.get("stages") or {}).items():
+            total = totals.setdefault(name, {})
+            for key, value in stage.items():
+                if key == "latency":
+                    latencies.setdefault(name, []).append(value)
+                else:
+                    total[key] = round(total.get(key, 0) + value, 3)
+    for name, snapshots in latencies.items():
+        totals[name]["latency"] = merge_histograms(snapshots)
+    return totals
+
+def aggregate_fetch(workers: List[Dict]) -> Dict[str, int]:
+    """
+    Cộng dồn số request/retry/byte của các worker
+    """
+    totals: Dict[str, int] = {}
+    for worker in workers:
+        for key, value in (worker.get("fetch") or {}).items():
+            if key != "latency_p95" and isinstance(value, (int, float)):
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+def aggregate_rate_limits(workers: List[Dict]) -> Dict[str, dict]:
+    """
+    Rate hiệu dụng của mỗi host = tổng rate của các worker đang crawl host đó
+    """
+    totals: Dict[str, dict] = {}
+    for worker in workers:
+        for host, limit in (worker.get("rate_limits") or {}).items():
+            total = totals.setdefault(host, {"rate": 0.0, "requests": 0, "throttled": 0, "errors": 0, "workers": 0})
+            total["rate"] = round(total["rate"] + limit.get("rate", 0), 3)
+            for key in ("requests", "throttled", "errors"):
+                total[key] += limit.get(key, 0)
+            total["workers"] += 1
+    return totals
@@ -1,18 +1,76 @@
 import asyncio
+import hashlib
+import os
 import re
-from typing import List, Optional
+import time
+from typing import List, Optional, Tuple
 from datetime import datetime
 
 import httpx
-from selectolax.parser import HTMLParser
 
 from app.schemas.crawler import RawMovieData, ProcessedMovieData
 from app.schemas.vod import VodCreate
+from app.core.config import settings
 from app.core.logging import get_logger
+from app.services.http_client import get_http_client
+from app.services.crawl_pipeline import CrawlPipeline, PipelineStage
+from app.services.bulk_writer import BulkWriter
+from app.services.crawl_state import (
+    RedisCrawlState, CrawlJobAlreadyRunning, aggregate_stages, aggregate_rate_limits, aggregate_fetch, new_worker_id
+)
+from app.services.crawl_metrics import merge_histograms, summarize_latency
+from app.services.rate_limiter import AdaptiveRateLimiter
+from app.services.fetcher import RetryingFetcher, RetryPolicy
+from app.services.extractor import extract_movie, extract_movie_in_pool
+from app.services.url_frontier import DiscoveryFrontier
+from app.services.discovery import UrlDiscoverer
+from app.services.crawl_archive import ArchiveWriter, iter_archives
+from app.services.dedupe import NearDuplicateIndex
+from app.utils.cache import invalidate_all_vods
 import app.crud.vod as crud_vod
+import app.crud.crawl_page as crud_crawl_page
+import app.crud.crawl_run as crud_crawl_run
 
 logger = get_logger(__name__)
 
+class CrawlItem:
+    """
+    Dữ liệu của một URL khi đi qua các stage của pipeline
+    """
+    __slots__ = (
+        "url", "previous", "html", "etag", "last_modified", "raw_data", "vod_create", "content_hash", "signals",
+    )
+
+    def __init__(self, url: str, previous: Optional[dict] = None):
+        self.url = url
+        self.previous = previous or {}
+        self.html: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.raw_data: Optional[RawMovieData] = None
+        self.vod_create: Optional[VodCreate] = None
+        self.content_hash: Optional[str] = None
+        # view_count/rating lần này, so với lần trước để biết trang có hay thay đổi không
+        self.signals: Optional[dict] = None
+
+    @property
+    def changed(self) -> bool:
+        previous = self.previous.get("signals")
+        return self.signals is not None and previous is not None and previous != self.signals
+
+    def page_meta(self) -> dict:
+        if self.content_hash is None:
+            # 304: chỉ ghi nhận một lần kiểm tra, giữ nguyên ETag/hash cũ
+            return {"url": self.url, "changed": False}
+        return {
+            "url": self.url,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "content_hash": self.content_hash,
+            "signals": self.signals,
+            "changed": self.changed,
+        }
+
 class CrawlerService:
     """
     Service để crawl dữ liệu phim từ vieon.vn
@@ -23,17 +81,83 @@ class CrawlerService:
         
     ]
     
-    def __init__(self):
-        self.status = {
-            "total_urls": len(self.MOVIE_URLS),
-            "processed": 0,
-            "failed": 0,
-            "status": "idle",
-            "current_url": None,
-            "start_time": None,
-            "end_time": None,
-            "errors": []
-        }
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        concurrency: Optional[int] = None,
+        state: Optional[RedisCrawlState] = None,
+        frontier: Optional[DiscoveryFrontier] = None,
+    ):
+        # Client dùng chung được tạo trong lifespan, không tạo mới cho từng URL
+        self._client = client
+        self.concurrency = max(1, concurrency or settings.CRAWLER_CONCURRENCY)
+        # Frontier và counters nằm trong Redis để nhiều worker/API replica dùng chung
+        self.state = state or RedisCrawlState()
+        # URL tìm được bởi discovery mode (sorted set + Bloom filter trong cùng Redis)
+        self.frontier = frontier or DiscoveryFrontier(
+            settings.CRAWLER_BLOOM_CAPACITY, settings.CRAWLER_BLOOM_ERROR_RATE, client=self.state.redis
+        )
+        self.dedupe = NearDuplicateIndex(settings.CRAWLER_DEDUPE_THRESHOLD)
+        self.worker_id = new_worker_id()
+        self.job_id: Optional[str] = None
+        self.current_url: Optional[str] = None
+        self._pipeline: Optional[CrawlPipeline] = None
+        self._writer: Optional[BulkWriter] = None
+        self._archive: Optional[ArchiveWriter] = None
+        # Kết quả chưa checkpoint: outcome -> [url]
+        self._outcomes: dict = {}
+        self._outcome_errors: List[str] = []
+        self._checkpoint_lock = asyncio.Lock()
+        self.rate_limiter = AdaptiveRateLimiter(
+            initial_rate=settings.CRAWLER_RATE_INITIAL,
+            min_rate=settings.CRAWLER_RATE_MIN,
+            max_rate=settings.CRAWLER_RATE_MAX,
+            increase_step=settings.CRAWLER_RATE_INCREASE,
+            decrease_factor=settings.CRAWLER_RATE_DECREASE,
+            latency_target=settings.CRAWLER_RATE_LATENCY_TARGET,
+        )
+        self.fetcher = RetryingFetcher(
+            lambda: self.client,
+            self.rate_limiter,
+            policy=RetryPolicy(
+                max_attempts=settings.CRAWLER_RETRY_ATTEMPTS,
+                base_delay=settings.CRAWLER_RETRY_BASE_DELAY,
+                max_delay=settings.CRAWLER_RETRY_MAX_DELAY,
+            ),
+            hedge=settings.CRAWLER_HEDGE_REQUESTS,
+            hedge_quantile=settings.CRAWLER_HEDGE_QUANTILE,
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
+    
+    async def reset_status(self):
+        """
+        Xóa job hiện tại trong Redis, status trở về idle
+        """
+        await self.state.reset()
+    
+    async def fetch_page(self, url: str) -> bytes:
+        """
+        Tải HTML (raw bytes) của một trang phim
+        """
+        response = await self.fetcher.fetch(url)
+        return response.content
+    
+    def extract_movie(self, url: str, html: str | bytes) -> RawMovieData:
+        """
+        Parse HTML và extract dữ liệu phim ngay trên event loop
+        """
+        return extract_movie(url, html)
+    
+    async def extract_movie_async(self, url: str, html: bytes) -> RawMovieData:
+        """
+        Extract theo CRAWLER_EXTRACT_MODE: "process" chạy trong process pool, "inline" chạy trên event loop
+        """
+        if settings.CRAWLER_EXTRACT_MODE == "process":
+            return await extract_movie_in_pool(url, html)
+        return self.extract_movie(url, html)
     
     async def crawl_single_movie(self, url: str) -> Optional[RawMovieData]:
         """
@@ -42,36 +166,8 @@ class CrawlerService:
         try:
             logger.info(f"Crawling movie: {url}")
             
-            # HTTP request với httpx
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url)
-                response.raise_for_status()
-            
-            # Parse HTML với selectolax
-            tree = HTMLParser(response.text)
-            metadata = self._extract_metadata_by_position(tree)
-            # Extract dữ liệu theo HTML structure
-            raw_data = RawMovieData(
-            url=url,
-            title=self._extract_title(tree),
-            description=self._extract_description(tree),
-            rating=self._extract_rating(tree),
-            view_count=self._extract_view_count(tree),
-            # Dùng data từ metadata
-            release_year=metadata.get('release_year'),
-            duration=metadata.get('duration'),
-            country=metadata.get('country'),
-            video_quality=metadata.get('video_quality'),
-            age_rating=metadata.get('age_rating'),
-            access_type=metadata.get('access_type'), 
-            genre=metadata.get('genre'),
-            director=metadata.get('director'),
-            # Extract riêng
-            thumbnail_url=self._extract_thumbnail(tree),
-            video_url=self._extract_video_url(tree),
-            actors=self._extract_actors(tree),
-            
-        )
+            html = await self.fetch_page(url)
+            raw_data = await self.extract_movie_async(url, html)
             
             logger.info(f"Successfully crawled: {raw_data.title}")
             return raw_data
@@ -80,152 +176,6 @@ class CrawlerService:
             logger.error(f"Failed to crawl {url}: {str(e)}", exc_info=True)
             return None
     
-    def _extract_title(self, tree: HTMLParser) -> Optional[str]:
-        """Extract title từ h2.card_title"""
-        try:
-            element = tree.css_first('h2.card__title')
-            return element.text().strip() if element else None
-        except Exception:
-            return None
-    
-    def _extract_description(self, tree: HTMLParser) -> Optional[str]:
-        """Extract description từ div.intro_info_desc"""
-        try:
-            element = tree.css_first('.intro__info__desc')
-            return element.text().strip() if element else None
-        except Exception:
-            return None
-    
-    def _extract_rating(self, tree: HTMLParser) -> Optional[str]:
-        """Extract rating từ span.rating__summary"""
-        try:
-            element = tree.css_first('span.rating__summary')
-            logger.info(f"rating: {element.text()}")
-            return element.text().strip() if element else None
-        except Exception:
-            return None
-    
-    def _extract_view_count(self, tree: HTMLParser) -> Optional[str]:
-        """Extract view count từ span.viewer_summary"""
-        try:
-            element = tree.css_first('.viewer .viewer__summary')
-            return element.text().strip() if element else None
-        except Exception:
-            return None
-
-    def _extract_metadata_by_position(self, tree: HTMLParser) -> dict:
-        """
-        Extract metadata theo thứ tự position vì các element có cùng class
-        Return dict với các key: duration, country, video_quality
-        """
-        try:
-            # Tìm tất cả label.Tag_Base__Jb03L theo thứ tự xuất hiện
-            elements_1 = tree.css('.intro__info .intro__info-left .Tag_Base__Jb03L span')
-            logger.info(f"Total elements_1 found: {len(elements_1)}")
-            elements_2 = tree.css('.intro__info .intro__info-right .tags-group')
-            logger.info(f"Total elements_2 found: {len(elements_2)}")
-            result= {
-                'release_year': None,
-                'access_type': 'free',
-                'age_rating':None,
-                'duration': None, 
-                'country': None,
-                'video_quality': None,
-                'director': None,
-                'genre': [],
-            }
-            
-            for i, element in enumerate(elements_1):
-                text = element.text().strip()
-                logger.info(f"Position_1 {i}: {text}")  # Debug log
-                
-                # Position 0: Năm (4 chữ số, bắt đầu 20xx) or access_type
-                if i == 0:
-                    if len(text) == 4 and text.startswith('20'):
-                        result['release_year'] = text
-                    else:
-                        result['access_type'] = text
-                # Position 1: Độ tuổi phù hợp
-                elif i == 1:
-                    result['age_rating'] = text
-                
-                # Position 2: Country
-                elif i == 2:
-                    result['country'] = text
-                
-                # Position 3: Duration format "1g 23ph"
-                elif i == 3:
-                    result['duration'] = text
-                
-                # Position 4: Video quality
-                else:
-                    result['video_quality'] = text
-   
-            for i, group in enumerate(elements_2):
-                label = group.css_first('label')
-                if not label:
-                    continue
-                label_text = label.text().strip()
-                logger.info(f"Position_2 {i}: {text}")  # Debug log
-                if label_text.startswith("Đạo diễn"):
-                    link = group.css('a')
-                    if link:
-                        result['director'] = link.text().strip()
-                        logger.info(f"director: {link}")
-
-                elif label_text.startswith("Thể loại"):
-                    links = group.css('a')
-                    result['genre'] = [link.text().strip() for link in links]
-                    logger.info(f"genre {link}")
-            return result
-            
-        except Exception as e:
-            logger.error(f"Failed to extract metadata by position: {str(e)}")
-            return result
-    
-    def _extract_thumbnail(self, tree: HTMLParser) -> Optional[str]:
-        """Extract thumbnail URL từ img tags"""
-        try:
-            # Tìm img trong player poster hoặc image-block
-            img = tree.css_first('section.section--vod-detail img.billboard__image__hero')
-            if img:
-                src = img.attributes.get('src') 
-                return src
-            return None
-        except Exception:
-            return None
-    
-    def _extract_video_url(self, tree: HTMLParser) -> Optional[str]:
-        """Extract video URL từ video tag """
-        try:
-            # Tìm video tag
-            video = tree.css_first('video#VIE_PLAYER')
-            if video:
-                src = video.attributes.get('src')
-                if src:
-                    return src
-            return None
-        except Exception:
-            return None
-    
-    def _extract_actors(self, tree: HTMLParser) -> Optional[List[str]]:
-        """Extract actors từ tags-group links"""
-        try:
-            actors = []
-            groups = tree.css('.intro__info-right .tags-group')
-            for group in groups:
-                label = group.css_first('label')
-                if label and label.text().strip().startswith("Diễn viên"):
-                # Lấy tất cả thẻ <a> trong group diễn viên
-                    links = group.css('a')
-                for link in links:
-                    actors.append(link.text().strip())
-                break  
-
-            return actors if actors else None
-        except Exception:
-            return None
-         
     def normalize_data(self, raw_data: RawMovieData) -> ProcessedMovieData:
         """
         Chuẩn hóa raw data thành format chuẩn
@@ -329,75 +279,558 @@ class CrawlerService:
             logger.error(f"Failed to convert to VodCreate: {str(e)}", exc_info=True)
             raise
     
+    def _build_pipeline(self) -> CrawlPipeline:
+        """
+        fetch -> extract -> normalize -> persist, mỗi stage có số worker riêng
+        """
+        return CrawlPipeline(
+            stages=[
+                # Queue của stage fetch nhỏ để worker không giữ quá nhiều URL lấy từ frontier chung
+                PipelineStage("fetch", self._stage_fetch, workers=self.concurrency, queue_size=self.concurrency),
+                PipelineStage("extract", self._stage_extract, workers=settings.CRAWLER_EXTRACT_WORKERS),
+                PipelineStage("normalize", self._stage_normalize, workers=settings.CRAWLER_NORMALIZE_WORKERS),
+                PipelineStage("persist", self._stage_persist, workers=settings.CRAWLER_PERSIST_WORKERS),
+            ],
+            queue_size=settings.CRAWLER_QUEUE_SIZE,
+            on_error=self._on_stage_error,
+        )
+    
+    async def start_job(self, urls: Optional[List[str]] = None, discovered_limit: int = 0) -> dict:
+        """
+        Tạo crawl job mới, đẩy URL vào frontier trong Redis. Trả về job_id và total_urls (sau khi bỏ trùng).
+        `discovered_limit` > 0: lấy thêm tối đa bấy nhiêu URL từ discovery frontier (priority cao trước)
+        """
+        urls = list(urls or self.MOVIE_URLS)
+        discovered: List[Tuple[str, float]] = []
+        if discovered_limit > 0:
+            if await self.state.running_job():
+                raise CrawlJobAlreadyRunning(await self.state.running_job())
+            discovered = await self.frontier.pop(discovered_limit)
+            urls += [url for url, _ in discovered]
+        try:
+            return await self.state.create_job(urls)
+        except Exception:
+            # Không mất URL đã lấy ra khỏi discovery frontier, giữ nguyên priority
+            await self.frontier.requeue(discovered)
+            raise
+    
+    async def discover(self, seeds: Optional[List[str]] = None, max_pages: Optional[int] = None) -> dict:
+        """
+        Duyệt các trang listing/sitemap từ seed, đẩy URL phim mới vào discovery frontier
+        """
+        discoverer = UrlDiscoverer(
+            self.fetcher,
+            self.frontier,
+            concurrency=settings.CRAWLER_DISCOVERY_CONCURRENCY,
+            max_depth=settings.CRAWLER_DISCOVERY_MAX_DEPTH,
+            max_pages=max_pages or settings.CRAWLER_DISCOVERY_MAX_PAGES,
+        )
+        try:
+            return await discoverer.run(list(seeds or settings.CRAWLER_DISCOVERY_SEEDS))
+        except Exception as e:
+            logger.error(f"URL discovery failed: {str(e)}", exc_info=True)
+            raise
+    
     async def crawl_all_movies(self):
         """
-        Crawl tất cả movies trong MOVIE_URLS
+        Tạo job cho MOVIE_URLS và crawl bằng worker trong process này.
+        Worker ở process/container khác (app.workers.crawl_worker) sẽ cùng lấy URL từ frontier
         """
         try:
-            self.status.update({
-                "status": "running",
-                "start_time": datetime.now().isoformat(),
-                "processed": 0,
-                "failed": 0,
-                "errors": []
-            })
-            
-            logger.info(f"Starting to crawl {len(self.MOVIE_URLS)} movies")
-            
-            for i, url in enumerate(self.MOVIE_URLS):
-                self.status["current_url"] = url
-                
+            job_id = (await self.start_job())["job_id"]
+        except CrawlJobAlreadyRunning as e:
+            logger.warning(f"Crawl job {e} is already running")
+            return
+        except Exception as e:
+            logger.error(f"Failed to create crawl job: {str(e)}", exc_info=True)
+            return
+        await self.run_worker(job_id)
+    
+    async def run_worker(self, job_id: str):
+        """
+        Lấy URL từ frontier của job cho đến khi hết và xử lý qua pipeline
+        """
+        self.job_id = job_id
+        logger.info(f"Worker {self.worker_id} joined crawl job {job_id} (fetch workers: {self.concurrency})")
+        
+        self._writer = self._build_writer()
+        self._writer.start()
+        self._pipeline = self._build_pipeline()
+        # Số request/byte tính riêng cho từng run
+        self.fetcher.reset_stats()
+        if settings.CRAWLER_ARCHIVE_RECORD:
+            self._archive = self._open_archive(job_id)
+        self._outcomes = {}
+        self._outcome_errors = []
+        background = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._checkpoint_loop()),
+        ]
+        try:
+            await self._pipeline.run(self._frontier(job_id))
+            logger.info(f"Worker {self.worker_id} finished crawl job {job_id}")
+        except Exception as e:
+            logger.error(f"Crawl worker failed on job {job_id}: {str(e)}", exc_info=True)
+        finally:
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            # Ghi nốt các VOD còn trong buffer rồi checkpoint lần cuối
+            await self._writer.close()
+            await self.checkpoint()
+            if self._archive:
+                self._archive.close()
+                self._archive = None
+            self.current_url = None
+            await self._save_run()
+            await self._leave()
+    
+    def _open_archive(self, job_id: str) -> ArchiveWriter:
+        # Mỗi worker ghi file riêng, không cần lock giữa các process
+        worker = re.sub(r'[^\w.-]', '_', self.worker_id)
+        return ArchiveWriter(os.path.join(settings.CRAWLER_ARCHIVE_DIR, f"{job_id}-{worker}.warc.gz"))
+    
+    async def replay(self, paths: List[str], persist: bool = False) -> dict:
+        """
+        Chạy lại extract -> normalize -> VodCreate trên archive đã ghi, không gọi network.
+        Dùng khi sửa extractor: re-extract toàn bộ catalog, `persist=True` thì upsert lại VOD vào MongoDB
+        (không ghi crawl_pages/signature)
+        """
+        counters = {"records": 0, "extracted": 0, "processed": 0, "failed": 0, "skipped": 0}
+        errors: List[str] = []
+        
+        def items():
+            for record in iter_archives(paths):
+                counters["records"] += 1
+                if record.status_code != 200:
+                    counters["skipped"] += 1
+                    continue
+                item = CrawlItem(record.url)
+                item.html = record.body
+                item.etag = record.headers.get("etag")
+                item.last_modified = record.headers.get("last-modified")
+                yield item
+        
+        async def normalize(item: CrawlItem) -> CrawlItem:
+            counters["extracted"] += 1
+            processed_data = self.normalize_data(item.raw_data)
+            item.raw_data = None
+            self._fingerprint(item, processed_data)
+            item.vod_create = await self.convert_to_vod_create(processed_data)
+            return item if persist else None
+        
+        async def on_error(stage: str, item, error: Exception):
+            counters["failed"] += 1
+            if len(errors) < 50:
+                errors.append(f"Error in {stage} stage for {self._item_url(item)}: {str(error)}")
+        
+        async def on_flush(batch: list, result: dict):
+            failed = len(result.get("failed", []))
+            counters["processed"] += len(batch) - failed
+            counters["failed"] += failed
+        
+        async def on_flush_error(batch: list, error: Exception):
+            counters["failed"] += len(batch)
+            errors.append(f"Bulk write failed for {len(batch)} pages: {str(error)}")
+        
+        # Không có network: số worker extract theo số process (mode "process") để dùng hết CPU
+        extract_workers = settings.CRAWLER_EXTRACT_WORKERS
+        if settings.CRAWLER_EXTRACT_MODE == "process":
+            extract_workers = max(extract_workers, 2 * (settings.CRAWLER_EXTRACT_PROCESSES or os.cpu_count() or 1))
+        stages = [
+            PipelineStage("extract", self._stage_extract, workers=extract_workers),
+            PipelineStage("normalize", normalize, workers=settings.CRAWLER_NORMALIZE_WORKERS),
+        ]
+        writer = None
+        if persist:
+            writer = BulkWriter(
+                self._flush_replayed,
+                batch_size=settings.CRAWLER_BULK_BATCH_SIZE,
+                flush_interval=settings.CRAWLER_BULK_FLUSH_INTERVAL,
+                on_flush=on_flush,
+                on_error=on_flush_error,
+            )
+            writer.start()
+            stages.append(PipelineStage("persist", writer.add, workers=settings.CRAWLER_PERSIST_WORKERS))
+        
+        pipeline = CrawlPipeline(stages, queue_size=settings.CRAWLER_QUEUE_SIZE, on_error=on_error)
+        started = time.monotonic()
+        try:
+            await pipeline.run(items())
+        finally:
+            if writer:
+                await writer.close()
+        elapsed = time.monotonic() - started
+        
+        logger.info(f"Replayed {counters['records']} archived pages in {elapsed:.2f}s ({counters['failed']} failed)")
+        return {
+            **counters,
+            "elapsed": round(elapsed, 3),
+            "pages_per_sec": round(counters["records"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "stages": pipeline.snapshot(),
+            "errors": errors,
+        }
+    
+    async def _frontier(self, job_id: str):
+        while True:
+            url = await self.state.pop_url(job_id, self.worker_id)
+            if url is None:
+                # Lấy nốt URL của worker đã chết (nếu có) trước khi rời job
+                if await self._reclaim_orphans():
+                    continue
+                return
+            yield url
+    
+    async def _heartbeat_loop(self):
+        while True:
+            await self._send_heartbeat()
+            await self._reclaim_orphans()
+            await asyncio.sleep(settings.CRAWLER_HEARTBEAT_INTERVAL)
+    
+    def _worker_snapshot(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "current_url": self.current_url,
+            "concurrency": self.concurrency,
+            "pending_writes": self._writer.pending if self._writer else 0,
+            "stages": self._pipeline.snapshot() if self._pipeline else {},
+            "bulk_write": self._writer.latency.snapshot() if self._writer else None,
+            "rate_limits": self.rate_limiter.snapshot(),
+            "fetch": self.fetcher.snapshot(),
+            "updated_at": datetime.now().isoformat(),
+        }
+    
+    async def _send_heartbeat(self):
+        try:
+            await self.state.heartbeat(
+                self.job_id, self.worker_id, self._worker_snapshot(),
+                ttl=max(1, int(settings.CRAWLER_HEARTBEAT_INTERVAL * 3)),
+            )
+        except Exception as e:
+            logger.warning(f"Failed to send crawl heartbeat: {str(e)}")
+    
+    async def _reclaim_orphans(self) -> int:
+        try:
+            return await self.state.reclaim_orphans(self.job_id)
+        except Exception as e:
+            logger.warning(f"Failed to reclaim URLs of dead crawl workers: {str(e)}")
+            return 0
+    
+    async def _save_run(self):
+        """
+        Lưu timings/histogram/byte của worker này vào lịch sử run (crawl_runs), kèm counters
+        hiện tại của job. Worker xong sau cùng ghi trạng thái cuối của job
+        """
+        try:
+            job = await self.state.get_job(self.job_id)
+            if not job:
+                return
+            worker = self._worker_snapshot()
+            worker.pop("current_url", None)
+            worker.pop("pending_writes", None)
+            await crud_crawl_run.record_worker_run(self._run_document(job), worker)
+        except Exception as e:
+            logger.error(f"Failed to save crawl run history for job {self.job_id}: {str(e)}", exc_info=True)
+    
+    @staticmethod
+    def _run_document(job: dict) -> dict:
+        start_ts, end_ts = job.get("start_ts"), job.get("end_ts")
+        duration = (end_ts or time.time()) - start_ts if start_ts else 0
+        done = sum(job[field] for field in ("processed", "failed", "unchanged", "skipped"))
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "start_time": job["start_time"],
+            "end_time": job["end_time"],
+            "duration": round(duration, 3),
+            "total_urls": job["total_urls"],
+            "processed": job["processed"],
+            "failed": job["failed"],
+            "unchanged": job["unchanged"],
+            "skipped": job["skipped"],
+            "pages_per_sec": round(done / duration, 3) if duration > 0 else 0.0,
+            "errors": len(job["errors"]),
+        }
+    
+    async def _leave(self):
+        try:
+            await self.state.leave(self.job_id, self.worker_id)
+        except Exception as e:
+            logger.warning(f"Failed to remove crawl heartbeat: {str(e)}")
+    
+    async def _record(self, outcome: str, urls: List[str], errors: List[str] = ()):
+        """
+        Ghi kết quả vào buffer local, được đẩy lên Redis ở lần checkpoint tiếp theo
+        """
+        if urls:
+            self._outcomes.setdefault(outcome, []).extend(urls)
+        self._outcome_errors.extend(errors)
+    
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(settings.CRAWLER_CHECKPOINT_INTERVAL)
+            await self.checkpoint()
+    
+    async def checkpoint(self):
+        """
+        Flush BulkWriter rồi ghi các URL đã xong + counters lên Redis trong một transaction.
+        URL chỉ được coi là xong sau khi dữ liệu đã vào MongoDB, nên khi resume
+        các URL chưa checkpoint sẽ được crawl lại (at-least-once, upsert theo url nên an toàn)
+        """
+        async with self._checkpoint_lock:
+            try:
+                await self._writer.flush()
+                outcomes, self._outcomes = self._outcomes, {}
+                errors, self._outcome_errors = self._outcome_errors, []
+                if not outcomes and not errors:
+                    return
                 try:
-                    # Crawl raw data
-                    raw_data = await self.crawl_single_movie(url)
-                    if not raw_data:
-                        self.status["failed"] += 1
-                        self.status["errors"].append(f"Failed to crawl: {url}")
-                        continue
-                    
-                    # Normalize data
-                    processed_data = self.normalize_data(raw_data)
-                    
-                    # Convert to VodCreate
-                    vod_create = await self.convert_to_vod_create(processed_data)
-                    
-                    # Save to MongoDB
-                    await crud_vod.create_vod(vod_create)
-                    
-                    self.status["processed"] += 1
-                    logger.info(f"Successfully saved movie: {processed_data.title}")
-                    
-                except Exception as e:
-                    self.status["failed"] += 1
-                    error_msg = f"Error processing {url}: {str(e)}"
-                    self.status["errors"].append(error_msg)
-                    logger.error(error_msg, exc_info=True)
-                
-                # Rate limiting - delay giữa requests
-                if i < len(self.MOVIE_URLS) - 1:  # Không delay ở request cuối
-                    await asyncio.sleep(1)
-            
-            self.status.update({
-                "status": "completed",
-                "end_time": datetime.now().isoformat(),
-                "current_url": None
-            })
-            
-            logger.info(f"Crawling completed. Processed: {self.status['processed']}, Failed: {self.status['failed']}")
-            
+                    await self.state.checkpoint(self.job_id, self.worker_id, outcomes, errors)
+                except Exception:
+                    # Giữ lại để thử ở lần checkpoint sau
+                    for outcome, urls in outcomes.items():
+                        self._outcomes.setdefault(outcome, []).extend(urls)
+                    self._outcome_errors.extend(errors)
+                    raise
+            except Exception as e:
+                logger.error(f"Crawl checkpoint failed for job {self.job_id}: {str(e)}", exc_info=True)
+    
+    async def resume_job(self, job_id: Optional[str] = None) -> dict:
+        """
+        Tiếp tục job bị gián đoạn từ checkpoint gần nhất
+        """
+        return await self.state.resume_job(job_id)
+    
+    async def _stage_fetch(self, url: str) -> Optional[CrawlItem]:
+        self.current_url = url
+        logger.info(f"Crawling movie: {url}")
+        item = CrawlItem(url, previous=await crud_crawl_page.get_page(url))
+        
+        # Conditional request nếu lần crawl trước có ETag/Last-Modified
+        # (rate limit, retry và hedged request nằm trong fetcher)
+        response = await self.fetcher.fetch(url, headers=self._conditional_headers(item.previous))
+        
+        if response.status_code == 304:
+            await self._record("unchanged", [url])
+            logger.debug(f"Not modified, skipping: {url}")
+            # Không qua extract/normalize, chỉ cập nhật last_crawled_at/checks cho scheduler recrawl
+            await self._writer.add(item)
+            return None
+        item.html = response.content
+        item.etag = response.headers.get("etag")
+        item.last_modified = response.headers.get("last-modified")
+        if self._archive:
+            try:
+                await self._archive.write(url, response.status_code, response.headers, item.html)
+            except Exception as e:
+                logger.warning(f"Failed to archive {url}: {str(e)}")
+        return item
+    
+    @staticmethod
+    def _conditional_headers(previous: dict) -> dict:
+        headers = {}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+        return headers
+    
+    async def _stage_extract(self, item: CrawlItem) -> CrawlItem:
+        item.raw_data = await self.extract_movie_async(item.url, item.html)
+        item.html = None
+        return item
+    
+    async def _stage_normalize(self, item: CrawlItem) -> Optional[CrawlItem]:
+        processed_data = self.normalize_data(item.raw_data)
+        item.raw_data = None
+        self._fingerprint(item, processed_data)
+        
+        if item.previous.get("content_hash") == item.content_hash:
+            await self._record("skipped", [item.url])
+            logger.debug(f"Content unchanged, skipping write: {item.url}")
+            # Không ghi VOD, chỉ cập nhật metadata crawl (ETag mới, last_crawled_at, checks)
+            return item
+        
+        item.vod_create = await self.convert_to_vod_create(processed_data)
+        return item
+    
+    @staticmethod
+    def _content_hash(processed_data: ProcessedMovieData) -> str:
+        return hashlib.sha256(processed_data.model_dump_json().encode("utf-8")).hexdigest()
+    
+    def _fingerprint(self, item: CrawlItem, processed_data: ProcessedMovieData):
+        item.content_hash = self._content_hash(processed_data)
+        item.signals = {"view_count": processed_data.view_count, "rating": processed_data.rating}
+    
+    async def _stage_persist(self, item: CrawlItem):
+        # Buffer lại, BulkWriter sẽ upsert theo batch
+        await self._writer.add(item)
+    
+    async def _upsert_vods(self, items: list) -> dict:
+        """
+        Upsert VOD của batch, `failed` trong kết quả là index trong `items`
+        """
+        vod_indexes = [i for i, item in enumerate(items) if item.vod_create is not None]
+        result = await crud_vod.bulk_upsert_vods([items[i].vod_create for i in vod_indexes])
+        failed = {vod_indexes[i] for i in result.get("failed", [])}
+        if result.get("upserted") or result.get("modified"):
+            # Cache list/chi tiết VOD phải thấy dữ liệu vừa crawl
+            await invalidate_all_vods()
+        return {**result, "failed": sorted(failed)}
+    
+    async def _flush_items(self, items: list) -> dict:
+        """
+        Upsert VOD theo batch, sau đó lưu metadata crawl cho các item ghi thành công
+        """
+        result = await self._upsert_vods(items)
+        failed = set(result["failed"])
+        
+        pages = [item.page_meta() for i, item in enumerate(items) if i not in failed]
+        try:
+            await crud_crawl_page.bulk_upsert_pages(pages)
         except Exception as e:
-            self.status.update({
-                "status": "failed",
-                "end_time": datetime.now().isoformat(),
-                "current_url": None
+            # VOD đã lưu thì vẫn tính là xong: thiếu metadata chỉ làm lần crawl sau không dùng được
+            # conditional GET/content hash cho các trang này
+            logger.warning(f"Failed to save crawl metadata for {len(pages)} pages: {str(e)}")
+        
+        if settings.CRAWLER_DEDUPE_ENABLED:
+            saved = [item.vod_create for i, item in enumerate(items) if item.vod_create is not None and i not in failed]
+            try:
+                await self.dedupe.add_many(saved)
+            except Exception as e:
+                # Index trùng lặp không được làm hỏng việc lưu VOD
+                logger.warning(f"Failed to update near-duplicate index for {len(saved)} VODs: {str(e)}")
+        return result
+    
+    async def _flush_replayed(self, items: list) -> dict:
+        """
+        Replay chỉ ghi lại VOD. crawl_pages (checks, last_crawled_at, hash, signals) và signature
+        thuộc về lần crawl thật: ghi bằng dữ liệu archive cũ sẽ làm sai lịch sử thay đổi mà
+        scheduler recrawl dùng để tính priority
+        """
+        return await self._upsert_vods(items)
+    
+    def _build_writer(self) -> BulkWriter:
+        return BulkWriter(
+            self._flush_items,
+            batch_size=settings.CRAWLER_BULK_BATCH_SIZE,
+            flush_interval=settings.CRAWLER_BULK_FLUSH_INTERVAL,
+            on_flush=self._on_bulk_flush,
+            on_error=self._on_bulk_error,
+        )
+    
+    async def _on_bulk_flush(self, batch: list, result: dict):
+        failed = set(result.get("failed", []))
+        processed_urls, failed_urls = [], []
+        for index, item in enumerate(batch):
+            if item.vod_create is None:
+                continue
+            if index in failed:
+                failed_urls.append(item.url)
+            else:
+                processed_urls.append(item.url)
+        await self._record("processed", processed_urls)
+        await self._record("failed", failed_urls, [f"Error in persist stage for {url}: bulk write error" for url in failed_urls])
+        logger.info(f"Saved {len(batch) - len(failed)} crawled pages (upserted: {result.get('upserted', 0)}, modified: {result.get('modified', 0)})")
+    
+    async def _on_bulk_error(self, batch: list, error: Exception):
+        failed_urls = [item.url for item in batch if item.vod_create is not None]
+        await self._record("failed", failed_urls, [f"Error in persist stage for {url}: {str(error)}" for url in failed_urls])
+    
+    async def _on_stage_error(self, stage: str, item, error: Exception):
+        url = self._item_url(item)
+        error_msg = f"Error in {stage} stage for {url}: {str(error)}"
+        logger.error(error_msg, exc_info=True)
+        await self._record("failed", [url], [error_msg])
+    
+    @staticmethod
+    def _item_url(item) -> Optional[str]:
+        if isinstance(item, str):
+            return item
+        if isinstance(item, tuple):
+            return item[0]
+        return getattr(item, "url", None)
+    
+    def _idle_status(self) -> dict:
+        return {
+            "job_id": None,
+            "total_urls": len(self.MOVIE_URLS),
+            "processed": 0,
+            "failed": 0,
+            "unchanged": 0,
+            "skipped": 0,
+            "status": "idle",
+            "current_url": None,
+            "start_time": None,
+            "end_time": None,
+            "errors": [],
+            "frontier_size": 0,
+            "in_flight": 0,
+            "workers": [],
+        }
+    
+    async def get_status(self) -> dict:
+        """
+        Get current crawling status (đọc từ Redis, gộp từ tất cả worker)
+        """
+        job_id = await self.state.current_job()
+        job = await self.state.get_job(job_id) if job_id else None
+        if not job:
+            status = self._idle_status()
+            status.update({
+                "concurrency": 0, "pages_per_sec": 0.0, "stages": {}, "pending_writes": 0, "rate_limits": {},
+                "fetch": {}, "bulk_write": None,
             })
-            logger.error(f"Crawling failed: {str(e)}", exc_info=True)
+            return status
+        
+        start_ts, end_ts = job.pop("start_ts"), job.pop("end_ts")
+        elapsed = (end_ts or time.time()) - start_ts if start_ts else 0
+        done = job["processed"] + job["failed"] + job["unchanged"] + job["skipped"]
+        workers = job["workers"]
+        
+        job["pages_per_sec"] = round(done / elapsed, 3) if elapsed > 0 else 0.0
+        job["concurrency"] = sum(w.get("concurrency", 0) for w in workers)
+        job["pending_writes"] = sum(w.get("pending_writes", 0) for w in workers)
+        job["stages"] = aggregate_stages(workers)
+        job["rate_limits"] = aggregate_rate_limits(workers)
+        job["fetch"] = aggregate_fetch(workers)
+        job["bulk_write"] = merge_histograms([w.get("bulk_write") for w in workers])
+        job["current_url"] = next((w["current_url"] for w in workers if w.get("current_url")), None)
+        if job["status"] == "running" and not workers and (job["frontier_size"] or job["in_flight"]):
+            # Không còn worker nào sống nhưng job chưa xong -> có thể resume
+            job["status"] = "interrupted"
+        return job
     
-    def get_status(self) -> dict:
+    async def run_history(self, limit: int = 10) -> List[dict]:
         """
-        Get current crawling status
+        Lịch sử crawl run (mới nhất trước): run đầu tiên có đủ histogram, các run sau chỉ có percentile
         """
-        return self.status.copy()
+        runs = await crud_crawl_run.list_runs(limit)
+        return [self._summarize_run(run, detail=(index == 0)) for index, run in enumerate(runs)]
+    
+    @staticmethod
+    def _summarize_run(run: dict, detail: bool = False) -> dict:
+        workers = run.pop("workers", None) or []
+        fetch = aggregate_fetch(workers)
+        stages = {
+            name: {
+                "processed": stage.get("processed", 0),
+                "failed": stage.get("failed", 0),
+                "latency": stage.get("latency") if detail else summarize_latency(stage.get("latency")),
+            }
+            for name, stage in aggregate_stages(workers).items()
+        }
+        bulk_write = merge_histograms([w.get("bulk_write") for w in workers])
+        return {
+            **run,
+            "workers": len(workers),
+            "requests": fetch.get("requests", 0),
+            "retries": fetch.get("retries", 0),
+            "bytes": fetch.get("bytes", 0),
+            "bytes_downloaded": fetch.get("bytes_downloaded", 0),
+            "stages": stages,
+            "bulk_write": bulk_write if detail else summarize_latency(bulk_write),
+        }
     
     async def test_single_url(self, url: str) -> dict:
         """
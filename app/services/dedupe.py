@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import random
+import struct
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.extractor import get_extract_pool
+from app.utils.data_utils import fold_text
+import app.crud.vod_signature as crud_signature
+
+logger = get_logger(__name__)
+
+# 64 hash = 16 band x 4 row: cặp có Jaccard ~0.5 có 50% khả năng chung ít nhất một band,
+# Jaccard 0.8 thì ~99.9%. Đổi các giá trị này cần index lại toàn bộ signature
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+MAX_TOKENS = 300
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+def dedupe_text(title: Optional[str], description: Optional[str], director: Optional[str]) -> str:
+    return " ".join(filter(None, (fold_text(part) for part in (title, description, director))))
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """
+    Word n-gram; text ngắn hơn n từ thì dùng từng từ
+    """
+    tokens = text.split()[:MAX_TOKENS]
+    if len(tokens) < size:
+        return set(tokens)
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+def minhash(features: Iterable[str]) -> List[int]:
+    hashes = [_hash64(feature) for feature in features]
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERM
+    return [min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH for a, b in _PERMUTATIONS]
+
+def band_keys(signature: Sequence[int]) -> List[int]:
+    """
+    Mỗi band hash thành một int64 (lưu trong multikey index), band index nằm trong hash
+    """
+    keys = []
+    for band in range(BANDS):
+        chunk = struct.pack(f"<B{ROWS}I", band, *signature[band * ROWS:(band + 1) * ROWS])
+        keys.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True))
+    return keys
+
+def pack_signature(signature: Sequence[int]) -> bytes:
+    return struct.pack(f"<{NUM_PERM}I", *signature)
+
+def unpack_signature(data: bytes) -> tuple:
+    return struct.unpack(f"<{NUM_PERM}I", data)
+
+def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+    """
+    Ước lượng Jaccard = tỉ lệ vị trí MinHash trùng nhau
+    """
+    return sum(1 for a, b in zip(first, second) if a == b) / NUM_PERM
+
+def signature_docs(rows: List[tuple]) -> List[dict]:
+    """
+    Tính signature cho các (url, title, description, director). Hàm module-level để chạy được
+    trong process pool, MinHash thuần Python tốn vài ms mỗi VOD nên không chạy trên event loop
+    """
+    docs = []
+    for url, title, description, director in rows:
+        doc = NearDuplicateIndex.signature_doc(url, title, description, director)
+        if doc is not None:
+            docs.append(doc)
+    return docs
+
+async def compute_signature_docs(rows: List[tuple]) -> List[dict]:
+    """
+    Mode "process" dùng chung process pool với extraction, còn lại chạy trong thread
+    """
+    if settings.CRAWLER_EXTRACT_MODE == "process":
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_extract_pool(), signature_docs, rows)
+    return await asyncio.to_thread(signature_docs, rows)
+
+class NearDuplicateIndex:
+    """
+    Index MinHash/LSH của VOD đã crawl (collection vod_signatures). Mỗi lần thêm chỉ so với
+    các VOD chung ít nhất một band (một query theo multikey index) thay vì so từng cặp
+    """
+
+    def __init__(self, threshold: float = 0.8):
+        self.threshold = threshold
+
+    @staticmethod
+    def signature_doc(url: str, title: Optional[str], description: Optional[str], director: Optional[str]) -> Optional[dict]:
+        features = shingles(dedupe_text(title, description, director))
+        if not features:
+            return None
+        signature = minhash(features)
+        return {"url": url, "title": title, "signature": pack_signature(signature), "bands": band_keys(signature)}
+
+    async def add_many(self, vods: List) -> int:
+        """
+        Thêm/cập nhật signature của các VOD vừa lưu, ghi lại các cặp nghi trùng. Trả về số cặp tìm thấy
+        """
+        rows = [(vod.url, vod.title, vod.description, vod.director) for vod in vods if vod.url]
+        if not rows:
+            return 0
+        docs = await compute_signature_docs(rows)
+        if not docs:
+            return 0
+        # Ghi signature trước để các VOD trùng nhau trong cùng batch cũng tìm thấy nhau
+        await crud_signature.bulk_upsert_signatures(docs)
+
+        # Mỗi VOD tra riêng để MAX_CANDIDATES áp dụng theo từng VOD, một band phổ biến
+        # không chiếm hết giới hạn của cả batch
+        candidate_lists = await asyncio.gather(
+            *(crud_signature.find_by_bands(doc["bands"]) for doc in docs)
+        )
+
+        pairs = {}
+        for doc, candidates in zip(docs, candidate_lists):
+            signature = unpack_signature(doc["signature"])
+            seen = set()
+            for candidate in candidates:
+                other = candidate["url"]
+                if other == doc["url"] or other in seen:
+                    continue
+                seen.add(other)
+                score = similarity(signature, unpack_signature(candidate["signature"]))
+                if score >= self.threshold:
+                    pair = tuple(sorted((doc["url"], other)))
+                    pairs[pair] = max(score, pairs.get(pair, 0))
+
+        # Nội dung của url đã đổi thì các cặp cũ không còn đúng
+        await crud_signature.replace_duplicates([doc["url"] for doc in docs], pairs)
+        if pairs:
+            logger.info(f"Found {len(pairs)} near-duplicate pairs among {len(docs)} new VODs")
+        return len(pairs)
+
+    async def clusters(self, min_similarity: Optional[float] = None, limit: int = 50) -> List[dict]:
+        """
+        Gom các cặp nghi trùng thành cluster (union-find), cluster lớn/giống nhiều trước
+        """
+        pairs = await crud_signature.list_duplicates(
+            self.threshold if min_similarity is None else min_similarity
+        )
+        parent: Dict[str, str] = {}
+
+        def find(url: str) -> str:
+            parent.setdefault(url, url)
+            while parent[url] != url:
+                parent[url] = parent[parent[url]]
+                url = parent[url]
+            return url
+
+        for pair in pairs:
+            first, second = pair["urls"]
+            parent[find(first)] = find(second)
+
+        groups: Dict[str, dict] = {}
+        for pair in pairs:
+            root = find(pair["urls"][0])
+            group = groups.setdefault(root, {"urls": set(), "max_similarity": 0.0, "pairs": 0})
+            group["urls"].update(pair["urls"])
+            group["max_similarity"] = max(group["max_similarity"], pair["similarity"])
+            group["pairs"] += 1
+
+        ordered = sorted(groups.values(), key=lambda g: (len(g["urls"]), g["max_similarity"]), reverse=True)[:limit]
+        titles = await crud_signature.get_titles([url for group in ordered for url in group["urls"]])
+        return [
+            {
+                "size": len(group["urls"]),
+                "max_similarity": round(group["max_similarity"], 3),
+                "pairs": group["pairs"],
+                "vods": [{"url": url, "title": titles.get(url)} for url in sorted(group["urls"])],
+            }
+            for group in ordered
+        ]
@@ -0,0 +1,116 @@
+import asyncio
+import re
+from typing import List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from selectolax.lexbor import LexborHTMLParser
+
+from app.core.logging import get_logger
+from app.services.fetcher import RetryingFetcher
+from app.services.url_frontier import DiscoveryFrontier
+
+logger = get_logger(__name__)
+
+ALLOWED_HOSTS = {"vieon.vn", "www.vieon.vn"}
+# Trang chi tiết phim có dạng https://vieon.vn/<slug>.html
+DETAIL_PATH_RE = re.compile(r'^/[a-z0-9][a-z0-9-]*\.html$')
+SITEMAP_LOC_RE = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>', re.IGNORECASE)
+# Không follow các trang không liệt kê phim
+SKIP_PATH_PREFIXES = ("/tai-khoan", "/dang-nhap", "/thanh-toan", "/mua-goi", "/tim-kiem", "/api/")
+
+def normalize_url(base_url: str, href: str) -> Optional[str]:
+    """
+    URL tuyệt đối, bỏ query/fragment, chỉ giữ URL thuộc vieon.vn
+    """
+    href = (href or "").strip()
+    if not href or href.startswith(("javascript:", "mailto:", "tel:", "#")):
+        return None
+    parts = urlsplit(urljoin(base_url, href))
+    if parts.scheme not in ("http", "https") or parts.netloc.lower() not in ALLOWED_HOSTS:
+        return None
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunsplit(("https", "vieon.vn", path, "", ""))
+
+def is_detail_url(url: str) -> bool:
+    return bool(DETAIL_PATH_RE.match(urlsplit(url).path))
+
+def is_sitemap(url: str, body: str) -> bool:
+    return urlsplit(url).path.endswith(".xml") or body.lstrip()[:200].startswith("<?xml")
+
+def extract_links(base_url: str, body: str) -> Tuple[List[str], List[str]]:
+    """
+    Tách link trong trang listing hoặc sitemap thành (URL chi tiết, URL listing), giữ thứ tự xuất hiện
+    """
+    if is_sitemap(base_url, body):
+        hrefs = SITEMAP_LOC_RE.findall(body)
+    else:
+        tree = LexborHTMLParser(body)
+        hrefs = [node.attributes.get("href") for node in tree.css("a[href]")]
+
+    details, listings = {}, {}
+    for href in hrefs:
+        url = normalize_url(base_url, href)
+        if url is None or url == base_url:
+            continue
+        if is_detail_url(url):
+            details[url] = None
+        elif not urlsplit(url).path.startswith(SKIP_PATH_PREFIXES):
+            listings[url] = None
+    return list(details), list(listings)
+
+class UrlDiscoverer:
+    """
+    Duyệt các trang listing/sitemap theo BFS (depth nhỏ trước), đẩy URL chi tiết mới vào
+    DiscoveryFrontier. Giới hạn bởi max_depth và max_pages để không duyệt vô hạn.
+    """
+
+    def __init__(
+        self,
+        fetcher: RetryingFetcher,
+        frontier: DiscoveryFrontier,
+        concurrency: int = 4,
+        max_depth: int = 2,
+        max_pages: int = 500,
+    ):
+        self.fetcher = fetcher
+        self.frontier = frontier
+        self.concurrency = max(1, concurrency)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.pages = 0
+
+    async def run(self, seeds: List[str]) -> dict:
+        await self.frontier.start_run(seeds)
+        discovered = 0
+        try:
+            while self.pages < self.max_pages:
+                batch = await self.frontier.pop_listings(min(self.concurrency, self.max_pages - self.pages))
+                if not batch:
+                    break
+                self.pages += len(batch)
+                await self.frontier.keep_running()
+                results = await asyncio.gather(*(self._visit(url, depth) for url, depth in batch))
+                discovered += sum(results)
+        finally:
+            await self.frontier.finish_run()
+        logger.info(f"Discovery finished: {self.pages} listing pages, {discovered} new URLs")
+        return {"pages": self.pages, "discovered": discovered}
+
+    async def _visit(self, url: str, depth: int) -> int:
+        try:
+            response = await self.fetcher.fetch(url)
+            details, listings = extract_links(url, response.text)
+        except Exception as e:
+            logger.warning(f"Failed to discover links from {url}: {str(e)}")
+            await self.frontier.record_listing(0, failed=True)
+            return 0
+
+        # URL chi tiết tìm thấy ở depth thấp được crawl trước
+        new_urls = await self.frontier.push(details, priority=depth)
+        if depth < self.max_depth:
+            await self.frontier.push_listings(listings, depth + 1)
+        await self.frontier.record_listing(new_urls)
+        logger.debug(f"Discovered {new_urls}/{len(details)} new URLs from {url} (depth {depth})")
+        return new_urls
@@ -0,0 +1,234 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from selectolax.parser import HTMLParser
+
+from app.schemas.crawler import RawMovieData
+from app.core.config import settings
+from app.services.compiled_extractor import extract_movie_compiled
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+class VieonExtractor:
+    """
+    Extract dữ liệu phim từ HTML trang chi tiết vieon.vn
+    """
+    
+    def extract_movie(self, url: str, html: str | bytes) -> RawMovieData:
+        """
+        Parse HTML và extract dữ liệu phim
+        """
+        # Parse HTML với selectolax
+        tree = HTMLParser(html)
+        metadata = self._extract_metadata_by_position(tree)
+        # Extract dữ liệu theo HTML structure
+        return RawMovieData(
+            url=url,
+            title=self._extract_title(tree),
+            description=self._extract_description(tree),
+            rating=self._extract_rating(tree),
+            view_count=self._extract_view_count(tree),
+            # Dùng data từ metadata
+            release_year=metadata.get('release_year'),
+            duration=metadata.get('duration'),
+            country=metadata.get('country'),
+            video_quality=metadata.get('video_quality'),
+            age_rating=metadata.get('age_rating'),
+            access_type=metadata.get('access_type'), 
+            genre=metadata.get('genre'),
+            director=metadata.get('director'),
+            # Extract riêng
+            thumbnail_url=self._extract_thumbnail(tree),
+            video_url=self._extract_video_url(tree),
+            actors=self._extract_actors(tree),
+        )
+    
+    def _extract_title(self, tree: HTMLParser) -> Optional[str]:
+        """Extract title từ h2.card_title"""
+        try:
+            element = tree.css_first('h2.card__title')
+            return element.text().strip() if element else None
+        except Exception:
+            return None
+    
+    def _extract_description(self, tree: HTMLParser) -> Optional[str]:
+        """Extract description từ div.intro_info_desc"""
+        try:
+            element = tree.css_first('.intro__info__desc')
+            return element.text().strip() if element else None
+        except Exception:
+            return None
+    
+    def _extract_rating(self, tree: HTMLParser) -> Optional[str]:
+        """Extract rating từ span.rating__summary"""
+        try:
+            element = tree.css_first('span.rating__summary')
+            return element.text().strip() if element else None
+        except Exception:
+            return None
+    
+    def _extract_view_count(self, tree: HTMLParser) -> Optional[str]:
+        """Extract view count từ span.viewer_summary"""
+        try:
+            element = tree.css_first('.viewer .viewer__summary')
+            return element.text().strip() if element else None
+        except Exception:
+            return None
+
+    def _extract_metadata_by_position(self, tree: HTMLParser) -> dict:
+        """
+        Extract metadata theo thứ tự position vì các element có cùng class
+        Return dict với các key: duration, country, video_quality
+        """
+        try:
+            # Tìm tất cả label.Tag_Base__Jb03L theo thứ tự xuất hiện
+            elements_1 = tree.css('.intro__info .intro__info-left .Tag_Base__Jb03L span')
+            logger.debug(f"Total elements_1 found: {len(elements_1)}")
+            elements_2 = tree.css('.intro__info .intro__info-right .tags-group')
+            logger.debug(f"Total elements_2 found: {len(elements_2)}")
+            result= {
+                'release_year': None,
+                'access_type': 'free',
+                'age_rating':None,
+                'duration': None, 
+                'country': None,
+                'video_quality': None,
+                'director': None,
+                'genre': [],
+            }
+            
+            for i, element in enumerate(elements_1):
+                text = element.text().strip()
+                
+                # Position 0: Năm (4 chữ số, bắt đầu 20xx) or access_type
+                if i == 0:
+                    if len(text) == 4 and text.startswith('20'):
+                        result['release_year'] = text
+                    else:
+                        result['access_type'] = text
+                # Position 1: Độ tuổi phù hợp
+                elif i == 1:
+                    result['age_rating'] = text
+                
+                # Position 2: Country
+                elif i == 2:
+                    result['country'] = text
+                
+                # Position 3: Duration format "1g 23ph"
+                elif i == 3:
+                    result['duration'] = text
+                
+                # Position 4: Video quality
+                else:
+                    result['video_quality'] = text
+   
+            for i, group in enumerate(elements_2):
+                label = group.css_first('label')
+                if not label:
+                    continue
+                label_text = label.text().strip()
+                if label_text.startswith("Đạo diễn"):
+                    link = group.css('a')
+                    if link:
+                        result['director'] = link.text().strip()
+                        logger.debug(f"director: {link}")
+
+                elif label_text.startswith("Thể loại"):
+                    links = group.css('a')
+                    result['genre'] = [link.text().strip() for link in links]
+                    logger.debug(f"genre: {result['genre']}")
+            return result
+            
+        except Exception as e:
+            logger.error(f"Failed to extract metadata by position: {str(e)}")
+            return result
+    
+    def _extract_thumbnail(self, tree: HTMLParser) -> Optional[str]:
+        """Extract thumbnail URL từ img tags"""
+        try:
+            # Tìm img trong player poster hoặc image-block
+            img = tree.css_first('section.section--vod-detail img.billboard__image__hero')
+            if img:
+                src = img.attributes.get('src') 
+                return src
+            return None
+        except Exception:
+            return None
+    
+    def _extract_video_url(self, tree: HTMLParser) -> Optional[str]:
+        """Extract video URL từ video tag """
+        try:
+            # Tìm video tag
+            video = tree.css_first('video#VIE_PLAYER')
+            if video:
+                src = video.attributes.get('src')
+                if src:
+                    return src
+            return None
+        except Exception:
+            return None
+    
+    def _extract_actors(self, tree: HTMLParser) -> Optional[List[str]]:
+        """Extract actors từ tags-group links"""
+        try:
+            actors = []
+            groups = tree.css('.intro__info-right .tags-group')
+            for group in groups:
+                label = group.css_first('label')
+                if label and label.text().strip().startswith("Diễn viên"):
+                # Lấy tất cả thẻ <a> trong group diễn viên
+                    links = group.css('a')
+                for link in links:
+                    actors.append(link.text().strip())
+                break  
+
+            return actors if actors else None
+        except Exception:
+            return None
+
+
+_extractor = VieonExtractor()
+_extract_pool: Optional[ProcessPoolExecutor] = None
+
+def extract_movie(url: str, html: str | bytes) -> RawMovieData:
+    """
+    Hàm module-level để có thể pickle và chạy trong process pool.
+    Mặc định dùng compiled extractor (một lần duyệt DOM), "legacy" dùng VieonExtractor
+    """
+    if settings.CRAWLER_EXTRACTOR == "legacy":
+        return _extractor.extract_movie(url, html)
+    return extract_movie_compiled(url, html)
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    """
+    Lấy process pool dùng cho extraction, tạo mới nếu chưa có
+    """
+    global _extract_pool
+    if _extract_pool is None:
+        # Dùng spawn để không fork process đang có event loop + thread của motor
+        _extract_pool = ProcessPoolExecutor(
+            max_workers=settings.CRAWLER_EXTRACT_PROCESSES or None,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info(f"Extraction process pool started (workers: {_extract_pool._max_workers})")
+    return _extract_pool
+
+async def extract_movie_in_pool(url: str, html: bytes) -> RawMovieData:
+    """
+    Chạy extraction trong process pool để không block event loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_extract_pool(), extract_movie, url, html)
+
+def shutdown_extract_pool():
+    global _extract_pool
+    try:
+        if _extract_pool is not None:
+            _extract_pool.shutdown(wait=True, cancel_futures=True)
+            _extract_pool = None
+            logger.info("Extraction process pool shut down")
+    except Exception as e:
+        logger.error(f"Error shutting down extraction pool: {str(e)}", exc_info=True)
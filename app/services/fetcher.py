@@ -0,0 +1,188 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import httpx
+
+from app.core.logging import get_logger
+from app.services.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+logger = get_logger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class FetchError(Exception):
+    """
+    Request thất bại sau khi đã retry, giữ lại số lần thử để báo cáo
+    """
+
+    def __init__(self, url: str, attempts: int, error: Exception):
+        self.url = url
+        self.attempts = attempts
+        self.error = error
+        super().__init__(f"{str(error)} (attempts={attempts})")
+
+class RetryableStatus(Exception):
+    def __init__(self, response: httpx.Response):
+        self.response = response
+        super().__init__(f"HTTP {response.status_code} for url '{response.request.url}'")
+
+class RetryPolicy:
+    """
+    Exponential backoff với full jitter: chờ ngẫu nhiên trong [0, min(max_delay, base_delay * 2^(attempt-1))]
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 10.0,
+                 rng: Optional[random.Random] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = self._rng.uniform(0, cap)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        return isinstance(error, (httpx.TransportError, RetryableStatus))
+
+class LatencyTracker:
+    """
+    Giữ latency của N request gần nhất để ước lượng p95 cho hedged request
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def add(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+class RetryingFetcher:
+    """
+    GET với timeout theo từng phase (cấu hình trên client), retry lỗi tạm thời
+    và hedged request: nếu request chưa xong sau p95 latency thì gửi thêm một request
+    song song, lấy kết quả nào về trước.
+    """
+
+    def __init__(
+        self,
+        client_getter: Callable[[], httpx.AsyncClient],
+        rate_limiter: AdaptiveRateLimiter,
+        policy: Optional[RetryPolicy] = None,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.05,
+    ):
+        self._client_getter = client_getter
+        self.rate_limiter = rate_limiter
+        self.policy = policy or RetryPolicy()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = LatencyTracker()
+        self.reset_stats()
+
+    def reset_stats(self):
+        # bytes: body sau khi giải nén, bytes_downloaded: số byte thực tế trên network
+        self.stats = {"requests": 0, "retries": 0, "hedged": 0, "hedge_wins": 0, "bytes": 0, "bytes_downloaded": 0}
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """
+        Trả về response 2xx/304, raise FetchError nếu hết số lần thử hoặc lỗi không retry được
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = await self._attempt(url, headers)
+                if response.status_code in RETRYABLE_STATUS:
+                    raise RetryableStatus(response)
+                if response.status_code != 304:
+                    response.raise_for_status()
+                return response
+            except Exception as e:
+                if not self.policy.is_retryable(e) or attempt >= self.policy.max_attempts:
+                    raise FetchError(url, attempt, e) from e
+                retry_after = None
+                if isinstance(e, RetryableStatus):
+                    retry_after = parse_retry_after(e.response.headers.get("retry-after"))
+                delay = self.policy.backoff(attempt, retry_after)
+                self.stats["retries"] += 1
+                logger.warning(f"Retrying {url} in {delay:.2f}s (attempt {attempt} failed: {str(e)})")
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, url: str, headers: Optional[Dict[str, str]]) -> httpx.Response:
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None:
+            return await self._send(url, headers)
+
+        primary = asyncio.create_task(self._send(url, headers))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        self.stats["hedged"] += 1
+        backup = asyncio.create_task(self._send(url, headers))
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        p = self.latency.percentile(self.hedge_quantile)
+        if p is None:
+            return None
+        return max(self.hedge_min_delay, p)
+
+    async def _send(self, url: str, headers: Optional[Dict[str, str]]) -> httpx.Response:
+        # Chờ theo rate hiện tại của host
+        await self.rate_limiter.acquire(url)
+        self.stats["requests"] += 1
+        started = time.monotonic()
+        try:
+            response = await self._client_getter().get(url, headers=headers)
+        except httpx.TransportError:
+            self.rate_limiter.record(url, time.monotonic() - started)
+            raise
+        latency = time.monotonic() - started
+        self.latency.add(latency)
+        self.stats["bytes"] += len(response.content)
+        self.stats["bytes_downloaded"] += response.num_bytes_downloaded
+        self.rate_limiter.record(
+            url,
+            latency,
+            response.status_code,
+            retry_after=parse_retry_after(response.headers.get("retry-after")),
+        )
+        return response
+
+    def snapshot(self) -> dict:
+        p95 = self.latency.percentile(0.95)
+        return {**self.stats, "latency_p95": round(p95, 3) if p95 is not None else None}
@@ -0,0 +1,69 @@
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+http_client: Optional[httpx.AsyncClient] = None
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Tạo AsyncClient với connection pool cho crawler
+    """
+    http2 = settings.CRAWLER_HTTP2
+    if http2 and not _http2_available():
+        logger.warning("CRAWLER_HTTP2 is enabled but 'h2' is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.CRAWLER_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.CRAWLER_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.CRAWLER_KEEPALIVE_EXPIRY,
+    )
+    # Timeout riêng cho từng phase: connect ngắn để fail nhanh, read dài hơn cho trang lớn
+    timeout = httpx.Timeout(
+        connect=settings.CRAWLER_CONNECT_TIMEOUT,
+        read=settings.CRAWLER_READ_TIMEOUT,
+        write=settings.CRAWLER_WRITE_TIMEOUT,
+        pool=settings.CRAWLER_POOL_TIMEOUT,
+    )
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=limits,
+        timeout=timeout,
+        follow_redirects=True,
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Lấy client dùng chung, tạo mới nếu chưa được khởi tạo trong lifespan
+    """
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_http_client()
+    return http_client
+
+async def init_http_client():
+    client = get_http_client()
+    logger.info(f"HTTP client ready (max_connections: {settings.CRAWLER_MAX_CONNECTIONS})")
+    return client
+
+async def close_http_client():
+    global http_client
+    try:
+        if http_client is not None:
+            await http_client.aclose()
+            http_client = None
+            logger.info("HTTP client closed")
+    except Exception as e:
+        logger.error(f"Error closing HTTP client: {str(e)}", exc_info=True)
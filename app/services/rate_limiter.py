@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+class TokenBucket:
+    """
+    Token bucket: `rate` token/giây, tối đa `burst` token
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self._clock = clock
+        self._last = clock()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def reserve(self) -> float:
+        """
+        Lấy một token, trả về số giây phải chờ trước khi được gửi request
+        """
+        now = self._clock()
+        self._refill(now)
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self._paused_until - now)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    async def acquire(self):
+        # Lock để các request chờ theo đúng thứ tự
+        async with self._lock:
+            wait = self.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+class HostLimit:
+    """
+    Rate của một host, điều chỉnh theo AIMD:
+    tăng cộng khi response nhanh và thành công, giảm nhân khi gặp 429/5xx/lỗi hoặc chậm
+    """
+
+    def __init__(self, limiter: "AdaptiveRateLimiter"):
+        self.limiter = limiter
+        self.bucket = TokenBucket(limiter.initial_rate, limiter.burst, clock=limiter.clock)
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.latency_ewma: Optional[float] = None
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def _set_rate(self, rate: float):
+        self.bucket._refill(self.limiter.clock())
+        self.bucket.rate = min(self.limiter.max_rate, max(self.limiter.min_rate, rate))
+
+    def record(self, latency: Optional[float], status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        limiter = self.limiter
+        self.requests += 1
+        if latency is not None:
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+
+        if status_code is None or status_code == 429 or status_code >= 500:
+            if status_code == 429:
+                self.throttled += 1
+                if retry_after:
+                    self.bucket.pause(retry_after)
+            else:
+                self.errors += 1
+            self._set_rate(self.rate * limiter.decrease_factor)
+        elif latency is not None and latency > limiter.latency_target:
+            # Server bắt đầu chậm: giảm nhẹ trước khi bị chặn
+            self._set_rate(self.rate * limiter.slow_decrease_factor)
+        else:
+            self._set_rate(self.rate + limiter.increase_step)
+
+    def snapshot(self) -> dict:
+        return {
+            "rate": round(self.rate, 3),
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+        }
+
+class AdaptiveRateLimiter:
+    """
+    Rate limiter theo từng host, mỗi host một token bucket với rate thích nghi (AIMD)
+    trong khoảng [min_rate, max_rate] request/giây
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 1.0,
+        min_rate: float = 0.2,
+        max_rate: float = 20.0,
+        increase_step: float = 0.2,
+        decrease_factor: float = 0.5,
+        slow_decrease_factor: float = 0.9,
+        latency_target: float = 2.0,
+        burst: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not 0 < min_rate <= max_rate:
+            raise ValueError("Rate limits must satisfy 0 < min_rate <= max_rate")
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.initial_rate = min(max_rate, max(min_rate, initial_rate))
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.slow_decrease_factor = slow_decrease_factor
+        self.latency_target = latency_target
+        self.burst = burst
+        self.clock = clock
+        self.hosts: Dict[str, HostLimit] = {}
+
+    def host(self, url: str) -> HostLimit:
+        host = urlsplit(url).netloc
+        limit = self.hosts.get(host)
+        if limit is None:
+            limit = self.hosts[host] = HostLimit(self)
+        return limit
+
+    async def acquire(self, url: str):
+        await self.host(url).bucket.acquire()
+
+    def record(self, url: str, latency: Optional[float], status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        """
+        Ghi nhận kết quả request. status_code=None nghĩa là lỗi kết nối/timeout
+        """
+        self.host(url).record(latency, status_code, retry_after)
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {host: limit.snapshot() for host, limit in self.hosts.items()}
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import math
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.crawl_state import CrawlJobAlreadyRunning
+import app.crud.crawl_page as crud_crawl_page
+
+logger = get_logger(__name__)
+
+# Chỉ một replica chạy scheduler (lock có TTL, được gia hạn mỗi vòng)
+LEADER_KEY = "crawl:scheduler:leader"
+
+def change_probability(
+    changes: int,
+    observed_hours: float,
+    age_hours: float,
+    prior_changes: float = 1.0,
+    prior_hours: float = 168.0,
+) -> float:
+    """
+    Xác suất trang đã thay đổi kể từ lần crawl cuối, coi thay đổi là Poisson với
+    tần suất λ = (changes + prior_changes) / (observed_hours + prior_hours) lần/giờ.
+    Prior mặc định: 1 lần/tuần cho trang chưa có lịch sử
+    """
+    rate = (changes + prior_changes) / (max(0.0, observed_hours) + prior_hours)
+    return 1.0 - math.exp(-rate * max(0.0, age_hours))
+
+def priority_expression(now: datetime, prior_changes: float = 1.0, prior_hours: float = 168.0) -> dict:
+    """
+    change_probability viết thành biểu thức aggregation để Mongo tự chọn top-k trang
+    """
+    def hours(start, end) -> dict:
+        return {"$max": [0, {"$divide": [{"$subtract": [end, start]}, 3600 * 1000]}]}
+
+    return {"$let": {
+        "vars": {"last": {"$ifNull": ["$last_crawled_at", now]}},
+        "in": {"$let": {
+            "vars": {
+                "rate": {"$divide": [
+                    {"$add": [{"$ifNull": ["$changes", 0]}, prior_changes]},
+                    {"$add": [hours({"$ifNull": ["$first_crawled_at", "$$last"]}, "$$last"), prior_hours]},
+                ]},
+            },
+            "in": {"$subtract": [1, {"$exp": {"$multiply": [-1, "$$rate", hours("$$last", now)]}}]},
+        }},
+    }}
+
+def recrawl_priority(page: dict, now: datetime) -> float:
+    last = page.get("last_crawled_at") or now
+    first = page.get("first_crawled_at") or last
+    return change_probability(
+        page.get("changes", 0) or 0,
+        (last - first).total_seconds() / 3600,
+        (now - last).total_seconds() / 3600,
+    )
+
+def select_recrawl(pages: List[dict], budget: int, now: datetime) -> List[dict]:
+    """
+    `budget` trang có xác suất đã thay đổi cao nhất
+    """
+    if budget <= 0:
+        return []
+    scored = ((recrawl_priority(page, now), page["url"], page) for page in pages)
+    top = heapq.nlargest(budget, scored, key=lambda entry: (entry[0], entry[1]))
+    return [{**page, "priority": round(priority, 4)} for priority, _, page in top]
+
+class RecrawlScheduler:
+    """
+    Định kỳ tạo crawl job cho các VOD đã lưu, ưu tiên trang hay thay đổi view_count/rating
+    và đã lâu chưa crawl, trong giới hạn pages_per_hour
+    """
+
+    def __init__(self, crawler, pages_per_hour: Optional[int] = None, interval: Optional[float] = None,
+                 min_age: Optional[float] = None):
+        self.crawler = crawler
+        self.pages_per_hour = pages_per_hour or settings.CRAWLER_RECRAWL_PAGES_PER_HOUR
+        self.interval = interval or settings.CRAWLER_RECRAWL_INTERVAL
+        # Không recrawl trang vừa crawl xong
+        self.min_age = timedelta(seconds=min_age if min_age is not None else settings.CRAWLER_RECRAWL_MIN_AGE)
+        self.redis = crawler.state.redis
+        self._task: Optional[asyncio.Task] = None
+        self._last_tick: Optional[float] = None
+        self.last_run: Optional[dict] = None
+        self.runs = 0
+
+    def budget(self, now: float) -> int:
+        """
+        Số trang được phép crawl trong vòng này = pages_per_hour * thời gian từ vòng trước
+        (tối đa một interval để không dồn budget sau khi dừng lâu)
+        """
+        elapsed = self.interval if self._last_tick is None else min(now - self._last_tick, self.interval)
+        return int(self.pages_per_hour * elapsed / 3600)
+
+    async def candidates(self, budget: int) -> List[dict]:
+        now = datetime.utcnow()
+        if budget <= 0:
+            return []
+        pages = await crud_crawl_page.list_recrawl_candidates(now - self.min_age, priority_expression(now), budget)
+        return select_recrawl(pages, budget, now)
+
+    async def run_once(self) -> dict:
+        now = time.monotonic()
+        budget = self.budget(now)
+        self._last_tick = now
+        if await self.crawler.state.running_job():
+            return self._finish({"status": "skipped", "reason": "crawl job running", "budget": budget})
+
+        selected = await self.candidates(budget)
+        if not selected:
+            return self._finish({"status": "idle", "budget": budget, "selected": 0})
+        try:
+            job_id = (await self.crawler.start_job([page["url"] for page in selected]))["job_id"]
+        except CrawlJobAlreadyRunning:
+            return self._finish({"status": "skipped", "reason": "crawl job running", "budget": budget})
+
+        logger.info(
+            f"Recrawl job {job_id}: {len(selected)}/{budget} pages "
+            f"(priority {selected[-1]['priority']}..{selected[0]['priority']})"
+        )
+        # Worker trong process này crawl cùng các worker khác, chờ xong mới tính vòng sau
+        await self.crawler.run_worker(job_id)
+        return self._finish({
+            "status": "completed",
+            "job_id": job_id,
+            "budget": budget,
+            "selected": len(selected),
+            "max_priority": selected[0]["priority"],
+            "min_priority": selected[-1]["priority"],
+        })
+
+    def _finish(self, result: dict) -> dict:
+        self.runs += 1
+        self.last_run = {**result, "time": datetime.now().isoformat()}
+        return result
+
+    async def _is_leader(self) -> bool:
+        ttl = int(self.interval * 2) + 60
+        if await self.redis.set(LEADER_KEY, self.crawler.worker_id, nx=True, ex=ttl):
+            return True
+        if await self.redis.get(LEADER_KEY) == self.crawler.worker_id:
+            await self.redis.expire(LEADER_KEY, ttl)
+            return True
+        return False
+
+    async def _loop(self):
+        while True:
+            try:
+                if await self._is_leader():
+                    await self.run_once()
+            except Exception as e:
+                logger.error(f"Recrawl scheduler run failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Recrawl scheduler started ({self.pages_per_hour} pages/hour, every {self.interval}s)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if await self.redis.get(LEADER_KEY) == self.crawler.worker_id:
+            await self.redis.delete(LEADER_KEY)
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "pages_per_hour": self.pages_per_hour,
+            "interval": self.interval,
+            "runs": self.runs,
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,252 @@
+import hashlib
+import math
+import time
+from typing import Iterable, List, Tuple
+
+from app.db.redis_client import redis_client
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Key layout
+#   crawl:discovery:frontier      -> zset URL trang chi tiết chờ crawl, score = priority (nhỏ hơn crawl trước)
+#   crawl:discovery:listings      -> zset trang listing/sitemap chờ duyệt, score = depth
+#   crawl:discovery:listings_seen -> set listing đã đưa vào hàng đợi trong lần discover hiện tại
+#   crawl:discovery:seen          -> Bloom filter (bitmap) tất cả URL chi tiết đã từng thấy
+#   crawl:discovery:running       -> lock của lần discover đang chạy (có TTL, được gia hạn sau mỗi batch)
+#   crawl:discovery:stats         -> hash counters (discovered, duplicates, listings_fetched, ...)
+#   crawl:discovery:rate:{minute} -> số URL mới tìm được trong phút đó (có TTL)
+FRONTIER_KEY = "crawl:discovery:frontier"
+LISTINGS_KEY = "crawl:discovery:listings"
+LISTINGS_SEEN_KEY = "crawl:discovery:listings_seen"
+BLOOM_KEY = "crawl:discovery:seen"
+STATS_KEY = "crawl:discovery:stats"
+RUNNING_KEY = "crawl:discovery:running"
+RUNNING_TTL = 120
+RATE_KEY_PREFIX = "crawl:discovery:rate:"
+RATE_WINDOW_MINUTES = 5
+
+def bloom_parameters(capacity: int, error_rate: float) -> Tuple[int, int]:
+    """
+    Số bit m và số hàm hash k tối ưu cho `capacity` phần tử với tỉ lệ false positive `error_rate`
+    """
+    if capacity <= 0 or not 0 < error_rate < 1:
+        raise ValueError("Bloom filter needs capacity > 0 and 0 < error_rate < 1")
+    bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+class DiscoveryAlreadyRunning(Exception):
+    pass
+
+class RedisBloomFilter:
+    """
+    Bloom filter trên một Redis bitmap (SETBIT/GETBIT), dùng chung giữa các worker.
+    1 triệu URL với error_rate 0.001 chỉ tốn ~1.8MB thay vì lưu toàn bộ URL trong một set.
+    """
+
+    def __init__(self, key: str, capacity: int, error_rate: float, client=None):
+        self.redis = client or redis_client
+        self.key = key
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits, self.hashes = bloom_parameters(capacity, error_rate)
+
+    def positions(self, value: str) -> List[int]:
+        # Double hashing: h1 + i*h2 thay cho k hàm hash độc lập
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    async def add_many(self, values: List[str]) -> List[bool]:
+        """
+        Thêm các giá trị, trả về True cho giá trị chưa từng có (ít nhất một bit trước đó bằng 0).
+        Chạy trong MULTI nên hai worker cùng thêm một URL thì chỉ một worker thấy True
+        """
+        if not values:
+            return []
+        pipe = self.redis.pipeline(transaction=True)
+        for value in values:
+            for position in self.positions(value):
+                pipe.setbit(self.key, position, 1)
+        previous = await pipe.execute()
+        added = []
+        for i in range(len(values)):
+            bits = previous[i * self.hashes:(i + 1) * self.hashes]
+            added.append(not all(bits))
+        return added
+
+    async def contains_many(self, values: List[str]) -> List[bool]:
+        if not values:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for value in values:
+            for position in self.positions(value):
+                pipe.getbit(self.key, position)
+        bits = await pipe.execute()
+        return [all(bits[i * self.hashes:(i + 1) * self.hashes]) for i in range(len(values))]
+
+    def snapshot(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "bits": self.bits,
+            "hashes": self.hashes,
+            "size_bytes": math.ceil(self.bits / 8),
+        }
+
+class DiscoveryFrontier:
+    """
+    Frontier của discovery mode: URL chi tiết mới (đã dedupe qua Bloom filter) nằm trong
+    sorted set theo priority, trang listing/sitemap nằm trong sorted set theo depth
+    """
+
+    def __init__(self, capacity: int, error_rate: float, client=None):
+        self.redis = client or redis_client
+        self.seen = RedisBloomFilter(BLOOM_KEY, capacity, error_rate, client=self.redis)
+
+    async def push(self, urls: Iterable[str], priority: float = 0) -> int:
+        """
+        Đẩy URL chi tiết vào frontier, bỏ qua URL đã thấy. Trả về số URL mới
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return 0
+        added = await self.seen.add_many(urls)
+        new_urls = [url for url, is_new in zip(urls, added) if is_new]
+
+        minute_key = f"{RATE_KEY_PREFIX}{int(time.time() // 60)}"
+        pipe = self.redis.pipeline(transaction=False)
+        if new_urls:
+            pipe.zadd(FRONTIER_KEY, {url: priority for url in new_urls}, nx=True)
+            pipe.incrby(minute_key, len(new_urls))
+            pipe.expire(minute_key, (RATE_WINDOW_MINUTES + 1) * 60)
+        pipe.hincrby(STATS_KEY, "discovered", len(new_urls))
+        pipe.hincrby(STATS_KEY, "duplicates", len(urls) - len(new_urls))
+        results = await pipe.execute()
+
+        discovered = int(results[-2])
+        if new_urls and discovered > self.seen.capacity:
+            logger.warning(
+                f"Discovery Bloom filter is over capacity ({discovered} > {self.seen.capacity}), "
+                f"false positive rate is rising"
+            )
+        return len(new_urls)
+
+    async def pop(self, count: int) -> List[Tuple[str, float]]:
+        """
+        Lấy tối đa `count` (url, score) có priority cao nhất (score nhỏ nhất) ra khỏi frontier
+        """
+        entries: List[Tuple[str, float]] = []
+        while len(entries) < count:
+            batch = await self.redis.zpopmin(FRONTIER_KEY, min(1000, count - len(entries)))
+            if not batch:
+                break
+            entries.extend((url, float(score)) for url, score in batch)
+        return entries
+
+    async def requeue(self, entries: Iterable[Tuple[str, float]]):
+        """
+        Trả (url, score) đã pop về frontier với score cũ (ví dụ khi không tạo được job), không qua Bloom filter
+        """
+        scores = dict(entries)
+        if scores:
+            await self.redis.zadd(FRONTIER_KEY, scores, nx=True)
+
+    async def size(self) -> int:
+        return await self.redis.zcard(FRONTIER_KEY)
+
+    async def start_run(self, seeds: List[str]):
+        """
+        Bắt đầu lần discover mới: listing được duyệt lại từ seed để tìm URL mới,
+        còn Bloom filter giữ nguyên nên URL đã thấy không bị đẩy lại
+        """
+        if not await self.redis.set(RUNNING_KEY, "1", nx=True, ex=RUNNING_TTL):
+            raise DiscoveryAlreadyRunning()
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(LISTINGS_KEY, LISTINGS_SEEN_KEY)
+        pipe.hset(STATS_KEY, mapping={
+            "run_started_at": time.time(),
+            "run_discovered": 0,
+            "listings_fetched": 0,
+            "listings_failed": 0,
+        })
+        pipe.hdel(STATS_KEY, "run_finished_at")
+        await pipe.execute()
+        await self.push_listings(seeds, depth=0)
+
+    async def keep_running(self):
+        # Lock tự hết hạn nếu process discover bị kill
+        await self.redis.expire(RUNNING_KEY, RUNNING_TTL)
+
+    async def finish_run(self):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(STATS_KEY, "run_finished_at", time.time())
+        pipe.delete(LISTINGS_KEY, LISTINGS_SEEN_KEY, RUNNING_KEY)
+        await pipe.execute()
+
+    async def push_listings(self, urls: Iterable[str], depth: int) -> int:
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return 0
+        pipe = self.redis.pipeline(transaction=True)
+        for url in urls:
+            pipe.sadd(LISTINGS_SEEN_KEY, url)
+        added = await pipe.execute()
+        new_urls = [url for url, is_new in zip(urls, added) if is_new]
+        if new_urls:
+            await self.redis.zadd(LISTINGS_KEY, {url: depth for url in new_urls}, nx=True)
+        return len(new_urls)
+
+    async def pop_listings(self, count: int) -> List[Tuple[str, int]]:
+        batch = await self.redis.zpopmin(LISTINGS_KEY, count)
+        return [(url, int(depth)) for url, depth in batch]
+
+    async def record_listing(self, discovered: int, failed: bool = False):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(STATS_KEY, "listings_failed" if failed else "listings_fetched", 1)
+        pipe.hincrby(STATS_KEY, "run_discovered", discovered)
+        await pipe.execute()
+
+    async def stats(self) -> dict:
+        now_minute = int(time.time() // 60)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcard(FRONTIER_KEY)
+        pipe.zcard(LISTINGS_KEY)
+        pipe.hgetall(STATS_KEY)
+        pipe.exists(RUNNING_KEY)
+        pipe.mget([f"{RATE_KEY_PREFIX}{now_minute - i}" for i in range(RATE_WINDOW_MINUTES)])
+        frontier_size, listings_pending, raw, running, per_minute = await pipe.execute()
+
+        recent = sum(int(value or 0) for value in per_minute)
+        started = float(raw.get("run_started_at", 0) or 0)
+        finished = float(raw.get("run_finished_at", 0) or 0)
+        run_discovered = int(raw.get("run_discovered", 0) or 0)
+        if finished:
+            elapsed = finished - started
+        else:
+            elapsed = time.time() - started if started else 0
+        return {
+            "status": "running" if running else "idle",
+            "frontier_size": frontier_size,
+            "listings_pending": listings_pending,
+            "discovered_total": int(raw.get("discovered", 0) or 0),
+            "duplicates": int(raw.get("duplicates", 0) or 0),
+            "listings_fetched": int(raw.get("listings_fetched", 0) or 0),
+            "listings_failed": int(raw.get("listings_failed", 0) or 0),
+            "run_discovered": run_discovered,
+            # URL mới/phút trong RATE_WINDOW_MINUTES phút gần nhất và trung bình của lần discover gần nhất
+            "discovery_rate_per_min": round(recent / RATE_WINDOW_MINUTES, 2),
+            "run_rate_per_min": round(run_discovered / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "bloom": self.seen.snapshot(),
+        }
+
+    async def reset(self):
+        """
+        Xóa toàn bộ frontier và Bloom filter (URL đã thấy sẽ được discover lại)
+        """
+        keys = [FRONTIER_KEY, LISTINGS_KEY, LISTINGS_SEEN_KEY, BLOOM_KEY, STATS_KEY, RUNNING_KEY]
+        async for key in self.redis.scan_iter(match=f"{RATE_KEY_PREFIX}*"):
+            keys.append(key)
+        await self.redis.delete(*keys)
@@ -0,0 +1,98 @@
+"""
+Benchmark cache hit của GET /vods: cách cũ (json.loads -> VodResponse(**item) -> response_model
+validate + serialize lại) so với cách mới (trả thẳng body bytes đã serialize khi ghi cache).
+Redis được thay bằng dict trong process nên số đo chỉ gồm phần CPU phía app, round-trip
+Redis như nhau ở cả hai cách.
+
+Chạy: python -m app.tests.benchmarks.bench_cache [số request] [số item mỗi trang]
+"""
+import json
+import logging
+import statistics
+import sys
+import time
+from typing import List
+
+from bson import ObjectId
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints.vod import VOD_LIST_ADAPTER
+from app.schemas.vod import VodResponse
+from app.utils.cache import CachedResponse, _pack, _unpack
+
+def _sample_vods(count: int) -> List[VodResponse]:
+    return [
+        VodResponse(
+            _id=ObjectId(),
+            title=f"Cuộc Rượt Đuổi Tại Cực Địa {i}",
+            description="Một nhóm thám hiểm mắc kẹt tại vùng cực địa và phải chạy trốn " * 3,
+            url=f"https://vieon.vn/cuoc-ruot-duoi-{i}.html",
+            country="Việt Nam",
+            tags=["hành động", "phiêu lưu"],
+            release_year=2020 + i % 5,
+            duration=5400,
+            genre=["Hành Động", "Phiêu Lưu"],
+            thumbnail_url=f"https://static.vieon.vn/{i}.jpg",
+            view_count=1000 * i,
+            rating=4.5,
+            actors=["Trấn Thành", "Lê Giang", "Tuấn Trần"],
+            director="John Doe",
+        )
+        for i in range(count)
+    ]
+
+def _build_app(vods: List[VodResponse]) -> FastAPI:
+    # Payload cách cũ muốn lưu (model_dump JSON), payload cách mới (body cuối cùng + headers)
+    legacy_store = json.dumps([vod.model_dump(by_alias=True) for vod in vods], default=str)
+    bytes_store = _pack(CachedResponse(VOD_LIST_ADAPTER.dump_json(vods, by_alias=True), {}), time.time() + 300)
+    app = FastAPI()
+
+    @app.get("/legacy", response_model=List[VodResponse])
+    async def legacy():
+        # id trong cache là str, ObjectIdStr chỉ nhận ObjectId nên phải chuyển lại
+        items = json.loads(legacy_store)
+        return [VodResponse(**{**item, "_id": ObjectId(item["_id"])}) for item in items]
+
+    @app.get("/bytes", response_model=List[VodResponse])
+    async def cached_bytes():
+        cached, _ = _unpack(bytes_store)
+        return Response(content=cached.body, media_type="application/json", headers=cached.headers)
+
+    return app
+
+def _bench(client: TestClient, path: str, requests: int):
+    timings, cpu = [], []
+    for _ in range(requests):
+        start, start_cpu = time.perf_counter(), time.process_time()
+        client.get(path)
+        timings.append(time.perf_counter() - start)
+        cpu.append(time.process_time() - start_cpu)
+    return timings, cpu
+
+def _fmt(timings: list, cpu: list) -> str:
+    timings = sorted(timings)
+    p50 = statistics.median(timings) * 1e6
+    p95 = timings[int(len(timings) * 0.95) - 1] * 1e6
+    return f"p50 {p50:8.1f}us  p95 {p95:8.1f}us  cpu {statistics.mean(cpu) * 1e6:8.1f}us/req"
+
+def main(requests: int = 2000, items: int = 50):
+    logging.disable(logging.CRITICAL)
+    client = TestClient(_build_app(_sample_vods(items)))
+    assert client.get("/legacy").json() == client.get("/bytes").json()
+    # Warm up
+    _bench(client, "/legacy", 50)
+    _bench(client, "/bytes", 50)
+
+    legacy = _bench(client, "/legacy", requests)
+    cached = _bench(client, "/bytes", requests)
+    speedup = statistics.median(legacy[0]) / statistics.median(cached[0])
+    cpu_ratio = statistics.mean(legacy[1]) / statistics.mean(cached[1])
+
+    print(f"GET /vods cache hit ({items} items, {requests} requests)")
+    print(f"  legacy {_fmt(*legacy)}")
+    print(f"  bytes  {_fmt(*cached)}  ({speedup:.2f}x latency, {cpu_ratio:.2f}x cpu)")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark: so sánh thời gian extract mỗi trang giữa VieonExtractor (legacy,
+mỗi field một lần CSS lookup) và compiled extractor (một lần duyệt DOM).
+
+Chạy: python -m app.tests.benchmarks.bench_extractor [số vòng lặp]
+"""
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from app.services.compiled_extractor import extract_movie_compiled
+from app.services.extractor import VieonExtractor
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures"
+
+def _bench(fn, url: str, html: bytes, rounds: int) -> list:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(url, html)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def _fmt(timings: list) -> str:
+    timings = sorted(timings)
+    p50 = statistics.median(timings) * 1e6
+    p95 = timings[int(len(timings) * 0.95) - 1] * 1e6
+    return f"p50 {p50:8.1f}us  p95 {p95:8.1f}us"
+
+def main(rounds: int = 500):
+    # Tắt logging (log DEBUG của legacy extractor, log lỗi của director) để chỉ đo thời gian parse
+    logging.disable(logging.CRITICAL)
+    legacy = VieonExtractor()
+
+    for path in sorted(FIXTURES.glob("vieon_detail_*.html")):
+        html = path.read_bytes()
+        url = f"https://vieon.vn/{path.stem}.html"
+        # Warm up
+        legacy.extract_movie(url, html)
+        extract_movie_compiled(url, html)
+
+        legacy_timings = _bench(legacy.extract_movie, url, html, rounds)
+        compiled_timings = _bench(extract_movie_compiled, url, html, rounds)
+        speedup = statistics.median(legacy_timings) / statistics.median(compiled_timings)
+
+        print(f"{path.name} ({len(html) / 1024:.1f} KiB, {rounds} rounds)")
+        print(f"  legacy   {_fmt(legacy_timings)}")
+        print(f"  compiled {_fmt(compiled_timings)}  ({speedup:.2f}x)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import mongomock
+import pytest
+
+class AsyncCursor:
+    """
+    Bọc cursor mongomock (hoặc list) thành cursor async kiểu motor
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, spec):
+        self.cursor = self.cursor.sort(spec)
+        return self
+
+    def skip(self, n):
+        self.cursor = self.cursor.skip(n)
+        return self
+
+    def limit(self, n):
+        self.cursor = self.cursor.limit(n)
+        return self
+
+    async def _iterate(self):
+        for doc in self.cursor:
+            yield doc
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def to_list(self, length=None):
+        docs = list(self.cursor)
+        return docs if length is None else docs[:length]
+
+class AsyncCollection:
+    """
+    Bọc collection mongomock thành API async kiểu motor. Ghi lại cách đếm tổng (`counts`),
+    index đã xoá (`dropped`) và số document aggregate trả về (`returned`) để test kiểm tra
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.counts = []
+        self.dropped = []
+        self.returned = 0
+
+    def find(self, query=None, projection=None):
+        return AsyncCursor(self.collection.find(query, projection))
+
+    async def find_one(self, query, projection=None):
+        return self.collection.find_one(query, projection)
+
+    def aggregate(self, pipeline, **kwargs):
+        docs = list(self.collection.aggregate(pipeline))
+        self.returned += len(docs)
+        return AsyncCursor(docs)
+
+    async def count_documents(self, query):
+        self.counts.append("count_documents")
+        return self.collection.count_documents(query)
+
+    async def estimated_document_count(self):
+        self.counts.append("estimated_document_count")
+        return self.collection.estimated_document_count()
+
+    async def delete_many(self, query):
+        return self.collection.delete_many(query)
+
+    async def bulk_write(self, ops, ordered=True):
+        # bulk_write của mongomock không nhận UpdateOne của pymongo 4.x
+        modified = sum(self.collection.update_one(op._filter, op._doc).modified_count for op in ops)
+        return SimpleNamespace(modified_count=modified)
+
+    def list_indexes(self):
+        return AsyncCursor(list(self.collection.list_indexes()))
+
+    async def drop_index(self, name):
+        self.collection.drop_index(name)
+        self.dropped.append(name)
+
+@pytest.fixture
+def async_collection():
+    """
+    Collection mongomock rỗng bọc async; dữ liệu mẫu ghi thẳng qua `.collection`
+    """
+    return AsyncCollection(mongomock.MongoClient().db.collection)
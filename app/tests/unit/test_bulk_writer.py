@@ -0,0 +1,55 @@
+import asyncio
+
+from app.services.bulk_writer import BulkWriter
+
+def test_bulk_writer_flushes_full_batches_and_remainder_on_close():
+    batches = []
+
+    async def flush(items):
+        batches.append(list(items))
+        return {"failed": []}
+
+    async def run():
+        writer = BulkWriter(flush, batch_size=3, flush_interval=0)
+        for i in range(7):
+            await writer.add(i)
+        assert writer.pending == 1
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert writer.flushes == 3
+    assert writer.written == 7
+
+def test_bulk_writer_flushes_on_interval():
+    batches = []
+
+    async def flush(items):
+        batches.append(list(items))
+        return {"failed": []}
+
+    async def run():
+        writer = BulkWriter(flush, batch_size=100, flush_interval=0.01)
+        writer.start()
+        await writer.add("a")
+        await asyncio.sleep(0.05)
+        assert batches == [["a"]]
+        await writer.close()
+
+    asyncio.run(run())
+
+def test_bulk_writer_reports_errors():
+    failed = []
+
+    async def flush(items):
+        raise RuntimeError("mongo down")
+
+    async def run():
+        writer = BulkWriter(flush, batch_size=2, flush_interval=0, on_error=lambda batch, exc: failed.extend(batch))
+        await writer.add(1)
+        await writer.add(2)
+        await writer.close()
+
+    asyncio.run(run())
+    assert failed == [1, 2]
@@ -0,0 +1,53 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.services.compiled_extractor import CompiledSelector, extract_movie_compiled
+import app.services.extractor as extractor
+from app.services.extractor import VieonExtractor
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures"
+
+def _load(name: str) -> bytes:
+    return (FIXTURES / name).read_bytes()
+
+def test_compiled_extractor_reads_all_fields():
+    raw = extract_movie_compiled("https://vieon.vn/a.html", _load("vieon_detail_movie.html"))
+    assert raw.title == "Cuộc Rượt Đuổi Tại Cực Địa"
+    assert raw.rating == "4.5 (1.234 lượt đánh giá)"
+    assert raw.view_count == "40.182"
+    assert raw.release_year == "2023"
+    assert raw.access_type == "free"
+    assert raw.age_rating == "T16"
+    assert raw.country == "Mỹ"
+    assert raw.duration == "1g 23ph"
+    assert raw.video_quality == "HD"
+    assert raw.genre == ["Hành động", "Phiêu lưu"]
+    assert raw.actors == ["Tom Hardy", "Emily Blunt"]
+    assert raw.director == "John Doe"
+    assert raw.video_url.endswith("master.m3u8")
+
+@pytest.mark.parametrize("fixture", ["vieon_detail_movie.html", "vieon_detail_vip.html"])
+def test_compiled_extractor_matches_legacy(fixture):
+    html = _load(fixture)
+    legacy = VieonExtractor().extract_movie("u", html).model_dump()
+    compiled = extract_movie_compiled("u", html).model_dump()
+    # Legacy extractor không lấy được director (lỗi ở nhánh "Đạo diễn")
+    legacy.pop("director")
+    compiled.pop("director")
+    assert compiled == legacy
+
+def test_compiled_selector_rejects_unsupported_syntax():
+    with pytest.raises(ValueError):
+        CompiledSelector("div > a")
+
+def test_process_pool_extraction_matches_in_process(monkeypatch):
+    monkeypatch.setattr(extractor.settings, "CRAWLER_EXTRACT_PROCESSES", 1)
+    html = _load("vieon_detail_movie.html")
+    try:
+        pooled = asyncio.run(extractor.extract_movie_in_pool("u", html))
+    finally:
+        extractor.shutdown_extract_pool()
+    assert pooled == extractor.extract_movie("u", html)
+    assert pooled.title == "Cuộc Rượt Đuổi Tại Cực Địa"
@@ -0,0 +1,45 @@
+import asyncio
+
+from app.services.crawl_archive import ArchiveReader, ArchiveWriter, iter_archives
+
+def write_pages(path, pages):
+    async def run():
+        writer = ArchiveWriter(str(path))
+        for url, body, headers in pages:
+            await writer.write(url, 200, headers, body)
+        writer.close()
+    asyncio.run(run())
+
+def test_archive_round_trip_keeps_order_headers_and_body(tmp_path):
+    path = tmp_path / "job.warc.gz"
+    pages = [
+        ("https://vieon.vn/a.html", "<html>Phim A – tiếng Việt</html>".encode("utf-8"), {"etag": '"a1"', "x-ignored": "1"}),
+        ("https://vieon.vn/b.html", b"\r\n\r\nbinary\x00body", {"last-modified": "Wed, 01 Oct 2025 10:00:00 GMT"}),
+    ]
+    write_pages(path, pages)
+
+    records = list(ArchiveReader(str(path)))
+    assert [r.url for r in records] == ["https://vieon.vn/a.html", "https://vieon.vn/b.html"]
+    assert records[0].body == pages[0][1]
+    assert records[0].headers == {"etag": '"a1"'}
+    assert records[1].body == pages[1][1]
+    assert records[1].status_code == 200
+
+def test_archive_get_returns_latest_record_for_url(tmp_path):
+    path = tmp_path / "job.warc.gz"
+    write_pages(path, [("https://vieon.vn/a.html", b"v1", {})])
+    # Mở lại để append, giống worker của job sau ghi tiếp
+    write_pages(path, [("https://vieon.vn/b.html", b"other", {}), ("https://vieon.vn/a.html", b"v2", {})])
+
+    reader = ArchiveReader(str(path))
+    assert reader.get("https://vieon.vn/a.html").body == b"v2"
+    assert reader.get("https://vieon.vn/missing.html") is None
+    assert len(list(iter_archives([str(tmp_path)]))) == 3
+
+def test_archive_reader_stops_at_truncated_record(tmp_path):
+    path = tmp_path / "job.warc.gz"
+    write_pages(path, [("https://vieon.vn/a.html", b"a" * 1000, {}), ("https://vieon.vn/b.html", b"b" * 1000, {})])
+    data = path.read_bytes()
+    path.write_bytes(data[:-20])
+
+    assert [r.url for r in ArchiveReader(str(path))] == ["https://vieon.vn/a.html"]
@@ -0,0 +1,34 @@
+import pytest
+
+from app.services.crawl_metrics import LatencyHistogram, merge_histograms, summarize_latency
+
+def test_histogram_percentiles_use_bucket_upper_bounds():
+    histogram = LatencyHistogram()
+    for _ in range(90):
+        histogram.observe(0.015)
+    for _ in range(10):
+        histogram.observe(0.7)
+    assert histogram.percentile(0.5) == 0.02
+    assert histogram.percentile(0.95) == 0.7  # Không vượt quá max đã thấy
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["mean"] == pytest.approx(0.0835)
+    assert snapshot["buckets"]["0.02"] == 90
+    assert snapshot["buckets"]["1"] == 10
+
+def test_empty_histogram_has_no_percentiles():
+    snapshot = LatencyHistogram().snapshot()
+    assert snapshot["count"] == 0
+    assert snapshot["p95"] is None
+
+def test_merge_histograms_from_several_workers():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    first.observe(0.003)
+    second.observe(0.003)
+    second.observe(40.0)
+    merged = merge_histograms([first.snapshot(), second.snapshot(), None])
+    assert merged["count"] == 3
+    assert merged["max"] == 40.0
+    assert merged["buckets"]["0.005"] == 2
+    assert merged["buckets"]["+Inf"] == 1
+    assert summarize_latency(merged) == {key: merged[key] for key in ("count", "mean", "p50", "p95", "p99", "max")}
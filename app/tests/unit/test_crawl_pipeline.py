@@ -0,0 +1,56 @@
+import asyncio
+
+from app.services.crawl_pipeline import CrawlPipeline, PipelineStage
+
+def test_pipeline_runs_items_through_all_stages():
+    saved = []
+
+    async def double(x):
+        return x * 2
+
+    def drop_odd(x):
+        return x if x % 4 == 0 else None
+
+    async def persist(x):
+        saved.append(x)
+
+    pipeline = CrawlPipeline(
+        stages=[
+            PipelineStage("double", double, workers=3),
+            PipelineStage("filter", drop_odd, workers=2),
+            PipelineStage("persist", persist, workers=2),
+        ],
+        queue_size=2,
+    )
+    asyncio.run(pipeline.run(range(10)))
+
+    assert sorted(saved) == [0, 4, 8, 12, 16]
+    stats = pipeline.snapshot()
+    assert stats["double"]["processed"] == 10
+    assert stats["persist"]["processed"] == 5
+    assert stats["persist"]["queue_depth"] == 0
+
+def test_pipeline_reports_errors_and_keeps_going():
+    errors = []
+
+    def fail_on_three(x):
+        if x == 3:
+            raise ValueError("boom")
+        return x
+
+    pipeline = CrawlPipeline(
+        stages=[PipelineStage("check", fail_on_three, workers=2)],
+        on_error=lambda stage, item, exc: errors.append((stage, item)),
+    )
+    asyncio.run(pipeline.run(range(5)))
+
+    assert errors == [("check", 3)]
+    assert pipeline.snapshot()["check"]["failed"] == 1
+    assert pipeline.snapshot()["check"]["processed"] == 4
+
+def test_stage_snapshot_includes_latency_histogram():
+    stage = PipelineStage("double", lambda x: x * 2)
+    asyncio.run(CrawlPipeline([stage]).run(range(5)))
+    latency = stage.snapshot()["latency"]
+    assert latency["count"] == 5
+    assert sum(latency["buckets"].values()) == 5
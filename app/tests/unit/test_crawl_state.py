@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+from fakeredis import aioredis
+
+from app.services.crawler import CrawlerService
+from app.services.url_frontier import FRONTIER_KEY, DiscoveryFrontier
+from app.services.crawl_state import (
+    RUNNING_JOB_KEY, CrawlJobAlreadyRunning, CrawlJobNotResumable, RedisCrawlState, _job_key,
+)
+
+URLS = [f"https://vieon.vn/{i}.html" for i in range(6)]
+
+def make_state():
+    return RedisCrawlState(aioredis.FakeRedis(decode_responses=True))
+
+async def interrupted_job(state):
+    """
+    Worker lấy 4 URL, checkpoint 2 URL rồi chết: lock job vẫn còn, heartbeat đã hết hạn
+    """
+    job_id = (await state.create_job(URLS))["job_id"]
+    await state.heartbeat(job_id, "w1", {"worker_id": "w1"})
+    popped = [await state.pop_url(job_id, "w1") for _ in range(4)]
+    await state.checkpoint(job_id, "w1", {"processed": popped[:1], "failed": popped[1:2]}, ["boom"])
+    await state.redis.delete(_job_key(job_id, "worker:w1"))
+    return job_id, popped
+
+def test_interrupted_job_resumes_from_checkpoint():
+    state = make_state()
+
+    async def scenario():
+        job_id, popped = await interrupted_job(state)
+        resumed = await state.resume_job()
+        frontier = await state.redis.lrange(_job_key(job_id, "frontier"), 0, -1)
+        return job_id, popped, resumed, frontier, await state.get_job(job_id)
+
+    job_id, popped, resumed, frontier, job = asyncio.run(scenario())
+    # URL đang xử lý dở được crawl lại trước, URL đã checkpoint thì không
+    assert resumed == {"job_id": job_id, "requeued": 2, "remaining": 4}
+    assert frontier == popped[2:] + URLS[4:]
+    assert job["status"] == "running"
+    assert job["in_flight"] == 0
+    assert (job["processed"], job["failed"], job["errors"]) == (1, 1, ["boom"])
+
+def test_resumed_job_completes_and_releases_lock():
+    state = make_state()
+
+    async def scenario():
+        job_id, popped = await interrupted_job(state)
+        await state.resume_job(job_id)
+        rest = []
+        while (url := await state.pop_url(job_id, "w1")) is not None:
+            rest.append(url)
+        await state.checkpoint(job_id, "w1", {"processed": rest})
+        return job_id, rest, await state.get_job(job_id), await state.running_job()
+
+    job_id, rest, job, running = asyncio.run(scenario())
+    assert len(rest) == 4
+    assert job["status"] == "completed"
+    assert job["processed"] + job["failed"] == len(URLS)
+    assert running is None
+
+def test_resume_refuses_while_a_worker_is_alive_or_another_job_runs():
+    state = make_state()
+
+    async def scenario():
+        job_id = (await state.create_job(URLS))["job_id"]
+        await state.heartbeat(job_id, "w1", {"worker_id": "w1"})
+        with pytest.raises(CrawlJobAlreadyRunning):
+            await state.resume_job(job_id)
+
+        await state.redis.delete(_job_key(job_id, "worker:w1"))
+        await state.redis.set(RUNNING_JOB_KEY, "other-job")
+        with pytest.raises(CrawlJobAlreadyRunning):
+            await state.resume_job(job_id)
+
+        await state.redis.delete(RUNNING_JOB_KEY)
+        await state.complete_job(job_id)
+        with pytest.raises(CrawlJobNotResumable):
+            await state.resume_job(job_id)
+
+    asyncio.run(scenario())
+
+def test_concurrent_resumes_requeue_in_flight_urls_once():
+    state = make_state()
+
+    async def scenario():
+        job_id, popped = await interrupted_job(state)
+        results = await asyncio.gather(state.resume_job(job_id), state.resume_job(job_id), return_exceptions=True)
+        frontier = await state.redis.lrange(_job_key(job_id, "frontier"), 0, -1)
+        return results, frontier
+
+    results, frontier = asyncio.run(scenario())
+    assert sum(isinstance(result, dict) for result in results) == 1
+    assert sum(isinstance(result, CrawlJobAlreadyRunning) for result in results) == 1
+    assert sorted(frontier) == sorted(set(frontier))
+    assert len(frontier) == 4
+
+def test_dead_worker_urls_are_reclaimed_by_live_workers():
+    state = make_state()
+
+    async def scenario():
+        job_id = (await state.create_job(URLS))["job_id"]
+        for worker_id in ("w1", "w2"):
+            await state.heartbeat(job_id, worker_id, {"worker_id": worker_id})
+        dead = [await state.pop_url(job_id, "w1") for _ in range(3)]
+        alive = await state.pop_url(job_id, "w2")
+        await state.checkpoint(job_id, "w1", {"processed": dead[:1]})
+
+        # w1 còn heartbeat: chưa được coi là chết
+        assert await state.reclaim_orphans(job_id) == 0
+        await state.redis.delete(_job_key(job_id, "worker:w1"))
+        requeued = await state.reclaim_orphans(job_id)
+        again = await state.reclaim_orphans(job_id)
+        frontier = await state.redis.lrange(_job_key(job_id, "frontier"), 0, -1)
+        workers = await state.redis.smembers(_job_key(job_id, "workers"))
+        return dead, alive, requeued, again, frontier, workers, await state.get_job(job_id)
+
+    dead, alive, requeued, again, frontier, workers, job = asyncio.run(scenario())
+    assert (requeued, again) == (2, 0)
+    assert frontier[:2] == dead[1:]
+    assert alive not in frontier
+    assert workers == {"w2"}
+    assert job["in_flight"] == 1
+
+def test_worker_leaving_with_unflushed_urls_stays_reclaimable():
+    state = make_state()
+
+    async def scenario():
+        job_id = (await state.create_job(URLS))["job_id"]
+        await state.heartbeat(job_id, "w1", {"worker_id": "w1"})
+        url = await state.pop_url(job_id, "w1")
+        await state.leave(job_id, "w1")
+        requeued = await state.reclaim_orphans(job_id)
+        return url, requeued, await state.redis.lindex(_job_key(job_id, "frontier"), 0)
+
+    url, requeued, head = asyncio.run(scenario())
+    assert requeued == 1
+    assert head == url
+
+def make_crawler():
+    redis = aioredis.FakeRedis(decode_responses=True)
+    state = RedisCrawlState(redis)
+    return CrawlerService(state=state, frontier=DiscoveryFrontier(1000, 0.01, client=redis))
+
+def test_start_job_reports_deduplicated_url_count():
+    crawler = make_crawler()
+
+    async def scenario():
+        await crawler.frontier.push([URLS[0], "https://vieon.vn/moi.html"])
+        job = await crawler.start_job(URLS, discovered_limit=10)
+        return job, await crawler.state.get_job(job["job_id"])
+
+    job, status = asyncio.run(scenario())
+    assert job["total_urls"] == len(URLS) + 1
+    assert status["total_urls"] == len(URLS) + 1
+
+def test_failed_start_job_requeues_discovered_urls_with_their_priority(monkeypatch):
+    crawler = make_crawler()
+
+    async def broken_create_job(urls):
+        raise RuntimeError("redis down")
+
+    async def scenario():
+        await crawler.frontier.push(["https://vieon.vn/a.html"], priority=-5)
+        await crawler.frontier.push(["https://vieon.vn/b.html"], priority=3)
+        monkeypatch.setattr(crawler.state, "create_job", broken_create_job)
+        with pytest.raises(RuntimeError):
+            await crawler.start_job(URLS, discovered_limit=10)
+        return await crawler.frontier.redis.zrange(FRONTIER_KEY, 0, -1, withscores=True)
+
+    assert asyncio.run(scenario()) == [("https://vieon.vn/a.html", -5.0), ("https://vieon.vn/b.html", 3.0)]
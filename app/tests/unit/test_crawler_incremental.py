@@ -0,0 +1,148 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import app.crud.crawl_page as crud_crawl_page
+import app.crud.vod as crud_vod
+import app.services.crawler as crawler_module
+from app.schemas.crawler import ProcessedMovieData
+from app.services.crawl_archive import ArchiveWriter
+from app.services.crawler import CrawlerService, CrawlItem
+
+URL = "https://vieon.vn/cuoc-ruot-duoi-tai-cuc-dia.html"
+
+class FakeWriter:
+    def __init__(self):
+        self.items = []
+
+    async def add(self, item):
+        self.items.append(item)
+
+def make_crawler():
+    crawler = CrawlerService(state=SimpleNamespace(redis=None), frontier=SimpleNamespace())
+    crawler._writer = FakeWriter()
+    return crawler
+
+def processed(view_count=10):
+    return ProcessedMovieData(url=URL, title="Cuộc Rượt Đuổi Tại Cực Địa", view_count=view_count, rating=4.5)
+
+def test_not_modified_page_skips_extract_and_only_records_a_check(monkeypatch):
+    crawler = make_crawler()
+    sent = []
+
+    async def get_page(url):
+        return {"url": url, "etag": '"v1"', "last_modified": "Wed, 01 Oct 2025 10:00:00 GMT", "content_hash": "h"}
+
+    async def fetch(url, headers=None):
+        sent.append(headers)
+        return SimpleNamespace(status_code=304, headers={}, content=b"")
+
+    monkeypatch.setattr(crud_crawl_page, "get_page", get_page)
+    crawler.fetcher = SimpleNamespace(fetch=fetch)
+
+    assert asyncio.run(crawler._stage_fetch(URL)) is None
+    assert sent == [{"If-None-Match": '"v1"', "If-Modified-Since": "Wed, 01 Oct 2025 10:00:00 GMT"}]
+    assert crawler._outcomes == {"unchanged": [URL]}
+    # Chỉ cập nhật last_crawled_at/checks, giữ ETag và hash cũ
+    assert [item.page_meta() for item in crawler._writer.items] == [{"url": URL, "changed": False}]
+
+def test_first_crawl_sends_no_conditional_headers():
+    assert CrawlerService._conditional_headers({}) == {}
+
+def test_unchanged_content_hash_skips_vod_write(monkeypatch):
+    crawler = make_crawler()
+    data = processed()
+    monkeypatch.setattr(crawler, "normalize_data", lambda raw: data)
+
+    async def convert(processed_data):
+        raise AssertionError("VOD không được ghi lại khi nội dung không đổi")
+
+    monkeypatch.setattr(crawler, "convert_to_vod_create", convert)
+    item = CrawlItem(URL, previous={"content_hash": CrawlerService._content_hash(data), "signals": {"view_count": 10, "rating": 4.5}})
+    item.raw_data = object()
+    item.etag = '"v2"'
+
+    result = asyncio.run(crawler._stage_normalize(item))
+    assert result is item and item.vod_create is None
+    assert crawler._outcomes == {"skipped": [URL]}
+    meta = item.page_meta()
+    assert (meta["etag"], meta["content_hash"], meta["changed"]) == ('"v2"', item.previous["content_hash"], False)
+
+def test_changed_content_hash_writes_vod(monkeypatch):
+    crawler = make_crawler()
+    monkeypatch.setattr(crawler, "normalize_data", lambda raw: processed(view_count=11))
+
+    async def convert(processed_data):
+        return "vod"
+
+    monkeypatch.setattr(crawler, "convert_to_vod_create", convert)
+    item = CrawlItem(URL, previous={"content_hash": CrawlerService._content_hash(processed()), "signals": {"view_count": 10, "rating": 4.5}})
+    item.raw_data = object()
+
+    asyncio.run(crawler._stage_normalize(item))
+    assert item.vod_create == "vod"
+    assert item.changed
+    assert crawler._outcomes == {}
+
+def test_page_metadata_failure_keeps_saved_vods(monkeypatch):
+    crawler = make_crawler()
+
+    async def upsert_vods(vods):
+        return {"upserted": len(vods), "modified": 0, "failed": []}
+
+    async def upsert_pages(pages):
+        raise RuntimeError("crawl_pages unavailable")
+
+    async def invalidate():
+        return None
+
+    monkeypatch.setattr(crud_vod, "bulk_upsert_vods", upsert_vods)
+    monkeypatch.setattr(crud_crawl_page, "bulk_upsert_pages", upsert_pages)
+    monkeypatch.setattr(crawler_module, "invalidate_all_vods", invalidate)
+    monkeypatch.setattr(crawler_module.settings, "CRAWLER_DEDUPE_ENABLED", False)
+    items = [CrawlItem(URL), CrawlItem(URL.replace("cuc-dia", "bac-cuc"))]
+    for item in items:
+        item.vod_create = SimpleNamespace(url=item.url)
+
+    result = asyncio.run(crawler._flush_items(items))
+    assert result == {"upserted": 2, "modified": 0, "failed": []}
+
+def test_replay_persists_vods_without_touching_crawl_pages_or_signatures(monkeypatch, tmp_path):
+    crawler = make_crawler()
+    html = (Path(__file__).resolve().parent.parent / "fixtures" / "vieon_detail_movie.html").read_bytes()
+    path = tmp_path / "job.warc.gz"
+
+    async def archive():
+        writer = ArchiveWriter(str(path))
+        await writer.write(URL, 200, {"etag": '"old"'}, html)
+        writer.close()
+
+    asyncio.run(archive())
+    saved, pages, signatures = [], [], []
+
+    async def upsert_vods(vods):
+        saved.extend(vods)
+        return {"upserted": 0, "modified": len(vods), "failed": []}
+
+    async def upsert_pages(batch):
+        pages.extend(batch)
+        return len(batch)
+
+    async def add_many(vods):
+        signatures.extend(vods)
+        return 0
+
+    async def invalidate():
+        return None
+
+    monkeypatch.setattr(crud_vod, "bulk_upsert_vods", upsert_vods)
+    monkeypatch.setattr(crud_crawl_page, "bulk_upsert_pages", upsert_pages)
+    monkeypatch.setattr(crawler.dedupe, "add_many", add_many)
+    monkeypatch.setattr(crawler_module, "invalidate_all_vods", invalidate)
+    monkeypatch.setattr(crawler_module.settings, "CRAWLER_DEDUPE_ENABLED", True)
+    monkeypatch.setattr(crawler_module.settings, "CRAWLER_EXTRACT_MODE", "inline")
+
+    result = asyncio.run(crawler.replay([str(path)], persist=True))
+    assert (result["records"], result["processed"], result["failed"]) == (1, 1, 0)
+    assert [vod.title for vod in saved] == ["Cuộc Rượt Đuổi Tại Cực Địa"]
+    assert pages == [] and signatures == []
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import app.crud.vod_signature as crud_signature
+import app.services.dedupe as dedupe
+from app.services.dedupe import (
+    NUM_PERM, NearDuplicateIndex, band_keys, dedupe_text, minhash, shingles, similarity,
+)
+
+DESCRIPTION = (
+    "Một nhóm thám hiểm mắc kẹt tại vùng cực địa và phải chạy trốn khỏi những kẻ truy đuổi "
+    "trong điều kiện thời tiết khắc nghiệt nhất hành tinh"
+)
+
+def signature(title, description, director=None):
+    return minhash(shingles(dedupe_text(title, description, director)))
+
+def test_dedupe_text_folds_diacritics_and_punctuation():
+    assert dedupe_text("Cuộc Rượt Đuổi!", None, "Trấn Thành") == "cuoc ruot duoi tran thanh"
+
+def test_minhash_similarity_separates_near_duplicates_from_different_titles():
+    original = signature("Cuộc Rượt Đuổi Tại Cực Địa", DESCRIPTION, "John Doe")
+    reupload = signature("Cuộc rượt đuổi tại cực địa", DESCRIPTION + ".", "John Doe")
+    other = signature("Gia Đình Là Số 1", "Bộ phim hài về cuộc sống thường ngày của một gia đình đông con", "Jane Roe")
+    assert len(original) == NUM_PERM
+    assert similarity(original, reupload) >= 0.9
+    assert similarity(original, other) < 0.2
+    assert set(band_keys(original)) & set(band_keys(reupload))
+
+def test_index_reports_duplicates_within_batch_and_clusters_them(monkeypatch):
+    signatures, duplicates = {}, []
+
+    async def upsert(docs):
+        for doc in docs:
+            signatures[doc["url"]] = doc
+        return len(docs)
+
+    async def find_by_bands(keys):
+        return [doc for doc in signatures.values() if set(doc["bands"]) & set(keys)]
+
+    async def replace(urls, pairs):
+        duplicates[:] = [d for d in duplicates if not set(d["urls"]) & set(urls)]
+        duplicates.extend({"urls": list(pair), "similarity": score} for pair, score in pairs.items())
+
+    async def list_duplicates(min_similarity):
+        return [d for d in duplicates if d["similarity"] >= min_similarity]
+
+    async def titles(urls):
+        return {url: signatures[url]["title"] for url in urls}
+
+    monkeypatch.setattr(crud_signature, "bulk_upsert_signatures", upsert)
+    monkeypatch.setattr(crud_signature, "find_by_bands", find_by_bands)
+    monkeypatch.setattr(crud_signature, "replace_duplicates", replace)
+    monkeypatch.setattr(crud_signature, "list_duplicates", list_duplicates)
+    monkeypatch.setattr(crud_signature, "get_titles", titles)
+
+    def vod(url, title, description=DESCRIPTION):
+        return SimpleNamespace(url=url, title=title, description=description, director="John Doe")
+
+    index = NearDuplicateIndex(threshold=0.8)
+    found = asyncio.run(index.add_many([
+        vod("https://vieon.vn/a.html", "Cuộc Rượt Đuổi Tại Cực Địa"),
+        vod("https://vieon.vn/b.html", "Cuộc rượt đuổi tại cực địa"),
+        vod("https://vieon.vn/c.html", "Gia Đình Là Số 1", "Phim hài gia đình"),
+    ]))
+    assert found == 1
+
+    clusters = asyncio.run(index.clusters())
+    assert len(clusters) == 1
+    assert [v["url"] for v in clusters[0]["vods"]] == ["https://vieon.vn/a.html", "https://vieon.vn/b.html"]
+
+def test_signatures_are_computed_off_the_event_loop(monkeypatch):
+    threads = []
+    compute = dedupe.signature_docs
+
+    def recording(rows):
+        threads.append(threading.current_thread())
+        return compute(rows)
+
+    async def upsert(docs):
+        return len(docs)
+
+    async def find_by_bands(keys):
+        return []
+
+    async def replace(urls, pairs):
+        return None
+
+    monkeypatch.setattr(dedupe.settings, "CRAWLER_EXTRACT_MODE", "inline")
+    monkeypatch.setattr(dedupe, "signature_docs", recording)
+    monkeypatch.setattr(crud_signature, "bulk_upsert_signatures", upsert)
+    monkeypatch.setattr(crud_signature, "find_by_bands", find_by_bands)
+    monkeypatch.setattr(crud_signature, "replace_duplicates", replace)
+
+    vod = SimpleNamespace(url="https://vieon.vn/a.html", title="Cuộc Rượt Đuổi", description=DESCRIPTION, director=None)
+    asyncio.run(NearDuplicateIndex().add_many([vod]))
+    assert threads and threads[0] is not threading.main_thread()
+
+def test_clusters_accepts_zero_min_similarity(monkeypatch):
+    thresholds = []
+
+    async def list_duplicates(min_similarity):
+        thresholds.append(min_similarity)
+        return []
+
+    monkeypatch.setattr(crud_signature, "list_duplicates", list_duplicates)
+    index = NearDuplicateIndex(threshold=0.8)
+    asyncio.run(index.clusters(0.0))
+    asyncio.run(index.clusters())
+    assert thresholds == [0.0, 0.8]
+
+def test_each_vod_gets_its_own_candidate_lookup(monkeypatch):
+    lookups = []
+
+    async def upsert(docs):
+        return len(docs)
+
+    async def find_by_bands(keys):
+        lookups.append(list(keys))
+        return []
+
+    async def replace(urls, pairs):
+        return None
+
+    monkeypatch.setattr(crud_signature, "bulk_upsert_signatures", upsert)
+    monkeypatch.setattr(crud_signature, "find_by_bands", find_by_bands)
+    monkeypatch.setattr(crud_signature, "replace_duplicates", replace)
+
+    vods = [
+        SimpleNamespace(url=f"https://vieon.vn/{i}.html", title=f"Phim {i}", description=DESCRIPTION, director=None)
+        for i in range(3)
+    ]
+    asyncio.run(NearDuplicateIndex().add_many(vods))
+    # MAX_CANDIDATES áp dụng cho từng VOD chứ không cho cả batch
+    assert len(lookups) == 3
+    assert all(len(keys) == dedupe.BANDS for keys in lookups)
+
+def test_find_by_bands_warns_when_candidates_are_truncated(monkeypatch, async_collection):
+    warnings = []
+    async_collection.collection.insert_many([
+        {"url": f"https://vieon.vn/{i}.html", "signature": b"", "bands": [i % 2 + 1]} for i in range(5)
+    ])
+    monkeypatch.setattr(crud_signature.db, "vod_signature_collection", async_collection, raising=False)
+    monkeypatch.setattr(crud_signature.logger, "warning", warnings.append)
+
+    assert len(asyncio.run(crud_signature.find_by_bands([1, 2], limit=3))) == 3
+    assert len(warnings) == 1
+
+    warnings.clear()
+    assert len(asyncio.run(crud_signature.find_by_bands([1, 2], limit=5))) == 5
+    assert asyncio.run(crud_signature.find_by_bands([3])) == []
+    assert warnings == []
@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.v1.endpoints.crawler import run_discovery
+from app.services.discovery import extract_links, is_detail_url, normalize_url
+from app.services.url_frontier import DiscoveryAlreadyRunning, RedisBloomFilter, bloom_parameters
+
+BASE = "https://vieon.vn/phim-le"
+
+def test_normalize_url_keeps_only_vieon_and_strips_query():
+    assert normalize_url(BASE, "/phim-a.html?utm=1#top") == "https://vieon.vn/phim-a.html"
+    assert normalize_url(BASE, "https://www.vieon.vn/phim-bo/") == "https://vieon.vn/phim-bo"
+    assert normalize_url(BASE, "https://example.com/phim-a.html") is None
+    assert normalize_url(BASE, "javascript:void(0)") is None
+
+def test_extract_links_splits_detail_and_listing_pages():
+    html = """
+    <a href="/phim-a.html">A</a>
+    <a href="/phim-a.html?ref=home">A again</a>
+    <a href="https://vieon.vn/phim-b.html">B</a>
+    <a href="/phim-bo">Listing</a>
+    <a href="/tai-khoan">Account</a>
+    <a href="https://facebook.com/vieon">External</a>
+    """
+    details, listings = extract_links(BASE, html)
+    assert details == ["https://vieon.vn/phim-a.html", "https://vieon.vn/phim-b.html"]
+    assert listings == ["https://vieon.vn/phim-bo"]
+
+def test_extract_links_reads_sitemap_locations():
+    xml = """<?xml version="1.0" encoding="UTF-8"?>
+    <urlset><url><loc>https://vieon.vn/phim-a.html</loc></url>
+    <url><loc> https://vieon.vn/sitemap-2.xml </loc></url></urlset>"""
+    details, listings = extract_links("https://vieon.vn/sitemap.xml", xml)
+    assert details == ["https://vieon.vn/phim-a.html"]
+    assert listings == ["https://vieon.vn/sitemap-2.xml"]
+
+def test_is_detail_url():
+    assert is_detail_url("https://vieon.vn/cuoc-ruot-duoi-tai-cuc-dia.html")
+    assert not is_detail_url("https://vieon.vn/phim-le")
+    assert not is_detail_url("https://vieon.vn/phim-le/phim-a.html")
+
+def test_bloom_parameters_match_standard_formula():
+    bits, hashes = bloom_parameters(1_000_000, 0.001)
+    assert 14_000_000 < bits < 14_500_000
+    assert hashes == 10
+    with pytest.raises(ValueError):
+        bloom_parameters(0, 0.01)
+
+def test_bloom_positions_are_stable_and_in_range():
+    bloom = RedisBloomFilter("test", 1000, 0.01, client=object())
+    positions = bloom.positions("https://vieon.vn/phim-a.html")
+    assert positions == bloom.positions("https://vieon.vn/phim-a.html")
+    assert len(positions) == bloom.hashes
+    assert all(0 <= p < bloom.bits for p in positions)
+    assert positions != bloom.positions("https://vieon.vn/phim-b.html")
+
+@pytest.mark.parametrize("error", [DiscoveryAlreadyRunning("other"), RuntimeError("listing page down")])
+def test_background_discovery_logs_instead_of_raising(error):
+    calls = []
+
+    async def discover(seeds, max_pages):
+        calls.append(max_pages)
+        raise error
+
+    asyncio.run(run_discovery(SimpleNamespace(discover=discover), 5))
+    assert calls == [5]
@@ -0,0 +1,67 @@
+import asyncio
+import random
+
+import httpx
+import pytest
+
+from app.services.fetcher import FetchError, RetryingFetcher, RetryPolicy
+from app.services.rate_limiter import AdaptiveRateLimiter
+
+URL = "https://vieon.vn/phim.html"
+
+def make_fetcher(handler, **kwargs):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    limiter = AdaptiveRateLimiter(initial_rate=1000, max_rate=1000)
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.01)
+    return RetryingFetcher(lambda: client, limiter, policy=policy, **kwargs)
+
+def test_backoff_is_bounded_by_exponential_cap():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, rng=random.Random(1))
+    for attempt in range(1, 8):
+        assert 0 <= policy.backoff(attempt) <= min(5.0, 2 ** (attempt - 1))
+    assert policy.backoff(1, retry_after=3) >= 3
+
+def test_retries_transient_errors_then_succeeds():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, text="ok")
+
+    fetcher = make_fetcher(handler)
+    response = asyncio.run(fetcher.fetch(URL))
+    assert response.text == "ok"
+    assert fetcher.stats["retries"] == 2
+
+def test_gives_up_with_attempt_count():
+    fetcher = make_fetcher(lambda request: httpx.Response(502))
+    with pytest.raises(FetchError) as exc:
+        asyncio.run(fetcher.fetch(URL))
+    assert exc.value.attempts == 3
+    assert "attempts=3" in str(exc.value)
+
+def test_does_not_retry_client_errors():
+    fetcher = make_fetcher(lambda request: httpx.Response(404))
+    with pytest.raises(FetchError) as exc:
+        asyncio.run(fetcher.fetch(URL))
+    assert exc.value.attempts == 1
+
+def test_hedged_request_wins_when_primary_is_slow():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return httpx.Response(200, text=str(len(calls)))
+
+    fetcher = make_fetcher(handler, hedge=True, hedge_min_delay=0.01)
+    for _ in range(fetcher.latency.min_samples):
+        fetcher.latency.add(0.01)
+
+    response = asyncio.run(asyncio.wait_for(fetcher.fetch(URL), timeout=0.5))
+    assert response.text == "2"
+    assert fetcher.stats["hedged"] == 1
+    assert fetcher.stats["hedge_wins"] == 1
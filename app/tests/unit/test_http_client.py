@@ -0,0 +1,40 @@
+import asyncio
+import sys
+
+import app.services.http_client as http_client
+
+def test_init_reuses_one_client_until_closed(monkeypatch):
+    monkeypatch.setattr(http_client, "http_client", None)
+
+    async def scenario():
+        client = await http_client.init_http_client()
+        same = http_client.get_http_client()
+        await http_client.close_http_client()
+        # Gọi close lần nữa (shutdown hai lần) không lỗi
+        await http_client.close_http_client()
+        return client, same
+
+    client, same = asyncio.run(scenario())
+    assert client is same
+    assert client.is_closed
+    assert http_client.http_client is None
+
+    reopened = http_client.get_http_client()
+    assert reopened is not client and not reopened.is_closed
+    asyncio.run(http_client.close_http_client())
+
+def test_client_uses_pool_limits_from_settings(monkeypatch):
+    monkeypatch.setattr(http_client.settings, "CRAWLER_MAX_CONNECTIONS", 7)
+    client = http_client.create_http_client()
+    assert client._transport._pool._max_connections == 7
+    asyncio.run(client.aclose())
+
+def test_http2_falls_back_to_http11_without_h2(monkeypatch):
+    # None trong sys.modules: import h2 luôn ImportError, dù môi trường có cài h2
+    monkeypatch.setitem(sys.modules, "h2", None)
+    monkeypatch.setattr(http_client.settings, "CRAWLER_HTTP2", True)
+    assert not http_client._http2_available()
+
+    client = http_client.create_http_client()
+    assert client._transport._pool._http2 is False
+    asyncio.run(client.aclose())
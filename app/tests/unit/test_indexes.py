@@ -0,0 +1,64 @@
+import asyncio
+
+from bson import ObjectId
+
+import app.db.indexes as indexes
+import app.db.migrations.dedupe_vod_urls as migration
+import app.db.mongodb as db
+
+def insert_duplicates(collection):
+    old, new, other = ObjectId(), ObjectId(), ObjectId()
+    collection.insert_many([
+        {"_id": old, "url": "https://vieon.vn/a.html"},
+        {"_id": new, "url": "https://vieon.vn/a.html"},
+        {"_id": other, "url": "https://vieon.vn/b.html"},
+        {"_id": ObjectId(), "url": None},
+        {"_id": ObjectId(), "url": None},
+    ])
+    return old, new, other
+
+def test_find_duplicate_urls_reports_without_deleting(monkeypatch, async_collection):
+    collection = async_collection.collection
+    insert_duplicates(collection)
+    monkeypatch.setattr(indexes, "vod_collection", async_collection)
+
+    assert asyncio.run(indexes.find_duplicate_urls()) == [{"url": "https://vieon.vn/a.html", "count": 2}]
+    assert collection.count_documents({}) == 5
+
+def test_migration_keeps_newest_document_per_url_only_when_applied(monkeypatch, async_collection):
+    collection = async_collection.collection
+    old, new, other = insert_duplicates(collection)
+    invalidated = []
+
+    async def invalidate(*ids):
+        invalidated.extend(ids)
+
+    monkeypatch.setattr(db, "vod_collection", async_collection, raising=False)
+    monkeypatch.setattr(migration, "invalidate_vods", invalidate)
+
+    assert asyncio.run(migration.dedupe_vod_urls()) == 1
+    assert collection.count_documents({}) == 5
+    assert asyncio.run(migration.dedupe_vod_urls(apply=True, batch_size=1)) == 1
+    assert {doc["_id"] for doc in collection.find({"url": {"$type": "string"}})} == {new, other}
+    assert collection.count_documents({"url": None}) == 2
+    assert invalidated == [str(old)]
+
+def test_drop_text_indexes_only_drops_text_index(monkeypatch, async_collection):
+    collection = async_collection.collection
+    collection.create_index([("title", "text")])
+    collection.create_index([("release_year", -1)])
+    monkeypatch.setattr(indexes, "vod_collection", async_collection)
+
+    assert asyncio.run(indexes.drop_text_indexes()) == ["title_text"]
+    assert async_collection.dropped == ["title_text"]
+
+def test_drop_redundant_indexes_keeps_compound_indexes(monkeypatch, async_collection):
+    collection = async_collection.collection
+    collection.create_index([("search_tokens", 1)], name="search_tokens")
+    collection.create_index([("search_tokens", 1), ("release_year", -1), ("_id", -1)], name="search_tokens_release_year_id")
+    collection.create_index([("release_year", -1)])
+    collection.create_index([("release_year", -1), ("_id", -1)], name="release_year_id")
+    monkeypatch.setattr(indexes, "vod_collection", async_collection)
+
+    assert asyncio.run(indexes.drop_redundant_indexes()) == ["search_tokens", "release_year_-1"]
+    assert async_collection.dropped == ["search_tokens", "release_year_-1"]
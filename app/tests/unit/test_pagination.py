@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from app.utils.pagination import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    next_cursor,
+    sort_spec,
+)
+
+def test_cursor_round_trip():
+    doc_id = ObjectId()
+    token = encode_cursor("title", "Nhà Bà Nữ", doc_id)
+
+    assert "=" not in token
+    assert decode_cursor(token, "title") == ("Nhà Bà Nữ", doc_id)
+
+def test_cursor_rejects_garbage_and_other_sort():
+    token = encode_cursor("release_year", 2020, ObjectId())
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, "title")
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", "title")
+
+def test_sort_spec_always_has_id_tie_breaker():
+    assert sort_spec("release_year") == [("release_year", -1), ("_id", -1)]
+    assert sort_spec("title") == [("title", 1), ("_id", 1)]
+    assert sort_spec("unknown") == [("_id", 1)]
+
+def test_keyset_filter_descending_includes_null_tail():
+    doc_id = ObjectId()
+    assert keyset_filter("release_year", 2020, doc_id) == {"$or": [
+        {"release_year": {"$lt": 2020}},
+        {"release_year": 2020, "_id": {"$lt": doc_id}},
+        {"release_year": None},
+    ]}
+    # Đang ở nhóm null (cuối thứ tự giảm) thì chỉ còn _id
+    assert keyset_filter("release_year", None, doc_id) == {"release_year": None, "_id": {"$lt": doc_id}}
+
+def test_keyset_filter_ascending_null_group_first():
+    doc_id = ObjectId()
+    assert keyset_filter("title", "b", doc_id) == {"$or": [
+        {"title": {"$gt": "b"}},
+        {"title": "b", "_id": {"$gt": doc_id}},
+    ]}
+    assert keyset_filter("title", None, doc_id) == {"$or": [
+        {"title": None, "_id": {"$gt": doc_id}},
+        {"title": {"$ne": None}},
+    ]}
+
+def test_next_cursor_points_at_last_item_of_page():
+    items = [SimpleNamespace(id=str(ObjectId()), release_year=2024 - i) for i in range(4)]
+
+    assert next_cursor("release_year", items[:3], 3) is None
+    token = next_cursor("release_year", items, 3)
+    assert decode_cursor(token, "release_year") == (2022, ObjectId(items[2].id))
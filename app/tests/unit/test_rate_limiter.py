@@ -0,0 +1,66 @@
+import pytest
+
+from app.services.rate_limiter import AdaptiveRateLimiter, TokenBucket, parse_retry_after
+
+URL = "https://vieon.vn/phim.html"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_limiter(**kwargs):
+    clock = FakeClock()
+    params = dict(initial_rate=1.0, min_rate=0.5, max_rate=2.0, increase_step=0.5,
+                  decrease_factor=0.5, latency_target=1.0, clock=clock)
+    params.update(kwargs)
+    return AdaptiveRateLimiter(**params), clock
+
+def test_rate_increases_additively_up_to_ceiling():
+    limiter, _ = make_limiter()
+    limiter.record(URL, 0.1, 200)
+    assert limiter.host(URL).rate == pytest.approx(1.5)
+    for _ in range(5):
+        limiter.record(URL, 0.1, 200)
+    assert limiter.host(URL).rate == pytest.approx(2.0)
+
+def test_rate_decreases_multiplicatively_down_to_floor():
+    limiter, _ = make_limiter()
+    limiter.record(URL, 0.1, 503)
+    assert limiter.host(URL).rate == pytest.approx(0.5)
+    limiter.record(URL, None, None)
+    assert limiter.host(URL).rate == pytest.approx(0.5)
+    assert limiter.snapshot()["vieon.vn"]["errors"] == 2
+
+def test_slow_responses_back_off_gently():
+    limiter, _ = make_limiter()
+    limiter.record(URL, 3.0, 200)
+    assert limiter.host(URL).rate == pytest.approx(0.9)
+
+def test_429_pauses_bucket_for_retry_after():
+    limiter, _ = make_limiter()
+    limiter.record(URL, 0.1, 429, retry_after=10)
+    assert limiter.snapshot()["vieon.vn"]["throttled"] == 1
+    assert limiter.host(URL).bucket.reserve() == pytest.approx(10.0)
+
+def test_limits_are_tracked_per_host():
+    limiter, _ = make_limiter()
+    limiter.record(URL, 0.1, 500)
+    limiter.record("https://static.vieon.vn/a.jpg", 0.1, 200)
+    assert limiter.host(URL).rate == pytest.approx(0.5)
+    assert limiter.host("https://static.vieon.vn/b.jpg").rate == pytest.approx(1.5)
+
+def test_token_bucket_spaces_requests_by_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=1, clock=clock)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5)
+    clock.now = 1.0
+    assert bucket.reserve() == pytest.approx(0.0)
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import app.crud.crawl_page as crud_crawl_page
+import app.db.mongodb as db
+from app.services.recrawl_scheduler import (
+    RecrawlScheduler, change_probability, priority_expression, select_recrawl,
+)
+
+NOW = datetime(2025, 10, 1, 12, 0, 0)
+
+def page(url, changes, checks, observed_hours, age_hours):
+    last = NOW - timedelta(hours=age_hours)
+    return {
+        "url": url,
+        "changes": changes,
+        "checks": checks,
+        "first_crawled_at": last - timedelta(hours=observed_hours),
+        "last_crawled_at": last,
+    }
+
+def test_change_probability_grows_with_age_and_change_rate():
+    assert change_probability(0, 0, 0) == 0
+    assert change_probability(0, 100, 48) < change_probability(0, 100, 96)
+    assert change_probability(10, 100, 24) > change_probability(1, 100, 24)
+    assert change_probability(1000, 10, 24) == pytest.approx(1.0)
+
+def test_select_recrawl_prefers_changing_and_stale_pages_within_budget():
+    pages = [
+        page("https://vieon.vn/long-tail.html", changes=0, checks=10, observed_hours=500, age_hours=24),
+        page("https://vieon.vn/popular.html", changes=20, checks=20, observed_hours=500, age_hours=24),
+        page("https://vieon.vn/stale.html", changes=1, checks=5, observed_hours=500, age_hours=24 * 30),
+    ]
+    selected = select_recrawl(pages, 2, NOW)
+    # Trang 30 ngày chưa crawl vẫn được ưu tiên, long tail cùng tuổi với trang popular thì bị bỏ
+    assert [p["url"] for p in selected] == ["https://vieon.vn/stale.html", "https://vieon.vn/popular.html"]
+    assert selected[0]["priority"] >= selected[1]["priority"]
+    assert select_recrawl(pages, 0, NOW) == []
+
+def test_budget_follows_pages_per_hour_and_caps_at_one_interval():
+    crawler = SimpleNamespace(state=SimpleNamespace(redis=None), worker_id="w")
+    scheduler = RecrawlScheduler(crawler, pages_per_hour=3600, interval=60, min_age=0)
+    assert scheduler.budget(1000.0) == 60
+    scheduler._last_tick = 1000.0
+    assert scheduler.budget(1030.0) == 30
+    assert scheduler.budget(5000.0) == 60
+
+def test_candidates_are_ranked_and_limited_by_mongo(monkeypatch, async_collection):
+    pages = [
+        page(f"https://vieon.vn/{i}.html", changes=i % 7, checks=10, observed_hours=100 + i, age_hours=2 + i % 11)
+        for i in range(40)
+    ]
+    pages.append(page("https://vieon.vn/fresh.html", changes=50, checks=50, observed_hours=500, age_hours=0.5))
+    async_collection.collection.insert_many([dict(p) for p in pages])
+    monkeypatch.setattr(db, "crawl_page_collection", async_collection, raising=False)
+
+    selected = asyncio.run(
+        crud_crawl_page.list_recrawl_candidates(NOW - timedelta(hours=1), priority_expression(NOW), 5)
+    )
+    expected = select_recrawl([p for p in pages if p["url"] != "https://vieon.vn/fresh.html"], 5, NOW)
+    assert [p["url"] for p in selected] == [p["url"] for p in expected]
+    assert [p["priority"] for p in selected] == pytest.approx([p["priority"] for p in expected], abs=1e-4)
+    assert async_collection.returned == 5
@@ -0,0 +1,383 @@
+import asyncio
+import json
+from typing import List
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+import app.utils.cache as cache
+from app.schemas.vod import VodResponse
+from app.utils.local_cache import LocalTTLCache
+
+ADAPTER = TypeAdapter(List[VodResponse])
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def eval(self, script, numkeys, *args):
+        keys, argv = args[:numkeys], args[numkeys:]
+        if script == cache._RELEASE_LOCK_SCRIPT:
+            if self.data.get(keys[0]) == argv[0]:
+                del self.data[keys[0]]
+                return 1
+            return 0
+        # _GUARDED_SET_SCRIPT
+        if self.data.get(keys[1], b"") != argv[2]:
+            return 0
+        self.data[keys[0]] = argv[0]
+        return 1
+
+    async def mget(self, keys):
+        self.mget_calls = getattr(self, "mget_calls", 0) + 1
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.ops = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.ops.append((name, args, kwargs))
+
+            async def execute(self):
+                return [await getattr(redis, name)(*args, **kwargs) for name, args, kwargs in self.ops]
+
+        return Pipeline()
+
+    async def incr(self, key):
+        value = int(self.data.get(key, b"0")) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    async def expire(self, key, seconds):
+        return True
+
+    async def publish(self, channel, message):
+        self.published = getattr(self, "published", []) + [json.loads(message)]
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def fresh_cache(monkeypatch, redis, local=None):
+    monkeypatch.setattr(cache, "redis_raw_client", redis)
+    monkeypatch.setattr(cache, "redis_client", redis)
+    monkeypatch.setattr(cache, "local_cache", LocalTTLCache(max_entries=0) if local is None else local)
+    monkeypatch.setattr(cache, "_stats", dict.fromkeys(cache._stats, 0))
+    monkeypatch.setattr(cache, "_generations", {})
+
+def make_vods(n):
+    return [VodResponse(_id=ObjectId(), title=f"Phim số {i}\nmới", release_year=2020 + i) for i in range(n)]
+
+def test_hit_returns_stored_bytes_without_rebuilding(monkeypatch):
+    fresh_cache(monkeypatch, FakeRedis())
+    vods = make_vods(3)
+    calls = []
+
+    async def build():
+        calls.append(1)
+        return vods, {"X-Next-Cursor": "abc"}
+
+    async def scenario():
+        first = await cache.get_or_set_response("k", build, ttl=60, adapter=ADAPTER)
+        second = await cache.get_or_set_response("k", build, ttl=60, adapter=ADAPTER)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert calls == [1]
+    assert second == first
+    assert second.headers == {"X-Next-Cursor": "abc"}
+    # Cùng định dạng response_model của FastAPI: alias "_id"
+    body = json.loads(second.body)
+    assert body[0]["_id"] == vods[0].id and body[0]["title"] == "Phim số 0\nmới"
+
+def test_redis_failure_falls_back_to_build(monkeypatch):
+    class BrokenRedis:
+        def __getattr__(self, name):
+            async def fail(*args, **kwargs):
+                raise ConnectionError("redis down")
+            return fail
+
+    fresh_cache(monkeypatch, BrokenRedis())
+
+    async def build():
+        return [], {}
+
+    result = asyncio.run(cache.get_or_set_response("k", build, ttl=60, adapter=ADAPTER))
+    assert result.body == b"[]" and result.headers == {}
+
+def test_failing_build_runs_once_and_propagates(monkeypatch):
+    redis = FakeRedis()
+    fresh_cache(monkeypatch, redis)
+    calls = []
+
+    async def build():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("mongo down")
+
+    async def scenario():
+        return await asyncio.gather(*(
+            cache.get_or_set_response("vods:hot", build, ttl=60, adapter=ADAPTER) for _ in range(5)
+        ), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert calls == [1]
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert "lock:vods:hot" not in redis.data
+
+def test_lock_release_keeps_lock_taken_over_by_other_worker(monkeypatch):
+    redis = FakeRedis()
+    fresh_cache(monkeypatch, redis)
+    redis.data["lock:k"] = "other-worker"
+    asyncio.run(cache._release_lock("k", "expired-token"))
+    assert redis.data["lock:k"] == "other-worker"
+
+def test_local_cache_evicts_lru_and_expires():
+    clock = FakeClock()
+    local = LocalTTLCache(max_entries=2, ttl=5.0, clock=clock)
+    local.set("a", 1)
+    local.set("b", 2)
+    assert local.get("a") == 1
+    local.set("c", 3)
+    assert local.get("b") is None and local.evictions == 1
+    # TTL của entry không vượt quá TTL local
+    local.set("d", 4, ttl=300)
+    clock.now = 5.0
+    assert local.get("a") is None and local.get("d") is None
+
+def test_local_tier_serves_hits_and_drops_broadcast_keys(monkeypatch):
+    redis = FakeRedis()
+    fresh_cache(monkeypatch, redis, LocalTTLCache(max_entries=10, ttl=5.0))
+
+    async def build():
+        return make_vods(1), {}
+
+    async def lookup():
+        return await cache.get_or_set_response("vods:all", build, ttl=60, adapter=ADAPTER)
+
+    asyncio.run(lookup())
+    asyncio.run(lookup())
+    # Worker khác invalidate: message pub/sub xoá entry local, lần sau lấy từ Redis
+    cache.apply_invalidation(json.dumps({"keys": ["vods:all"]}))
+    asyncio.run(lookup())
+
+    stats = cache.cache_stats()
+    assert (stats["misses"], stats["local_hits"], stats["redis_hits"]) == (1, 1, 1)
+    assert stats["local_hit_ratio"] == round(1 / 3, 4)
+    assert stats["redis_hit_ratio"] == 0.5
+
+def test_concurrent_misses_share_one_build(monkeypatch):
+    fresh_cache(monkeypatch, FakeRedis())
+    calls = []
+
+    async def build():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return make_vods(1), {}
+
+    async def scenario():
+        return await asyncio.gather(*(
+            cache.get_or_set_response("vods:hot", build, ttl=60, adapter=ADAPTER) for _ in range(20)
+        ))
+
+    results = asyncio.run(scenario())
+    assert calls == [1]
+    assert len({result.body for result in results}) == 1
+    assert cache.cache_stats()["coalesced"] == 19
+
+def test_expired_value_is_served_stale_while_one_refresh_runs(monkeypatch):
+    redis = FakeRedis()
+    fresh_cache(monkeypatch, redis)
+    old = cache.CachedResponse(b"[]", {})
+    redis.data["vods:hot"] = cache._pack(old, fresh_until=0)
+    calls = []
+
+    async def build():
+        calls.append(1)
+        return make_vods(1), {}
+
+    async def scenario():
+        stale = await asyncio.gather(*(
+            cache.get_or_set_response("vods:hot", build, ttl=60, adapter=ADAPTER) for _ in range(5)
+        ))
+        await asyncio.sleep(0.01)
+        return stale, await cache.get_or_set_response("vods:hot", build, ttl=60, adapter=ADAPTER)
+
+    stale, fresh = asyncio.run(scenario())
+    assert all(result == old for result in stale)
+    assert calls == [1]
+    assert json.loads(fresh.body)[0]["title"] == "Phim số 0\nmới"
+    assert "lock:vods:hot" not in redis.data
+
+def test_writes_bump_list_generation_and_drop_exact_item_key(monkeypatch):
+    redis = FakeRedis()
+    fresh_cache(monkeypatch, redis)
+
+    async def scenario():
+        before = await cache.versioned_key(cache.VOD_LIST_NAMESPACE, "all:page:1")
+        item_key = await cache.vod_cache_key("abc")
+        redis.data[item_key] = b"cached"
+        await cache.invalidate_vods("abc")
+        return before, item_key, await cache.versioned_key(cache.VOD_LIST_NAMESPACE, "all:page:1")
+
+    before, item_key, after = asyncio.run(scenario())
+    assert (before, after) == ("vods:v0:all:page:1", "vods:v1:all:page:1")
+    assert item_key == "vod:v0:abc" and item_key not in redis.data
+    assert redis.published == [{"generations": {"vods": 1}}, {"keys": ["vod:v0:abc"]}]
+
+def test_broadcast_generation_never_moves_backwards(monkeypatch):
+    fresh_cache(monkeypatch, FakeRedis())
+    cache.apply_invalidation(json.dumps({"generations": {"vods": 5}}))
+    cache.apply_invalidation(json.dumps({"generations": {"vods": 4}}))
+    assert asyncio.run(cache.get_generation("vods")) == 5
+
+def test_get_many_returns_fresh_entries_with_one_mget(monkeypatch):
+    redis = FakeRedis()
+    fresh_cache(monkeypatch, redis)
+    found = cache.CachedResponse(b'{"title":"A"}', {})
+    missing = cache.CachedResponse(b"null", {})
+
+    async def scenario():
+        await cache.set_many({"vod:v0:a": (found, 300), "vod:v0:b": (missing, 30)}, {})
+        redis.data["vod:v0:c"] = cache._pack(found, fresh_until=0)
+        return await cache.get_many(["vod:v0:a", "vod:v0:b", "vod:v0:c", "vod:v0:d"])
+
+    result = asyncio.run(scenario())
+    # Entry hết hạn (c) và chưa có (d) để caller lấy lại từ DB bằng một query $in
+    assert result == {"vod:v0:a": found, "vod:v0:b": missing}
+    assert redis.mget_calls == 1
+
+def test_build_started_before_invalidation_is_not_written_back(monkeypatch):
+    redis = FakeRedis()
+    fresh_cache(monkeypatch, redis, LocalTTLCache(max_entries=10, ttl=5.0))
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_build():
+        started.set()
+        await release.wait()
+        return make_vods(1), {}
+
+    async def scenario():
+        load = asyncio.create_task(cache.get_or_set_response("vod:v0:a", slow_build, ttl=60, adapter=ADAPTER))
+        await started.wait()
+        # update_vod xong trong lúc build (đọc bản cũ) vẫn đang chạy
+        await cache.invalidate_cache("vod:v0:a")
+        release.set()
+        await load
+
+    asyncio.run(scenario())
+    assert "vod:v0:a" not in redis.data
+    assert cache.local_cache.get("vod:v0:a") is None
+    assert redis.data["inv:vod:v0:a"] == b"1"
+
+def test_write_endpoints_drop_entries_cached_by_other_workers(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import app.api.v1.endpoints.vod as vod_endpoints
+    import app.crud.vod as crud_vod
+
+    redis = FakeRedis()
+    fresh_cache(monkeypatch, redis)
+    vod = make_vods(1)[0]
+
+    async def create(v):
+        return vod
+
+    async def update(vod_id, v):
+        return vod
+
+    async def delete(vod_id):
+        return True
+
+    monkeypatch.setattr(crud_vod, "create_vod", create)
+    monkeypatch.setattr(crud_vod, "update_vod", update)
+    monkeypatch.setattr(crud_vod, "delete_vod", delete)
+    app = FastAPI()
+    app.include_router(vod_endpoints.router)
+    client = TestClient(app)
+
+    assert client.post("/vods", json={"title": "Bố Già"}).status_code == 201
+    assert client.put(f"/vods/{vod.id}", json={"title": "Bố Già 2"}).status_code == 202
+    assert client.delete(f"/vods/{vod.id}").status_code == 204
+
+    # Worker khác đang giữ bản local của VOD này: nhận message pub/sub là bỏ
+    item_key = f"vod:v0:{vod.id}"
+    other_worker = LocalTTLCache(max_entries=10, ttl=60.0)
+    other_worker.set(item_key, cache.CachedResponse(b"{}", {}))
+    monkeypatch.setattr(cache, "local_cache", other_worker)
+    monkeypatch.setattr(cache, "_generations", {})
+    for message in redis.published:
+        cache.apply_invalidation(json.dumps(message))
+    assert other_worker.get(item_key) is None
+    assert asyncio.run(cache.get_generation(cache.VOD_LIST_NAMESPACE)) == 3
+    assert redis.published.count({"keys": [item_key]}) == 2
+
+def make_vod_client(monkeypatch, redis, vod):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import app.api.v1.endpoints.vod as vod_endpoints
+    import app.crud.vod as crud_vod
+
+    fresh_cache(monkeypatch, redis)
+
+    async def get_vod(vod_id, fields=None):
+        return vod if ObjectId(vod_id) == ObjectId(vod.id) else None
+
+    async def get_vods_by_ids(vod_ids):
+        return [vod] if any(ObjectId(vod_id) == ObjectId(vod.id) for vod_id in vod_ids) else []
+
+    async def update(vod_id, v):
+        return vod
+
+    monkeypatch.setattr(crud_vod, "get_vod", get_vod)
+    monkeypatch.setattr(crud_vod, "get_vods_by_ids", get_vods_by_ids)
+    monkeypatch.setattr(crud_vod, "update_vod", update)
+    app = FastAPI()
+    app.include_router(vod_endpoints.router)
+    return TestClient(app)
+
+def test_batch_read_with_uppercase_id_finds_the_vod(monkeypatch):
+    redis = FakeRedis()
+    vod = make_vods(1)[0]
+    client = make_vod_client(monkeypatch, redis, vod)
+
+    body = client.post("/vods:batch", json={"ids": [vod.id.upper(), vod.id]}).json()
+    assert [item["_id"] for item in body["items"]] == [vod.id]
+    assert body["missing"] == []
+    assert f"vod:v0:{vod.id}" in redis.data
+    assert f"vod:v0:{vod.id.upper()}" not in redis.data
+
+def test_detail_read_with_uppercase_id_is_invalidated_by_writes(monkeypatch):
+    redis = FakeRedis()
+    vod = make_vods(1)[0]
+    client = make_vod_client(monkeypatch, redis, vod)
+
+    assert client.get(f"/vods/{vod.id.upper()}").json()["_id"] == vod.id
+    assert list(key for key in redis.data if key.startswith("vod:")) == [f"vod:v0:{vod.id}"]
+    assert client.put(f"/vods/{vod.id}", json={"title": "Bố Già 2"}).status_code == 202
+    assert f"vod:v0:{vod.id}" not in redis.data
@@ -0,0 +1,41 @@
+import asyncio
+
+
+import app.crud.vod as crud_vod
+import app.db.mongodb as db
+from app.utils.data_utils import search_tokens
+
+def test_search_tokens_fold_diacritics_and_dedupe():
+    assert search_tokens("Cuộc Rượt Đuổi: Rượt!") == ["cuoc", "ruot", "duoi"]
+    assert search_tokens(None) == []
+
+def test_search_filter_matches_words_and_prefix_of_last_word():
+    assert crud_vod._search_filter("Cuộc rượt đu") == {"$and": [
+        {"search_tokens": "cuoc"},
+        {"search_tokens": "ruot"},
+        {"search_tokens": {"$regex": "^du"}},
+    ]}
+    assert crud_vod._search_filter("ruot") == {"search_tokens": {"$regex": "^ruot"}}
+    assert crud_vod._search_filter("?!") == {"search_tokens": {"$in": []}}
+
+def test_written_documents_carry_search_fields():
+    data = crud_vod._with_search_fields({"title": "Nhà Bà Nữ"})
+    assert data["search_tokens"] == ["nha", "ba", "nu"]
+    assert "nha ba" in data["title_prefixes"]
+    assert crud_vod._with_search_fields({"view_count": 1}) == {"view_count": 1}
+
+def test_backfill_missing_only_touches_documents_without_search_fields(monkeypatch, async_collection):
+    collection = async_collection.collection
+    collection.insert_many([
+        {"_id": 1, "title": "Bố Già"},
+        {"_id": 2, "title": "Mắt Biếc", "search_tokens": ["mat", "biec"]},
+        {"_id": 3, "title": "Nhà Bà Nữ", **crud_vod._with_search_fields({"title": "Nhà Bà Nữ"})},
+    ])
+    collection.update_one({"_id": 3}, {"$set": {"search_tokens": ["cu"]}})
+    monkeypatch.setattr(db, "vod_collection", async_collection, raising=False)
+
+    assert asyncio.run(crud_vod.backfill_search_fields(missing_only=True)) == 2
+    assert collection.find_one({"_id": 1})["search_tokens"] == ["bo", "gia"]
+    assert "mat bi" in collection.find_one({"_id": 2})["title_prefixes"]
+    # Đã có đủ field: không bị tính lại
+    assert collection.find_one({"_id": 3})["search_tokens"] == ["cu"]
@@ -0,0 +1,33 @@
+import asyncio
+
+import app.crud.vod as crud_vod
+import app.db.mongodb as db
+from app.utils.data_utils import title_prefixes
+
+def insert_titles(collection, titles):
+    collection.insert_many([
+        {"_id": i, "title": title, "view_count": views, "title_prefixes": title_prefixes(title, 20)}
+        for i, (title, views) in enumerate(titles)
+    ])
+
+def test_title_prefixes_start_at_every_word_without_diacritics():
+    prefixes = title_prefixes("Cuộc Rượt Đuổi", max_length=20)
+    assert {"c", "cuoc", "cuoc ruot d", "ruot", "duoi"} <= set(prefixes)
+    assert "cuoc " not in prefixes and len(prefixes) == len(set(prefixes))
+    assert max(map(len, title_prefixes("Một tựa phim rất rất dài", max_length=8))) <= 8
+
+def test_suggest_orders_by_views_and_filters_long_queries(monkeypatch, async_collection):
+    monkeypatch.setattr(db, "vod_collection", async_collection, raising=False)
+    insert_titles(async_collection.collection, [
+        ("Cuộc Rượt Đuổi Tại Cực Địa Phần Một", 10),
+        ("Cuộc Rượt Đuổi Tại Cực Địa Phần Hai", 50),
+        ("Rượt Đuổi Trong Mơ", 30),
+        ("Gia Đình Là Số 1", 99),
+    ])
+
+    short = asyncio.run(crud_vod.suggest_vods("ruot", limit=2))
+    assert [doc["title"] for doc in short] == ["Cuộc Rượt Đuổi Tại Cực Địa Phần Hai", "Rượt Đuổi Trong Mơ"]
+    # Dài hơn prefix đã index (20 ký tự): lọc lại theo cả chuỗi
+    long = asyncio.run(crud_vod.suggest_vods("cuoc ruot duoi tai cuc dia phan mot", limit=5))
+    assert [doc["title"] for doc in long] == ["Cuộc Rượt Đuổi Tại Cực Địa Phần Một"]
+    assert asyncio.run(crud_vod.suggest_vods("!!!")) == []
@@ -0,0 +1,69 @@
+import json
+
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.api.v1.endpoints.vod as vod_endpoints
+import app.db.mongodb as db
+from app.schemas.vod import PaginatedResponse, VodResponse
+from app.utils.cache import CachedResponse
+from app.utils.data_utils import search_tokens
+
+def make_client(monkeypatch, collection):
+    for year, title in enumerate(("Nhà Bà Nữ", "Bố Già", "Mắt Biếc"), start=2019):
+        collection.collection.insert_one({
+            "_id": ObjectId(), "title": title, "release_year": year,
+            "url": f"https://vieon.vn/{year}.html", "search_tokens": search_tokens(title),
+        })
+    monkeypatch.setattr(db, "vod_collection", collection, raising=False)
+
+    # Bỏ qua Redis: serialize đúng như get_or_set_response khi miss
+    async def no_cache(key, build_fn, ttl, adapter, negative_ttl=None):
+        data, headers = await build_fn()
+        return CachedResponse(adapter.dump_json(data, by_alias=True), headers)
+
+    async def key(namespace, key):
+        return f"{namespace}:v0:{key}"
+
+    monkeypatch.setattr(vod_endpoints, "get_or_set_response", no_cache)
+    monkeypatch.setattr(vod_endpoints, "versioned_key", key)
+    app = FastAPI()
+    app.include_router(vod_endpoints.router)
+    return TestClient(app)
+
+def validate_envelope(body: bytes, collection) -> PaginatedResponse:
+    """
+    Body ghép tay phải khớp đúng với PaginatedResponse[VodResponse] mà response_model sẽ serialize
+    (VodResponse chỉ nhận ObjectId nên dựng lại items từ document gốc)
+    """
+    data = json.loads(body)
+    docs = [collection.collection.find_one({"_id": ObjectId(item["_id"])}) for item in data["items"]]
+    envelope = PaginatedResponse[VodResponse](**{**data, "items": docs})
+    assert json.loads(envelope.model_dump_json(by_alias=True)) == data
+    return envelope
+
+def test_envelope_validates_in_page_and_cursor_mode(monkeypatch, async_collection):
+    client = make_client(monkeypatch, async_collection)
+
+    first = client.get("/vods", params={"limit": 2})
+    assert first.status_code == 200
+    page = validate_envelope(first.content, async_collection)
+    assert [vod.title for vod in page.items] == ["Mắt Biếc", "Bố Già"]
+    assert (page.total, page.page, page.limit, page.total_pages) == (3, 1, 2, 2)
+    assert page.next_cursor and page.next_cursor == first.headers["X-Next-Cursor"]
+
+    second = client.get("/vods", params={"limit": 2, "after": page.next_cursor})
+    assert second.status_code == 200
+    rest = validate_envelope(second.content, async_collection)
+    assert [vod.title for vod in rest.items] == ["Nhà Bà Nữ"]
+    assert (rest.total, rest.page, rest.next_cursor) == (3, None, None)
+
+def test_total_uses_estimated_count_unless_searching(monkeypatch, async_collection):
+    client = make_client(monkeypatch, async_collection)
+
+    assert client.get("/vods").json()["total"] == 3
+    assert async_collection.counts == ["estimated_document_count"]
+
+    assert client.get("/vods", params={"search": "bo gi"}).json()["total"] == 1
+    assert async_collection.counts == ["estimated_document_count", "count_documents"]
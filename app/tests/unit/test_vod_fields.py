@@ -0,0 +1,23 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.api.v1.endpoints.vod import PROJECTED_LIST_ADAPTER, _parse_fields
+from app.schemas.vod import vod_fields_model
+
+def test_parse_fields_is_canonical_and_rejects_unknown():
+    assert _parse_fields(None) is None
+    assert _parse_fields(" title,thumbnail_url ,id,title") == ("thumbnail_url", "title")
+    with pytest.raises(HTTPException) as exc:
+        _parse_fields("title,password")
+    assert exc.value.status_code == 400
+
+def test_fields_model_keeps_constraints_and_hides_sort_key():
+    model = vod_fields_model(("title",), ("release_year",))
+    assert model is vod_fields_model(("title",), ("release_year",))
+    vod = model(_id=ObjectId(), title="Nhà Bà Nữ", release_year=2023, description="bị bỏ qua")
+    assert vod.release_year == 2023
+    assert PROJECTED_LIST_ADAPTER.dump_json([vod], by_alias=True) == f'[{{"_id":"{vod.id}","title":"Nhà Bà Nữ"}}]'.encode()
+    with pytest.raises(ValidationError):
+        model(_id=ObjectId(), title="A")
@@ -1,34 +1,433 @@
+import asyncio
 import json
-from typing import Any, Callable
-from app.db.redis_client import redis_client
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+from bson import ObjectId
+from pydantic import TypeAdapter
+from app.core.config import settings
+from app.db.redis_client import redis_client, redis_raw_client
 from app.core.logging import get_logger
-from app.schemas.vod import VodResponse
+from app.utils.local_cache import LocalTTLCache
 
 logger = get_logger(__name__)
 
-async def get_or_set_cache(key: str, fetch_fn: Callable[[], Any], ttl: int):
+# Tier 1: trong process (mỗi uvicorn worker một bản), tier 2: Redis dùng chung
+local_cache = LocalTTLCache(
+    max_entries=settings.CACHE_LOCAL_MAX_ENTRIES if settings.CACHE_LOCAL_ENABLED else 0,
+    ttl=settings.CACHE_LOCAL_TTL,
+)
+_stats = dict.fromkeys(
+    ("local_hits", "redis_hits", "stale_hits", "misses", "coalesced", "lock_waits", "refreshes", "errors"), 0
+)
+# Task build/refresh đang chạy theo key (single-flight trong process)
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Namespace cache của VOD: trang list/search và từng VOD theo id
+VOD_LIST_NAMESPACE = "vods"
+VOD_ITEM_NAMESPACE = "vod"
+GENERATION_KEY = "cache:gen:{}"
+# Bộ đếm invalidate phải sống lâu hơn mọi lần build có thể đang chạy
+INVALIDATION_MARKER_TTL = 600
+# namespace -> (generation, hết hạn bản local). Bump được broadcast qua pub/sub như invalidation
+_generations: Dict[str, Tuple[int, float]] = {}
+_listener_task: Optional[asyncio.Task] = None
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+
+def _pack(response: CachedResponse, fresh_until: float) -> bytes:
+    # Dòng đầu là metadata (headers + hạn fresh), phần còn lại là body JSON (JSON compact không chứa "\n" thô)
+    meta = {"h": response.headers, "f": fresh_until}
+    return json.dumps(meta, separators=(",", ":")).encode("utf-8") + b"\n" + response.body
+
+def _unpack(raw: bytes) -> Tuple[CachedResponse, float]:
+    meta, _, body = raw.partition(b"\n")
+    meta = json.loads(meta)
+    return CachedResponse(body, meta["h"]), meta["f"]
+
+def _lock_key(key: str) -> str:
+    return f"lock:{key}"
+
+async def _acquire_lock(key: str) -> Optional[str]:
+    token = uuid.uuid4().hex
+    if await redis_client.set(_lock_key(key), token, nx=True, ex=max(1, int(settings.CACHE_LOCK_TIMEOUT))):
+        return token
+    return None
+
+# Compare-and-delete nguyên tử: chỉ xoá lock nếu vẫn là của mình (lock có thể đã hết hạn và bị worker khác lấy)
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+async def _release_lock(key: str, token: str):
     try:
-        cached = await redis_client.get(key)
-        if cached:
-            logger.debug(f"Cache hit for key: {key}")
-            cached_data = json.loads(cached)
-        # Convert dict back to VodResponse objects
-            if isinstance(cached_data, list):
-                return [VodResponse(**item) for item in cached_data]
-            else:
-                return VodResponse(**cached_data)
-        data = await fetch_fn()
-        await redis_client.set(key, json.dumps(data, default=str), ex=ttl)
-        logger.debug(f"Cached data for key: {key} with TTL: {ttl}s")
-        return data
+        await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, _lock_key(key), token)
+    except Exception as e:
+        # Lock tự hết hạn sau CACHE_LOCK_TIMEOUT
+        logger.warning(f"Failed to release cache lock for {key}: {str(e)}")
+
+def _invalidation_key(key: str) -> str:
+    return f"inv:{key}"
+
+# Chỉ ghi nếu key không bị invalidate kể từ lúc bắt đầu build (bộ đếm inv:<key> không đổi),
+# để một lần build đang chạy không ghi đè dữ liệu cũ lên sau invalidate_cache
+_GUARDED_SET_SCRIPT = """
+if (redis.call("get", KEYS[2]) or "") ~= ARGV[3] then
+    return 0
+end
+redis.call("set", KEYS[1], ARGV[1], "EX", ARGV[2])
+return 1
+"""
+
+async def read_versions(keys: List[str]) -> Dict[str, bytes]:
+    """
+    Bộ đếm invalidate hiện tại của các key, đọc trước khi build và truyền lại khi ghi
+    """
+    try:
+        values = await redis_raw_client.mget([_invalidation_key(key) for key in keys])
+    except Exception as e:
+        logger.warning(f"Failed to read cache versions for {len(keys)} keys: {str(e)}")
+        return {}
+    return {key: value or b"" for key, value in zip(keys, values)}
+
+def _guarded_set(client, key: str, response: CachedResponse, ttl: int, version: bytes):
+    # Giữ thêm CACHE_STALE_TTL sau khi hết hạn để phục vụ bản cũ trong lúc refresh
+    return client.eval(
+        _GUARDED_SET_SCRIPT, 2, key, _invalidation_key(key),
+        _pack(response, time.time() + ttl), ttl + settings.CACHE_STALE_TTL, version,
+    )
+
+async def _build_and_store(key: str, build_fn, ttl: int, adapter: TypeAdapter, negative_ttl: Optional[int] = None) -> CachedResponse:
+    version = (await read_versions([key])).get(key, b"")
+    data, headers = await build_fn()
+    response = CachedResponse(adapter.dump_json(data, by_alias=True), headers)
+    if data is None and negative_ttl is not None:
+        # Negative cache: không tìm thấy cũng được cache, nhưng ngắn hơn
+        ttl = negative_ttl
+    try:
+        if not await _guarded_set(redis_raw_client, key, response, ttl, version):
+            logger.debug(f"Key {key} was invalidated during build, not caching")
+            return response
+        logger.debug(f"Cached response for key: {key} with TTL: {ttl}s ({len(response.body)} bytes)")
+    except Exception as e:
+        logger.error(f"Failed to cache key {key}: {str(e)}", exc_info=True)
+    local_cache.set(key, response, ttl)
+    return response
+
+async def _wait_for_other_builder(key: str) -> Optional[CachedResponse]:
+    """
+    Worker khác đang giữ lock build key này: chờ kết quả của nó thay vì cùng query Mongo
+    """
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        try:
+            cached = await redis_raw_client.get(key)
+            if cached:
+                response, fresh_until = _unpack(cached)
+                if fresh_until > time.time():
+                    return response
+            elif not await redis_client.exists(_lock_key(key)):
+                return None
+        except Exception as e:
+            logger.warning(f"Cache error while waiting for key {key}: {str(e)}")
+            return None
+    return None
+
+async def _load(key: str, build_fn, ttl: int, adapter: TypeAdapter, negative_ttl: Optional[int] = None) -> CachedResponse:
+    """
+    Miss: một request build cho mỗi key trong toàn cluster (lock Redis), các worker khác chờ kết quả
+    """
+    try:
+        token = await _acquire_lock(key)
+    except Exception as e:
+        # Redis lỗi: vẫn build (single-flight trong process đã gộp các request cùng key)
+        _stats["errors"] += 1
+        logger.warning(f"Failed to acquire cache lock for {key}: {str(e)}")
+        return await _build_and_store(key, build_fn, ttl, adapter, negative_ttl)
+    if token is None:
+        _stats["lock_waits"] += 1
+        response = await _wait_for_other_builder(key)
+        if response is not None:
+            local_cache.set(key, response, ttl)
+            return response
+        # Builder kia chậm/lỗi: tự build, chấp nhận trùng một lần thay vì treo request
+        return await _build_and_store(key, build_fn, ttl, adapter, negative_ttl)
+    try:
+        return await _build_and_store(key, build_fn, ttl, adapter, negative_ttl)
+    finally:
+        await _release_lock(key, token)
+
+async def _refresh(key: str, build_fn, ttl: int, adapter: TypeAdapter, negative_ttl: Optional[int] = None):
+    """
+    Stale-while-revalidate: chỉ worker lấy được lock refresh, các request khác tiếp tục nhận bản cũ
+    """
+    try:
+        token = await _acquire_lock(key)
+        if token is None:
+            return
+        try:
+            _stats["refreshes"] += 1
+            await _build_and_store(key, build_fn, ttl, adapter, negative_ttl)
+        finally:
+            await _release_lock(key, token)
+    except Exception as e:
+        logger.error(f"Background refresh failed for key {key}: {str(e)}", exc_info=True)
+
+def _single_flight(key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+    """
+    Gộp các lời gọi đồng thời cùng key trong process thành một task
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        _stats["coalesced"] += 1
+    return task
+
+async def get_or_set_response(
+    key: str,
+    build_fn: Callable[[], Awaitable[Tuple[Any, Dict[str, str]]]],
+    ttl: int,
+    adapter: TypeAdapter,
+    negative_ttl: Optional[int] = None,
+) -> CachedResponse:
+    """
+    Cache body JSON cuối cùng của response. Hit trả thẳng bytes từ Redis, không
+    json.loads / dựng lại model / validate lại qua response_model.
+    `build_fn` trả về (data, headers); data được serialize một lần bằng `adapter.dump_json`
+    (pydantic-core, by_alias giống response_model của FastAPI).
+    Hết TTL: trả bản cũ và refresh nền một lần; miss hẳn: các request đồng thời chờ chung một lần build.
+    `negative_ttl`: TTL riêng khi build trả về None (body "null")
+    """
+    local = local_cache.get(key)
+    if local is not None:
+        _stats["local_hits"] += 1
+        return local
+    # Chỉ lỗi đọc Redis mới được coi là miss; lỗi của build_fn (vd. Mongo down) trả thẳng cho caller,
+    # không build lại lần hai
+    try:
+        cached = await redis_raw_client.get(key)
+        cached = _unpack(cached) if cached else None
     except Exception as e:
+        _stats["errors"] += 1
         logger.error(f"Cache error for key {key}: {str(e)}", exc_info=True)
-        logger.warning(f"Falling back to direct fetch for key: {key}")
-        return await fetch_fn()
+        cached = None
+    if cached is not None:
+        response, fresh_until = cached
+        if fresh_until > time.time():
+            logger.debug(f"Cache hit for key: {key}")
+            _stats["redis_hits"] += 1
+            local_cache.set(key, response, ttl)
+        else:
+            logger.debug(f"Serving stale value for key: {key}")
+            _stats["stale_hits"] += 1
+            _single_flight(f"refresh:{key}", lambda: _refresh(key, build_fn, ttl, adapter, negative_ttl))
+        return response
+    _stats["misses"] += 1
+    # shield: request đầu bị huỷ (client ngắt) thì các request đang chờ vẫn nhận kết quả
+    return await asyncio.shield(_single_flight(key, lambda: _load(key, build_fn, ttl, adapter, negative_ttl)))
 
+async def get_many(keys: List[str]) -> Dict[str, CachedResponse]:
+    """
+    Lấy nhiều key: local tier trước, phần còn lại một lần MGET. Chỉ trả về entry còn fresh,
+    key miss/hết hạn để caller lấy lại từ DB theo batch
+    """
+    found: Dict[str, CachedResponse] = {}
+    remaining = []
+    for key in keys:
+        local = local_cache.get(key)
+        if local is not None:
+            _stats["local_hits"] += 1
+            found[key] = local
+        else:
+            remaining.append(key)
+    if not remaining:
+        return found
+    try:
+        values = await redis_raw_client.mget(remaining)
+    except Exception as e:
+        _stats["errors"] += 1
+        logger.error(f"Cache MGET failed for {len(remaining)} keys: {str(e)}", exc_info=True)
+        values = [None] * len(remaining)
+    now = time.time()
+    for key, raw in zip(remaining, values):
+        if raw:
+            response, fresh_until = _unpack(raw)
+            if fresh_until > now:
+                _stats["redis_hits"] += 1
+                local_cache.set(key, response, fresh_until - now)
+                found[key] = response
+                continue
+        _stats["misses"] += 1
+    return found
 
+async def set_many(entries: Dict[str, Tuple[CachedResponse, int]], versions: Dict[str, bytes]):
+    """
+    Ghi nhiều entry (response, ttl) trong một pipeline. `versions` đọc bằng read_versions trước
+    khi query DB: key bị invalidate trong lúc đó sẽ không được ghi
+    """
+    if not entries:
+        return
+    try:
+        pipe = redis_raw_client.pipeline(transaction=False)
+        for key, (response, ttl) in entries.items():
+            _guarded_set(pipe, key, response, ttl, versions.get(key, b""))
+        results = await pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to cache {len(entries)} keys: {str(e)}", exc_info=True)
+        return
+    for (key, (response, ttl)), stored in zip(entries.items(), results):
+        if stored:
+            local_cache.set(key, response, ttl)
 
 async def invalidate_cache(*keys):
+    """
+    Xoá key ở Redis và ở local cache của mọi worker (broadcast qua pub/sub)
+    """
     if keys:
-        await redis_client.delete(*keys)
-        print(f"Invalidated cache keys: {keys}")
+        local_cache.delete(keys)
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(*keys)
+        for key in keys:
+            # Tăng bộ đếm để lần build đang chạy (bắt đầu trước lúc này) không ghi lại bản cũ
+            pipe.incr(_invalidation_key(key))
+            pipe.expire(_invalidation_key(key), INVALIDATION_MARKER_TTL)
+        await pipe.execute()
+        await redis_client.publish(settings.CACHE_INVALIDATION_CHANNEL, json.dumps({"keys": list(keys)}))
+        logger.debug(f"Invalidated cache keys: {keys}")
+
+def apply_invalidation(message: str):
+    payload = json.loads(message)
+    if payload.get("all"):
+        local_cache.clear()
+    else:
+        local_cache.delete(payload.get("keys") or ())
+    for namespace, generation in (payload.get("generations") or {}).items():
+        _remember_generation(namespace, generation)
+
+def _remember_generation(namespace: str, generation: int):
+    current = _generations.get(namespace)
+    # Message đến trễ không được kéo generation lùi lại
+    if current is not None and current[0] > generation:
+        generation = current[0]
+    # Không có listener pub/sub thì lần nào cũng đọc lại từ Redis
+    ttl = settings.CACHE_LOCAL_TTL if settings.CACHE_LOCAL_ENABLED else 0
+    _generations[namespace] = (generation, time.monotonic() + ttl)
+
+async def get_generation(namespace: str) -> int:
+    entry = _generations.get(namespace)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+    try:
+        generation = int(await redis_client.get(GENERATION_KEY.format(namespace)) or 0)
+    except Exception as e:
+        logger.warning(f"Failed to read cache generation for {namespace}: {str(e)}")
+        return entry[0] if entry is not None else 0
+    _remember_generation(namespace, generation)
+    return _generations[namespace][0]
+
+async def versioned_key(namespace: str, key: str) -> str:
+    """
+    Key gắn generation của namespace: bump generation là mọi key cũ của namespace miss ngay,
+    không cần SCAN/xoá từng key (key cũ tự hết hạn theo TTL)
+    """
+    return f"{namespace}:v{await get_generation(namespace)}:{key}"
+
+async def bump_generation(*namespaces: str):
+    generations = {}
+    for namespace in namespaces:
+        generations[namespace] = await redis_client.incr(GENERATION_KEY.format(namespace))
+        _remember_generation(namespace, generations[namespace])
+    await redis_client.publish(settings.CACHE_INVALIDATION_CHANNEL, json.dumps({"generations": generations}))
+    logger.debug(f"Bumped cache generations: {generations}")
+
+async def vod_cache_key(vod_id: str) -> str:
+    # ObjectId nhận cả hex chữ hoa: key luôn theo dạng chữ thường của VodResponse.id,
+    # để invalidate_vods xoá đúng entry dù client đọc/ghi bằng dạng nào
+    if ObjectId.is_valid(vod_id):
+        vod_id = str(ObjectId(vod_id))
+    return await versioned_key(VOD_ITEM_NAMESPACE, vod_id)
+
+async def invalidate_vods(*vod_ids: str):
+    """
+    Sau khi ghi VOD qua API: mọi trang list/search miss (O(1)), entry theo id bị xoá chính xác.
+    Lỗi cache chỉ log, không làm hỏng request ghi
+    """
+    try:
+        await bump_generation(VOD_LIST_NAMESPACE)
+        if vod_ids:
+            await invalidate_cache(*[await vod_cache_key(vod_id) for vod_id in vod_ids])
+    except Exception as e:
+        logger.warning(f"Failed to invalidate VOD cache ({vod_ids}): {str(e)}")
+
+async def invalidate_all_vods():
+    """
+    Sau bulk upsert của crawler (không biết id nào đổi): bump cả namespace list lẫn từng VOD
+    """
+    try:
+        await bump_generation(VOD_LIST_NAMESPACE, VOD_ITEM_NAMESPACE)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate VOD cache: {str(e)}")
+
+async def _listen_invalidations():
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+            # Có thể đã lỡ message trong lúc mất kết nối
+            local_cache.clear()
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    apply_invalidation(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener error: {str(e)}, resubscribing")
+        finally:
+            await pubsub.reset()
+        await asyncio.sleep(1.0)
+
+def start_invalidation_listener():
+    global _listener_task
+    if settings.CACHE_LOCAL_ENABLED and _listener_task is None:
+        _listener_task = asyncio.create_task(_listen_invalidations())
+        logger.info(f"Local cache enabled ({local_cache.max_entries} entries, TTL {local_cache.ttl}s)")
+
+async def stop_invalidation_listener():
+    global _listener_task
+    if _listener_task is None:
+        return
+    _listener_task.cancel()
+    try:
+        await _listener_task
+    except asyncio.CancelledError:
+        pass
+    _listener_task = None
+
+def cache_stats() -> dict:
+    """
+    Hit ratio theo tier: local/redis trên tổng lookup, redis trên số lookup đã miss local
+    """
+    local_hits, misses = _stats["local_hits"], _stats["misses"]
+    # Bản stale vẫn là hit của tier Redis
+    redis_hits = _stats["redis_hits"] + _stats["stale_hits"]
+    total = local_hits + redis_hits + misses
+    def ratio(hits, lookups):
+        return round(hits / lookups, 4) if lookups else None
+    return {
+        **_stats,
+        "lookups": total,
+        "local_hit_ratio": ratio(local_hits, total),
+        "redis_hit_ratio": ratio(redis_hits, total - local_hits),
+        "overall_hit_ratio": ratio(local_hits + redis_hits, total),
+        "local_entries": len(local_cache),
+        "local_evictions": local_cache.evictions,
+    }
@@ -1,6 +1,10 @@
+import re
+import unicodedata
 from datetime import datetime, date
 from bson import ObjectId
 
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
 def normalize_release_date(doc: dict) -> dict:
     rd = doc.get("release_date")
     if isinstance(rd, date):
@@ -11,3 +15,37 @@ def objectid_str(v):
     if not isinstance(v, ObjectId):
         raise TypeError("ObjectId required")
     return str(v)
+
+def fold_text(value: str) -> str:
+    """
+    Bỏ dấu tiếng Việt, lowercase, chỉ giữ chữ/số cách nhau bằng một dấu cách.
+    "Cuộc Rượt Đuổi!" -> "cuoc ruot duoi"
+    """
+    if not value:
+        return ""
+    value = value.replace("đ", "d").replace("Đ", "D")
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return _NON_ALNUM_RE.sub(" ", value.lower()).strip()
+
+def title_prefixes(title: str, max_length: int = 20) -> list:
+    """
+    Edge n-gram cho typeahead: prefix (tối đa max_length ký tự) của title đã bỏ dấu,
+    bắt đầu từ mỗi từ để gõ giữa title cũng khớp.
+    "Cuộc Rượt" -> ["c", "cu", ..., "cuoc ruot", "r", "ru", "ruo", "ruot"]
+    """
+    words = fold_text(title).split()
+    prefixes = {}
+    for start in range(len(words)):
+        tail = " ".join(words[start:])[:max_length].rstrip()
+        for end in range(1, len(tail) + 1):
+            if tail[end - 1] != " ":
+                prefixes[tail[:end]] = None
+    return list(prefixes)
+
+def search_tokens(text: str) -> list:
+    """
+    Token đã bỏ dấu (không trùng) để tìm kiếm bằng index multikey.
+    "Cuộc rượt đuổi" -> ["cuoc", "ruot", "duoi"]
+    """
+    return list(dict.fromkeys(fold_text(text).split()))
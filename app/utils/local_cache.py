@@ -0,0 +1,46 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+class LocalTTLCache:
+    """
+    Cache trong process giới hạn số entry (LRU) và thời gian sống (TTL), đứng trước Redis.
+    Không có lock: chỉ dùng trên event loop của một worker
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (self._clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, keys: Iterable[str]) -> int:
+        return sum(1 for key in keys if self._entries.pop(key, None) is not None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,79 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+# sort_by -> (field, direction). _id luôn là tie-breaker cùng chiều để thứ tự ổn định
+SORT_FIELDS: Dict[str, Tuple[str, int]] = {
+    "release_year": ("release_year", -1),
+    "title": ("title", 1),
+}
+DEFAULT_SORT = ("_id", 1)
+
+class InvalidCursor(ValueError):
+    pass
+
+def sort_spec(sort_by: str) -> List[Tuple[str, int]]:
+    field, direction = SORT_FIELDS.get(sort_by, DEFAULT_SORT)
+    if field == "_id":
+        return [("_id", direction)]
+    return [(field, direction), ("_id", direction)]
+
+def encode_cursor(sort_by: str, value: Any, doc_id: str) -> str:
+    """
+    Token opaque chứa sort key + _id của item cuối trang
+    """
+    payload = json.dumps({"s": sort_by, "v": value, "id": str(doc_id)}, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str, sort_by: str) -> Tuple[Any, ObjectId]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, doc_id = payload["v"], ObjectId(payload["id"])
+    except Exception as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if payload.get("s") != sort_by:
+        raise InvalidCursor("Cursor was created for a different sort_by")
+    return value, doc_id
+
+def keyset_filter(sort_by: str, value: Any, doc_id: ObjectId) -> dict:
+    """
+    Điều kiện "sau item (value, _id)" theo thứ tự sort_spec, để Mongo seek thẳng trên
+    compound index (field, _id) thay vì skip. Null/thiếu field đứng đầu khi sort tăng
+    và cuối khi sort giảm (thứ tự BSON), nên phải xử lý riêng
+    """
+    field, direction = SORT_FIELDS.get(sort_by, DEFAULT_SORT)
+    id_op = "$gt" if direction == 1 else "$lt"
+    if field == "_id":
+        return {"_id": {id_op: doc_id}}
+
+    value_op = "$gt" if direction == 1 else "$lt"
+    if value is None:
+        same_value = {field: None, "_id": {id_op: doc_id}}
+        if direction == 1:
+            # Hết nhóm null -> sang toàn bộ item có giá trị
+            return {"$or": [same_value, {field: {"$ne": None}}]}
+        return same_value
+
+    conditions = [{field: {value_op: value}}, {field: value, "_id": {id_op: doc_id}}]
+    if direction == -1:
+        # Sort giảm: nhóm null nằm sau tất cả giá trị
+        conditions.append({field: None})
+    return {"$or": conditions}
+
+def cursor_value(sort_by: str, item: Any) -> Any:
+    field, _ = SORT_FIELDS.get(sort_by, DEFAULT_SORT)
+    if field == "_id":
+        return None
+    return getattr(item, field, None)
+
+def next_cursor(sort_by: str, items: List[Any], limit: int) -> Optional[str]:
+    """
+    Cursor của trang tiếp theo; `items` được lấy dư 1 phần tử để biết còn trang sau hay không
+    """
+    if len(items) <= limit:
+        return None
+    last = items[limit - 1]
+    return encode_cursor(sort_by, cursor_value(sort_by, last), last.id)
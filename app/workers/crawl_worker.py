@@ -0,0 +1,60 @@
+"""
+Crawl worker chạy độc lập: lấy URL từ frontier của job hiện tại trong Redis.
+Chạy nhiều process/container để chia tải một crawl job:
+
+    python -m app.workers.crawl_worker
+"""
+import asyncio
+import signal
+
+from app.core.config import settings
+from app.core.logging import setup_logging, get_logger
+from app.db.mongodb import check_db_connection, close_db_connection
+from app.db.redis_client import check_redis_connection, close_redis_connection
+from app.services.http_client import init_http_client, close_http_client
+from app.services.extractor import shutdown_extract_pool
+from app.services.crawler import CrawlerService
+
+setup_logging()
+logger = get_logger(__name__)
+
+async def run(stop: asyncio.Event):
+    crawler = CrawlerService()
+    logger.info(f"Crawl worker {crawler.worker_id} started")
+    while not stop.is_set():
+        try:
+            job_id = await crawler.state.running_job()
+            if job_id:
+                # URL của worker đã chết (hết heartbeat) được đẩy lại frontier để worker này crawl
+                await crawler.state.reclaim_orphans(job_id)
+            if job_id and await crawler.state.frontier_size(job_id) > 0:
+                await crawler.run_worker(job_id)
+                continue
+        except Exception as e:
+            logger.error(f"Crawl worker loop error: {str(e)}", exc_info=True)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.CRAWLER_WORKER_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+async def main():
+    await check_db_connection()
+    await check_redis_connection()
+    await init_http_client()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await run(stop)
+    finally:
+        logger.info("Crawl worker shutting down...")
+        await close_http_client()
+        shutdown_extract_pool()
+        await close_db_connection()
+        await close_redis_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+"""
+Re-extract offline từ archive .warc.gz đã ghi (CRAWLER_ARCHIVE_RECORD=true), không gọi network:
+
+    python -m app.workers.replay data/crawl_archive
+    python -m app.workers.replay data/crawl_archive --persist   # upsert lại vào MongoDB
+"""
+import argparse
+import asyncio
+import json
+
+from app.core.logging import setup_logging, get_logger
+from app.db.mongodb import check_db_connection, close_db_connection
+from app.services.extractor import shutdown_extract_pool
+from app.services.crawler import CrawlerService
+
+setup_logging()
+logger = get_logger(__name__)
+
+async def main(paths, persist: bool):
+    if persist:
+        await check_db_connection()
+    try:
+        result = await CrawlerService().replay(paths, persist=persist)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    finally:
+        shutdown_extract_pool()
+        if persist:
+            await close_db_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay crawl archive through extraction")
+    parser.add_argument("paths", nargs="+", help="File .warc.gz hoặc thư mục chứa archive")
+    parser.add_argument("--persist", action="store_true", help="Upsert kết quả vào MongoDB")
+    args = parser.parse_args()
+    asyncio.run(main(args.paths, args.persist))